@@ -1,6 +1,7 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
 from gi.repository import Gdk, Gio, GdkPixbuf, GLib
+from .utilities_tracing import utilities_traced
 # from .abstract_tool import WrongToolIdException
 
 ################################################################################
@@ -119,15 +120,25 @@ class DrHistoryManager():
 			'width': width, 'height': height
 		}
 
-	def add_state(self, pixbuf):
-		if pixbuf is None:
+	def add_state(self, pixbuf, tiles=None):
+		"""Add a state to the history. If the image is large, `tiles` is a
+		snapshot of its tiles and `pixbuf` should be None: the tiles are shared
+		with the other snapshots, and the pixbuf is built from them only when
+		the state is restored."""
+		if tiles is not None:
+			width, height = tiles.get_size()
+		elif pixbuf is not None:
+			width = pixbuf.get_width()
+			height = pixbuf.get_height()
+		else:
 			# Context: an error message
 			raise Exception(_("Attempt to save an invalid state"))
 		self._undo_history.append({
 			'tool_id': None,
 			'pixbuf': pixbuf,
-			'width': pixbuf.get_width(),
-			'height': pixbuf.get_height()
+			'tiles': tiles,
+			'width': width,
+			'height': height
 		})
 		self._is_saved = True
 
@@ -174,6 +185,7 @@ class DrHistoryManager():
 		# presses on ctrl+z during these 500ms, so there will be between 2 and 4
 		# times less recomputation.
 
+	@utilities_traced('DrHistoryManager._rebuild_from_history', 'history')
 	def _rebuild_from_history(self, async_cb_data={}):
 		"""Rebuild the image according to the content of the current history.
 		This is used as a GSourceFunc so it should return False."""
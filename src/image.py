@@ -20,8 +20,13 @@ from gi.repository import Gtk, Gdk, Gio, GdkPixbuf, Pango, GLib
 from .history_manager import DrHistoryManager
 from .selection_manager import DrSelectionManager
 from .properties import DrPropertiesDialog
+from .tiles_manager import DrTilesManager
+from .label_map import DrLabelMap
+from .mipmap_manager import DrMipmapManager
+from .pixel_sampler import DrPixelSampler
 from .utilities_files import InvalidFileFormatException
 from .utilities_overlay import utilities_generic_canvas_outline
+from .utilities_tracing import utilities_traced
 
 class DrMotionBehavior():
 	_LIMIT = 10
@@ -57,6 +62,11 @@ class DrImage(Gtk.Box):
 	# Maximal level of zoom (crisp rendering only)
 	ZOOM_MAX = 2000
 
+	# Minimal number of pixels for the stable state to be split in tiles
+	TILES_THRESHOLD = 2048 * 2048
+	# Above this number of pixels, the label map would use too much memory
+	LABEL_MAP_MAX_PIXELS = 4096 * 2048
+
 	def __init__(self, window, **kwargs):
 		super().__init__(**kwargs)
 		self.window = window
@@ -71,9 +81,38 @@ class DrImage(Gtk.Box):
 		self.reload_info_bar.connect('close', self.hide_reload_message)
 		self.reload_info_bar.connect('response', self.hide_reload_message)
 
-		# Framerate limit
+		# Framerate limit, scheduled by the frame clock of the drawing area
 		self._rendering_is_locked = False
-		self._framerate_hint = 0
+		self._frames_to_skip = 0
+		self._tick_callback_id = None
+		self._render_cost = 0
+		self._draw_cost = 0
+		self._latency_start = None
+
+		# Cache of the stable state, already converted to a cairo surface, or
+		# split in tiles if the image is large
+		self.surface = None
+		self._main_pixbuf = None
+		self._pixbuf_is_outdated = False
+		self._stable_surface = None
+		self._tiles = None
+		self._tiles_allowed = False
+		self._stable_generation = 0
+		self._cached_generation = -1
+		self._dirty_area = None
+
+		# Damage tracking, to redraw only what changed on the drawing area
+		self._damaged_area = None
+		self._full_damage = True
+		self._drawn_view = None
+
+		# Downscaled copies of the surface, to render it when zoomed out
+		self._mipmaps = DrMipmapManager()
+
+		# Reads the colors of the surface for the tools
+		self._pixel_sampler = None
+		# Areas of uniform color of the surface, computed in the background
+		self._label_map = None
 
 		self._ctrl_pressed = False
 
@@ -151,6 +190,10 @@ class DrImage(Gtk.Box):
 		self._slip_init_x = 0.0
 		self._slip_init_y = 0.0
 
+		# The setting is read once, because switching the backing store while
+		# an image is edited isn't supported
+		self._tiles_allowed = self.window.gsettings.get_boolean('tiled-canvas')
+
 		# Selection initialization
 		self.selection = DrSelectionManager(self)
 
@@ -186,12 +229,17 @@ class DrImage(Gtk.Box):
 	def _apply_state(self, state_op):
 		# restore the state found in the history
 		pixbuf = state_op['pixbuf']
+		tiles = state_op.get('tiles')
 		width = state_op['width']
 		height = state_op['height']
 		self.set_temp_pixbuf(self._new_blank_pixbuf(1, 1))
 		self.selection.init_pixbuf()
 		self.surface = cairo.ImageSurface(cairo.Format.ARGB32, width, height)
-		if pixbuf is None:
+		self._dirty_area = None
+		self._full_damage = True
+		if tiles is not None:
+			self._apply_tiles_state(tiles)
+		elif pixbuf is None:
 			# no pixbuf in the operation: the restored state is a blank one
 			rgba = state_op['rgba']
 			r = rgba.red
@@ -205,8 +253,26 @@ class DrImage(Gtk.Box):
 			self.update()
 			self.set_surface_as_stable_pixbuf()
 		else:
-			self.set_main_pixbuf(state_op['pixbuf'].copy())
+			self.set_main_pixbuf(pixbuf.copy())
+			self.use_stable_pixbuf()
+
+	def _apply_tiles_state(self, tiles):
+		"""Restore a state saved as tiles. The tiles are reused as they are, and
+		the main pixbuf is only built from them when something needs it."""
+		w, h = tiles.get_size()
+		if not self._use_tiles(w, h):
+			# the preference changed since the state was saved
+			pixbuf = Gdk.pixbuf_get_from_surface(tiles.build_surface(), \
+			                                                         0, 0, w, h)
+			self.set_main_pixbuf(pixbuf)
 			self.use_stable_pixbuf()
+			return
+		self._stable_generation += 1
+		self._tiles = tiles.copy()
+		self._stable_surface = None
+		self._pixbuf_is_outdated = True
+		self._cached_generation = self._stable_generation
+		self.use_stable_pixbuf()
 
 	############################################################################
 	# (re)loading the pixbuf of a given file ###################################
@@ -219,6 +285,7 @@ class DrImage(Gtk.Box):
 		                                pixbuf.get_width(), pixbuf.get_height())
 		self.set_main_pixbuf(pixbuf)
 
+	@utilities_traced('DrImage.reload_from_disk', 'io')
 	def reload_from_disk(self):
 		"""Safely reloads the image from the disk."""
 		if self.gfile is None:
@@ -231,6 +298,7 @@ class DrImage(Gtk.Box):
 		self.remember_current_state()
 		self.window.update_picture_title()
 
+	@utilities_traced('DrImage.try_load_file', 'io')
 	def try_load_file(self, gfile):
 		try:
 			self.gfile = gfile
@@ -388,7 +456,12 @@ class DrImage(Gtk.Box):
 		return self._history.get_saved()
 
 	def remember_current_state(self):
-		self._history.add_state(self.main_pixbuf.copy())
+		if self._tiles is None:
+			self._history.add_state(self.main_pixbuf.copy())
+		else:
+			# the snapshot shares the tiles, and getting `main_pixbuf` would
+			# build it from the tiles for nothing
+			self._history.add_state(None, self._tiles.copy())
 
 	def update_history_sensitivity(self):
 		self.set_action_sensitivity('undo', self._history.can_undo())
@@ -435,10 +508,15 @@ class DrImage(Gtk.Box):
 	############################################################################
 	# Drawing area, main pixbuf, and surface management ########################
 
+	@utilities_traced('DrImage.on_draw', 'rendering')
 	def on_draw(self, area, cairo_context):
 		"""Signal callback. Executed when self._drawing_area is redrawn."""
 		if self.window.devel_mode:
 			self._fps_counter += 1
+		draw_start = GLib.get_monotonic_time()
+		# If the redraw has been queued with `queue_draw_area`, GTK already
+		# clipped the context to the damaged area, so painting is cheap.
+		self._drawn_view = (self.scroll_x, self.scroll_y, self.zoom_level)
 
 		# Background color
 		cairo_context.set_source_rgba(*self._bg_rgba)
@@ -448,11 +526,22 @@ class DrImage(Gtk.Box):
 		cairo_context.scale(self.zoom_level, self.zoom_level)
 
 		# Image (with scroll position)
-		cairo_context.set_source_surface(self.get_surface(), \
-		                                 -1 * self.scroll_x, -1 * self.scroll_y)
-		if self.is_zoomed_surface_sharp():
-			cairo_context.get_source().set_filter(cairo.FILTER_NEAREST)
-		cairo_context.paint()
+		surface, level_scale = self._mipmaps.get_surface_for_zoom( \
+		                                      self.get_surface(), self.zoom_level)
+		if level_scale != 1.0:
+			# Zoomed out: a smaller copy of the surface is painted instead
+			cairo_context.save()
+			cairo_context.scale(1 / level_scale, 1 / level_scale)
+			cairo_context.set_source_surface(surface, \
+			      -1 * self.scroll_x * level_scale, -1 * self.scroll_y * level_scale)
+			cairo_context.paint()
+			cairo_context.restore()
+		elif self.is_zoomed_surface_sharp():
+			self._paint_visible_part(cairo_context, surface)
+		else:
+			cairo_context.set_source_surface(surface, \
+			                                 -1 * self.scroll_x, -1 * self.scroll_y)
+			cairo_context.paint()
 
 		# What the tool shows on the canvas, upon what it paints, for example an
 		# overlay to imply how to interact with a previewed operation.
@@ -463,6 +552,30 @@ class DrImage(Gtk.Box):
 		                              self.get_pixbuf_width() - self.scroll_x, \
 		                             self.get_pixbuf_height() - self.scroll_y)
 
+		draw_end = GLib.get_monotonic_time()
+		self._draw_cost = draw_end - draw_start
+		if self.window.should_track_framerate:
+			self._add_profiler_samples(cairo_context, draw_end)
+
+	def _paint_visible_part(self, cairo_context, surface):
+		"""Paint with crisp pixels only the part of the surface which is both
+		visible and in the clip of the context, so the cost of the upscaling
+		depends on the size of the widget, not on the size of the image."""
+		clip_x1, clip_y1, clip_x2, clip_y2 = cairo_context.clip_extents()
+		x1 = max(0, math.floor(clip_x1 + self.scroll_x))
+		y1 = max(0, math.floor(clip_y1 + self.scroll_y))
+		x2 = min(surface.get_width(), math.ceil(clip_x2 + self.scroll_x))
+		y2 = min(surface.get_height(), math.ceil(clip_y2 + self.scroll_y))
+		if x2 <= x1 or y2 <= y1:
+			return
+		visible_part = surface.create_for_rectangle(x1, y1, x2 - x1, y2 - y1)
+		cairo_context.set_source_surface(visible_part, x1 - self.scroll_x, \
+		                                                   y1 - self.scroll_y)
+		cairo_context.get_source().set_filter(cairo.FILTER_NEAREST)
+		cairo_context.rectangle(x1 - self.scroll_x, y1 - self.scroll_y, \
+		                                                   x2 - x1, y2 - y1)
+		cairo_context.fill()
+
 	def on_press_on_area(self, area, event):
 		"""Signal callback. Executed when a mouse button is pressed on
 		self._drawing_area, if the button is the mouse wheel the colors are
@@ -481,6 +594,7 @@ class DrImage(Gtk.Box):
 			return
 		self.motion_behavior = DrMotionBehavior.DRAW
 		self._is_pressed = True
+		self._start_render_scheduling()
 		self.window.set_window_subtitles()
 		# subtitles must be generated *before* calling the tool, otherwise any
 		# property changed by a modifier would be reset by `get_editing_tips`
@@ -501,15 +615,20 @@ class DrImage(Gtk.Box):
 
 		elif self.motion_behavior == DrMotionBehavior.DRAW:
 			# implicitly impossible if not self._is_pressed
+			should_render = not self._rendering_is_locked
+			render_start = GLib.get_monotonic_time()
 			self.active_tool().on_motion_on_area(event, self.surface, event_x, \
-			                                 event_y, self._rendering_is_locked)
-			if self._rendering_is_locked:
+			                                           event_y, should_render)
+			if not should_render:
 				if self.window.devel_mode:
 					self._skipped_frames += 1
 				return
-			self._rendering_is_locked = True
+			render_cost = GLib.get_monotonic_time() - render_start
+			self._render_cost = (self._render_cost + render_cost) / 2
+			if self._latency_start is None:
+				self._latency_start = render_start
+			self._lock_rendering()
 			self.update()
-			GLib.timeout_add(self._framerate_hint, self._async_unlock, {})
 
 		else: # self.motion_behavior == DrMotionBehavior.SLIP:
 			self.scroll_x = self._slip_init_x
@@ -542,6 +661,7 @@ class DrImage(Gtk.Box):
 			self.motion_behavior = DrMotionBehavior.HOVER
 			return
 		self.motion_behavior = DrMotionBehavior.HOVER
+		self._stop_render_scheduling()
 		event_x, event_y = self.get_event_coords(event)
 		self.active_tool().on_release_on_area(event, self.surface, event_x, event_y)
 		self._is_pressed = False
@@ -561,17 +681,97 @@ class DrImage(Gtk.Box):
 		return self.active_tool().get_tooltip(ev_x, ev_y ,self.motion_behavior)
 
 	def update(self):
-		# print('image.py: _drawing_area.queue_draw')
+		"""Queue a redraw of the drawing area. If the damaged area of the
+		surface is known, and if the view didn't move since the last redraw,
+		only this area is redrawn."""
+		if not self._full_damage and self._damaged_area is None:
+			# something may have changed, but nothing has been reported
+			self._mipmaps.invalidate()
+		current_view = (self.scroll_x, self.scroll_y, self.zoom_level)
+		if self._full_damage or self._damaged_area is None \
+		or self._drawn_view != current_view:
+			# print('image.py: _drawing_area.queue_draw')
+			self._drawing_area.queue_draw()
+		else:
+			self._drawing_area.queue_draw_area(*self._get_damaged_widget_area())
+			if self.window.should_track_framerate:
+				overlay_area = self.window.profiler.get_overlay_extents(8, 8)
+				self._drawing_area.queue_draw_area(*overlay_area)
+		self._damaged_area = None
+		self._full_damage = False
+
+	def update_view(self):
+		"""Queue a redraw of the whole drawing area, when the scroll position or
+		the zoom level changed but the pixels of the surface didn't."""
 		self._drawing_area.queue_draw()
 
-	def _async_unlock(self, content_params={}):
-		"""This is used as a GSourceFunc so it should return False."""
-		self._rendering_is_locked = False
-		return False
+	def _add_damage(self, area):
+		self._mipmaps.invalidate(area)
+		if self._damaged_area is None:
+			self._damaged_area = list(area)
+			return
+		self._damaged_area[0] = min(area[0], self._damaged_area[0])
+		self._damaged_area[1] = min(area[1], self._damaged_area[1])
+		self._damaged_area[2] = max(area[2], self._damaged_area[2])
+		self._damaged_area[3] = max(area[3], self._damaged_area[3])
+
+	def _get_damaged_widget_area(self):
+		"""Convert the damaged area of the surface to a rectangle (x, y, width,
+		height) in the coordinates of the drawing area, depending on the scroll
+		position and the zoom level. The margin covers the pixels blended by
+		the filter when the surface is zoomed."""
+		x1, y1, x2, y2 = self._damaged_area
+		margin = math.ceil(self.zoom_level) + 1
+		wx1 = math.floor((x1 - self.scroll_x) * self.zoom_level) - margin
+		wy1 = math.floor((y1 - self.scroll_y) * self.zoom_level) - margin
+		wx2 = math.ceil((x2 - self.scroll_x) * self.zoom_level) + margin
+		wy2 = math.ceil((y2 - self.scroll_y) * self.zoom_level) + margin
+		return wx1, wy1, wx2 - wx1, wy2 - wy1
 
 	def get_surface(self):
 		return self.surface
 
+	def get_pixel_sampler(self):
+		"""Returns an object reading the colors of the pixels of the surface.
+		It's replaced when the stable state changes, or when the surface is
+		replaced (for example because the size of the image changed)."""
+		if self._pixel_sampler is None or not self._pixel_sampler.is_valid_for( \
+		                                  self.surface, self._stable_generation):
+			self._pixel_sampler = DrPixelSampler(self.surface, \
+			                                              self._stable_generation)
+		return self._pixel_sampler
+
+	def get_label_map(self):
+		"""Returns the map of the areas of uniform color of the surface, if it
+		has been computed for the current stable state, else None."""
+		label_map = self._label_map
+		if label_map is None or not label_map.is_ready() \
+		or not label_map.is_valid_for(self.surface, self._stable_generation):
+			return None
+		return label_map
+
+	def prepare_label_map(self):
+		"""Start computing in a thread the map of the areas of uniform color of
+		the surface, unless it's already done (or ongoing) for the current
+		stable state, or the image is too big. The active tool is notified
+		when it's ready."""
+		if not DrLabelMap.is_available():
+			return
+		w = self.surface.get_width()
+		h = self.surface.get_height()
+		if w * h > self.LABEL_MAP_MAX_PIXELS:
+			return
+		if self._label_map is not None:
+			if self._label_map.is_valid_for(self.surface, self._stable_generation):
+				return
+			self._label_map.cancel()
+		self._label_map = DrLabelMap(self.surface, self._stable_generation)
+		self._label_map.compute_async(self._on_label_map_ready)
+
+	def _on_label_map_ready(self, label_map):
+		if label_map is self._label_map and self.window.get_active_image() is self:
+			self.active_tool().on_label_map_ready()
+
 	def on_enter_image(self, *args):
 		self.window.set_cursor(True)
 
@@ -587,26 +787,132 @@ class DrImage(Gtk.Box):
 	def set_surface_as_stable_pixbuf(self):
 		w = self.surface.get_width()
 		h = self.surface.get_height()
-		self.main_pixbuf = Gdk.pixbuf_get_from_surface(self.surface, 0, 0, w, h)
-		self._framerate_hint = math.sqrt(w * h) - 1000
-		self._framerate_hint = int(self._framerate_hint * 0.2)
-		# between 500 and 33ms (= between 2 and 30 fps)
-		self._framerate_hint = max(33, min(500, self._framerate_hint))
-		# print("image.py: hint =", self._framerate_hint)
+		self._stable_generation += 1
+		if self._tiles is not None and self._tiles.get_size() == (w, h):
+			# Only the tiles modified since the last restoration are updated,
+			# and the conversion to a pixbuf is delayed until it's needed.
+			self._tiles.load_surface(self.surface, self._dirty_area)
+			self._pixbuf_is_outdated = True
+			self._cached_generation = self._stable_generation
+		else:
+			self.main_pixbuf = Gdk.pixbuf_get_from_surface(self.surface, \
+			                                                         0, 0, w, h)
+			# The surface is already the stable state, so the cache is updated
+			# without converting the new main pixbuf again.
+			self._update_stable_cache(self.surface)
+		self._dirty_area = None
 
 	def use_stable_pixbuf(self):
 		"""This is called by tools' `restore_pixbuf`, so at the beginning of
-		each operation (even unapplied)."""
-		# maybe the "scale" parameter should be 1 instead of 0
-		self.surface = Gdk.cairo_surface_create_from_pixbuf(self.main_pixbuf, 0, None)
+		each operation (even unapplied). The stable surface is converted from
+		the main pixbuf only if the stable state changed, and only the area
+		modified by the previous preview is restored, if it's known."""
+		if self._cached_generation != self._stable_generation:
+			# maybe the "scale" parameter should be 1 instead of 0
+			new_surface = Gdk.cairo_surface_create_from_pixbuf( \
+			                                         self.main_pixbuf, 0, None)
+			self._update_stable_cache(new_surface)
+		if self._label_map is not None:
+			self._label_map.release_surface()
+		w = self.get_pixbuf_width()
+		h = self.get_pixbuf_height()
+		if self.surface is None \
+		or self.surface.get_width() != w or self.surface.get_height() != h:
+			self.surface = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+			self.surface.set_device_scale(self.SCALE_FACTOR, self.SCALE_FACTOR)
+			self._dirty_area = None
+
+		cairo_context = cairo.Context(self.surface)
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		if self._dirty_area is None:
+			self._full_damage = True
+			self._mipmaps.invalidate()
+		else:
+			x1, y1, x2, y2 = self._dirty_area
+			cairo_context.rectangle(x1, y1, x2 - x1, y2 - y1)
+			cairo_context.clip()
+			self._add_damage(self._dirty_area)
+		if self._tiles is None:
+			cairo_context.set_source_surface(self._stable_surface, 0, 0)
+			cairo_context.paint()
+		else:
+			self._tiles.paint_on(cairo_context, self._dirty_area)
 		# print('image.py: use_stable_pixbuf')
-		self.surface.set_device_scale(self.SCALE_FACTOR, self.SCALE_FACTOR)
+		self._dirty_area = None
+
+	def add_dirty_area(self, x1, y1, x2, y2):
+		"""Tools can tell which area of the surface they modified since the
+		last restoration (for example using `cairo_context.stroke_extents()`),
+		so the next call to `use_stable_pixbuf` restores only this area, and
+		the next call to `update` redraws only this area. If nothing is told,
+		the whole surface will be restored and redrawn."""
+		area = [math.floor(x1) - 1, math.floor(y1) - 1, \
+		                                 math.ceil(x2) + 1, math.ceil(y2) + 1]
+		self._add_damage(area)
+		if self._dirty_area is None:
+			self._dirty_area = area
+			return
+		self._dirty_area[0] = min(area[0], self._dirty_area[0])
+		self._dirty_area[1] = min(area[1], self._dirty_area[1])
+		self._dirty_area[2] = max(area[2], self._dirty_area[2])
+		self._dirty_area[3] = max(area[3], self._dirty_area[3])
+
+	def get_stable_generation(self):
+		"""An integer incremented each time the stable state (the main pixbuf)
+		changes, so anything computed from it can know if it's outdated."""
+		return self._stable_generation
+
+	def _use_tiles(self, w, h):
+		return self._tiles_allowed and w * h >= self.TILES_THRESHOLD
+
+	def _update_stable_cache(self, source_surface):
+		"""Store the stable state, either as tiles or as a single surface."""
+		w = source_surface.get_width()
+		h = source_surface.get_height()
+		if self._use_tiles(w, h):
+			self._stable_surface = None
+			self._tiles = DrTilesManager(w, h)
+			self._tiles.load_surface(source_surface)
+			self._cached_generation = self._stable_generation
+			return
+		self._tiles = None
+		if self._stable_surface is None \
+		or self._stable_surface.get_width() != w \
+		or self._stable_surface.get_height() != h:
+			self._stable_surface = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+			self._stable_surface.set_device_scale(self.SCALE_FACTOR, \
+			                                                 self.SCALE_FACTOR)
+		cairo_context = cairo.Context(self._stable_surface)
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		cairo_context.set_source_surface(source_surface, 0, 0)
+		cairo_context.paint()
+		self._cached_generation = self._stable_generation
+
+	def _get_main_pixbuf(self):
+		if self._pixbuf_is_outdated:
+			# the tiles changed but the pixbuf hasn't been generated yet
+			w, h = self._tiles.get_size()
+			surface = self._tiles.build_surface()
+			self._main_pixbuf = Gdk.pixbuf_get_from_surface(surface, 0, 0, w, h)
+			self._pixbuf_is_outdated = False
+		return self._main_pixbuf
+
+	def _set_main_pixbuf(self, new_pixbuf):
+		self._main_pixbuf = new_pixbuf
+		self._pixbuf_is_outdated = False
+
+	main_pixbuf = property(_get_main_pixbuf, _set_main_pixbuf)
 
 	def get_pixbuf_width(self):
-		return self.main_pixbuf.get_width()
+		# the size is always up-to-date, even if the pixels are outdated
+		if self._pixbuf_is_outdated:
+			return self._tiles.get_size()[0]
+		return self._main_pixbuf.get_width()
 
 	def get_pixbuf_height(self):
-		return self.main_pixbuf.get_height()
+		if self._pixbuf_is_outdated:
+			return self._tiles.get_size()[1]
+		return self._main_pixbuf.get_height()
 
 	def set_main_pixbuf(self, new_pixbuf):
 		"""Safely set a pixbuf as the main one (not used everywhere internally
@@ -615,6 +921,53 @@ class DrImage(Gtk.Box):
 			raise NoPixbufNoChangeException('main_pixbuf')
 		else:
 			self.main_pixbuf = new_pixbuf
+			self._stable_generation += 1
+
+	############################################################################
+	# Rendering scheduled by the frame clock ###################################
+
+	def _start_render_scheduling(self):
+		self._rendering_is_locked = False
+		if self._tick_callback_id is None:
+			self._tick_callback_id = self._drawing_area.add_tick_callback( \
+			                                                   self._on_frame_tick)
+
+	def _stop_render_scheduling(self):
+		self._rendering_is_locked = False
+		if self._tick_callback_id is not None:
+			self._drawing_area.remove_tick_callback(self._tick_callback_id)
+			self._tick_callback_id = None
+
+	def _lock_rendering(self):
+		"""Prevent tools from rendering their preview again until enough frames
+		have been displayed. The number of frames to wait for is based on the
+		measured cost of the previous previews and redraws, compared to the
+		refresh interval of the display, so a preview is rendered at most once
+		per frame, and less often if it's slower than a frame."""
+		frame_interval = self._get_frame_interval()
+		cost = self._render_cost + self._draw_cost
+		self._frames_to_skip = max(1, math.ceil(cost / frame_interval))
+		self._rendering_is_locked = True
+
+	def _get_frame_interval(self):
+		"""Returns the refresh interval of the display, in microseconds."""
+		frame_clock = self._drawing_area.get_frame_clock()
+		if frame_clock is None:
+			return 16667
+		refresh_interval, presentation_time = frame_clock.get_refresh_info( \
+		                                             frame_clock.get_frame_time())
+		if refresh_interval <= 0:
+			return 16667
+		return refresh_interval
+
+	def _on_frame_tick(self, widget, frame_clock):
+		"""This is used as a GtkTickCallback, so it should return True to be
+		called again at the next frame."""
+		if self._rendering_is_locked:
+			self._frames_to_skip -= 1
+			if self._frames_to_skip <= 0:
+				self._rendering_is_locked = False
+		return True
 
 	############################################################################
 	# Temporary pixbuf management ##############################################
@@ -633,6 +986,26 @@ class DrImage(Gtk.Box):
 	############################################################################
 	# Framerate tracking (debug only) ##########################################
 
+	def _add_profiler_samples(self, cairo_context, draw_end):
+		"""Development only: record the duration of the redraw, and the latency
+		between the oldest motion event rendered by this frame and the moment
+		the frame should be presented, then paint the profiler's histograms."""
+		profiler = self.window.profiler
+		profiler.add_sample('draw', self._draw_cost)
+		if self._latency_start is not None:
+			presentation_time = draw_end
+			frame_clock = self._drawing_area.get_frame_clock()
+			if frame_clock is not None:
+				# the frame is displayed at the next refresh of the screen
+				next_frame = frame_clock.get_frame_time() + \
+				                                       self._get_frame_interval()
+				presentation_time = max(draw_end, next_frame)
+			latency = presentation_time - self._latency_start
+			profiler.add_sample('latency', latency, self.active_tool().id)
+			self._latency_start = None
+		cairo_context.identity_matrix()
+		profiler.draw_overlay(cairo_context, 8, 8)
+
 	def reset_fps_counter(self, async_cb_data={}):
 		"""Development only: live-display the evolution of the framerate of the
 		drawing area. The max should be around 60, but many tools don't require
@@ -642,6 +1015,9 @@ class DrImage(Gtk.Box):
 			# Context: this is a debug information that users will never see
 			msg = _("%s frames per second") % self._fps_counter
 			msg += " (" + str(self._skipped_frames) + " motion inputs skipped)"
+			summary = self.window.profiler.get_summary()
+			if summary != "":
+				msg += " – " + summary
 			self.window.reveal_message(msg)
 			self._fps_counter = 0
 			self._skipped_frames = 0
@@ -668,7 +1044,20 @@ class DrImage(Gtk.Box):
 		else:
 			mw = preview_size
 			mh = preview_size * (mpb_height/mpb_width)
-		return self.main_pixbuf.scale_simple(mw, mh, GdkPixbuf.InterpType.TILES)
+		mw = max(1, int(mw))
+		mh = max(1, int(mh))
+		# The pyramid used to render the zoomed out canvas is reused, so only
+		# a small level is scaled down to the size of the minimap.
+		ratio = mw / mpb_width
+		surface, level_scale = self._mipmaps.get_surface_for_zoom( \
+		                                               self.get_surface(), ratio)
+		mini_surface = cairo.ImageSurface(cairo.Format.ARGB32, mw, mh)
+		cairo_context = cairo.Context(mini_surface)
+		cairo_context.scale(ratio / level_scale, ratio / level_scale)
+		cairo_context.set_source_surface(surface, 0, 0)
+		cairo_context.get_source().set_filter(cairo.FILTER_GOOD)
+		cairo_context.paint()
+		return Gdk.pixbuf_get_from_surface(mini_surface, 0, 0, mw, mh)
 
 	def get_minimap_need_overlay(self):
 		mpb_width = self.get_pixbuf_width()
@@ -769,7 +1158,7 @@ class DrImage(Gtk.Box):
 
 	def on_scrollbar_value_change(self, scrollbar):
 		self.correct_coords(self._h_scrollbar.get_value(), self._v_scrollbar.get_value())
-		self.update() # allowing imperfect framerate would likely be useless
+		self.update_view() # allowing imperfect framerate would likely be useless
 
 	def reset_deltas(self, delta_x, delta_y):
 		if delta_x > 0:
@@ -857,7 +1246,7 @@ class DrImage(Gtk.Box):
 		if self.is_zoomed_surface_sharp():
 			self.window.minimap.set_zoom_label(self.zoom_level * 100)
 		self.fake_scrollbar_update()
-		self.update()
+		self.update_view()
 
 	def set_opti_zoom_level(self, *args):
 		allocated_width = self.get_widget_width()
@@ -0,0 +1,224 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo, threading
+from gi.repository import GLib
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency: without it, there is no label map, and
+	# the tools find the area clicked by the user with a flood fill.
+	numpy = None
+
+################################################################################
+
+class DrLabelMap():
+	"""Map of the connected areas of pixels of exactly the same color of a
+	surface: each pixel is labeled with the area it belongs to. The labeling
+	is computed once (in a thread), and then the area of any pixel is a simple
+	lookup, so clicking on many areas of the same image doesn't analyze it
+	again each time. Like a pixel sampler, a map is bound to one surface and
+	one generation of the stable state."""
+	__gtype_name__ = 'DrLabelMap'
+
+	def __init__(self, surface, generation, **kwargs):
+		self._surface = surface
+		self._generation = generation
+		self._width = surface.get_width()
+		self._height = surface.get_height()
+		self._cancelled = threading.Event()
+		# The pixels are copied at the beginning of the thread, so the surface
+		# can change during the rest of the computation. Until they are, the
+		# image has to call `release_surface` before modifying the surface.
+		surface.flush()
+		self._pixels = None
+		self._copy_lock = threading.Lock()
+		self._is_copied = False
+		# Results: the label of each pixel, and the bounding box of each area
+		# as 4 arrays (x1, y1, x2, y2) indexed by the labels.
+		self._labels = None
+		self._boxes = None
+		self._outline = None
+
+	@staticmethod
+	def is_available():
+		return numpy is not None
+
+	def is_valid_for(self, surface, generation):
+		return surface is self._surface and generation == self._generation \
+		                                        and not self._cancelled.is_set()
+
+	def is_ready(self):
+		return self._labels is not None
+
+	def cancel(self):
+		self._cancelled.set()
+
+	def release_surface(self):
+		"""Called before the surface is modified: if the thread hasn't copied
+		the pixels yet, the map is cancelled, since it wouldn't match the
+		stable state anymore."""
+		with self._copy_lock:
+			if not self._is_copied:
+				self._cancelled.set()
+
+	############################################################################
+	# Computation in the background ############################################
+
+	def compute_async(self, callback):
+		"""Compute the labels in a thread, and then call `callback` with the map
+		as its argument, in the main thread."""
+		thread = threading.Thread(target=self._run, args=(callback,), \
+		                                                            daemon=True)
+		thread.start()
+
+	def _run(self, callback):
+		try:
+			self._copy_pixels()
+			self._compute()
+		except Exception as e:
+			# the map is never ready, and the tools keep using flood fills
+			print(e)
+		self._pixels = None
+		GLib.idle_add(self._on_computed, callback)
+
+	def _on_computed(self, callback):
+		"""This is used as a GSourceFunc so it should return False."""
+		if self.is_ready() and not self._cancelled.is_set():
+			callback(self)
+		return False
+
+	def _copy_pixels(self):
+		with self._copy_lock:
+			if self._cancelled.is_set():
+				return
+			stride = self._surface.get_stride()
+			pixels = numpy.frombuffer(self._surface.get_data(), dtype=numpy.uint32)
+			pixels = pixels.reshape(self._height, stride // 4)
+			self._pixels = pixels[:, :self._width].copy()
+			self._is_copied = True
+
+	@utilities_traced('DrLabelMap._compute', 'tools')
+	def _compute(self):
+		"""The pixels are grouped in runs (horizontal segments of pixels of the
+		same color), then the runs of consecutive rows are merged if they have
+		the same color and touch each other."""
+		pixels = self._pixels
+		if pixels is None:
+			return
+		h, w = pixels.shape
+		is_start = numpy.ones((h, w), dtype=bool)
+		numpy.not_equal(pixels[:, 1:], pixels[:, :-1], out=is_start[:, 1:])
+		run_ids = numpy.cumsum(is_start, dtype=numpy.int32).reshape(h, w)
+		run_ids -= 1
+		nb_runs = int(run_ids[-1, -1]) + 1
+
+		# Two runs connected vertically overlap from the start of one of them,
+		# so the pixels where a run starts are enough to find each connection
+		# once.
+		connected = (pixels[1:] == pixels[:-1])
+		connected &= (is_start[1:] | is_start[:-1])
+		roots = self._merge_runs(run_ids[:-1][connected], \
+		                                    run_ids[1:][connected], nb_runs)
+		del connected
+		if roots is None:
+			return
+
+		starts = numpy.flatnonzero(is_start)
+		del is_start
+		runs_y = (starts // w).astype(numpy.int32)
+		runs_x1 = (starts % w).astype(numpy.int32)
+		runs_x2 = numpy.full(nb_runs, w, dtype=numpy.int32)
+		same_row = (runs_y[1:] == runs_y[:-1])
+		runs_x2[:-1][same_row] = runs_x1[1:][same_row]
+
+		# The label of an area is the index of its first run, so its first row
+		# is the row of this run.
+		boxes_x1 = numpy.full(nb_runs, w, dtype=numpy.int32)
+		boxes_x2 = numpy.zeros(nb_runs, dtype=numpy.int32)
+		boxes_y2 = numpy.zeros(nb_runs, dtype=numpy.int32)
+		numpy.minimum.at(boxes_x1, roots, runs_x1)
+		numpy.maximum.at(boxes_x2, roots, runs_x2)
+		numpy.maximum.at(boxes_y2, roots, runs_y + 1)
+		if self._cancelled.is_set():
+			return
+		self._boxes = (boxes_x1, runs_y, boxes_x2, boxes_y2)
+		self._labels = roots[run_ids]
+
+	def _merge_runs(self, runs_a, runs_b, nb_runs):
+		"""Returns, for each run, the lowest index of the runs it's connected to
+		through the pairs (runs_a[i], runs_b[i]). At each step, the root of
+		each tree of runs is attached to the lowest root it's connected to, so
+		the number of trees is at least halved; then every run is attached
+		directly to its root."""
+		roots = numpy.arange(nb_runs, dtype=numpy.int32)
+		while len(runs_a) > 0:
+			if self._cancelled.is_set():
+				return None
+			roots_a = roots[runs_a]
+			roots_b = roots[runs_b]
+			different = (roots_a != roots_b)
+			runs_a, runs_b = runs_a[different], runs_b[different]
+			roots_a, roots_b = roots_a[different], roots_b[different]
+			lower = numpy.minimum(roots_a, roots_b)
+			numpy.minimum.at(roots, numpy.maximum(roots_a, roots_b), lower)
+			while True:
+				next_roots = roots[roots]
+				if numpy.array_equal(next_roots, roots):
+					break
+				roots = next_roots
+		return roots
+
+	############################################################################
+	# Lookups ##################################################################
+
+	def get_label(self, x, y):
+		"""Returns the label of the area of the pixel at the given coordinates,
+		or None if they're outside of the surface."""
+		x, y = int(x), int(y)
+		if x < 0 or y < 0 or x >= self._width or y >= self._height:
+			return None
+		return int(self._labels[y, x])
+
+	def get_area_mask(self, x, y):
+		"""Returns the area of the pixel at the given coordinates as a tuple
+		(mask, x, y), where the mask is an A8 surface of the size of the
+		bounding box of the area, and (x, y) the position of this box. Returns
+		None if the coordinates are outside of the surface."""
+		label = self.get_label(x, y)
+		if label is None:
+			return None
+		x1, y1, x2, y2 = [int(coords[label]) for coords in self._boxes]
+		area = (self._labels[y1:y2, x1:x2] == label)
+		return self._build_mask(area), x1, y1
+
+	def get_area_outline(self, x, y):
+		"""Same as `get_area_mask`, but only the pixels on the edges of the area
+		are opaque. The result is cached, so it's the same object as long as
+		the coordinates stay in the same area."""
+		label = self.get_label(x, y)
+		if label is None:
+			return None
+		if self._outline is None or self._outline[0] != label:
+			x1, y1, x2, y2 = [int(coords[label]) for coords in self._boxes]
+			area = (self._labels[y1:y2, x1:x2] == label)
+			padded = numpy.pad(area, 1)
+			inside = padded[:-2, 1:-1] & padded[2:, 1:-1] \
+			                              & padded[1:-1, :-2] & padded[1:-1, 2:]
+			mask = self._build_mask(area & ~inside)
+			self._outline = (label, (mask, x1, y1))
+		return self._outline[1]
+
+	def _build_mask(self, area):
+		height, width = area.shape
+		mask = cairo.ImageSurface(cairo.Format.A8, width, height)
+		mask_array = numpy.frombuffer(mask.get_data(), dtype=numpy.uint8)
+		mask_array = mask_array.reshape(height, mask.get_stride())[:, :width]
+		mask_array[area] = 255
+		mask.mark_dirty()
+		return mask
+
+	############################################################################
+################################################################################
+
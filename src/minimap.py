@@ -116,7 +116,7 @@ class DrMinimap(Gtk.Popover):
 		image = self._window.get_active_image()
 		if image.zoom_level != zoom_value / 100:
 			image.zoom_level = zoom_value / 100
-			image.update()
+			image.update_view()
 		self.set_zoom_label(image.zoom_level * 100)
 
 	def _on_popover_dismissed(self, *args):
@@ -0,0 +1,98 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo, math
+
+################################################################################
+
+class DrMipmapManager():
+	"""Pyramid of downscaled copies (1/2, 1/4, ...) of the surface displayed by
+	an image. Levels are built lazily, when a zoom level needs them, and only
+	the damaged parts of the existing levels are downscaled again."""
+	__gtype_name__ = 'DrMipmapManager'
+
+	MAX_LEVELS = 6
+
+	def __init__(self, **kwargs):
+		self._source = None
+		self._levels = []
+		self._all_outdated = True
+		self._outdated_area = None
+
+	def invalidate(self, area=None):
+		"""Tell the manager which area (x1, y1, x2, y2 in image coordinates) of
+		the source surface changed. If the area is None, everything changed."""
+		if area is None:
+			self._all_outdated = True
+			self._outdated_area = None
+		elif self._all_outdated:
+			return
+		elif self._outdated_area is None:
+			self._outdated_area = list(area)
+		else:
+			self._outdated_area[0] = min(area[0], self._outdated_area[0])
+			self._outdated_area[1] = min(area[1], self._outdated_area[1])
+			self._outdated_area[2] = max(area[2], self._outdated_area[2])
+			self._outdated_area[3] = max(area[3], self._outdated_area[3])
+
+	def get_surface_for_zoom(self, source, zoom_level):
+		"""Returns the smallest level still larger than the source surface
+		zoomed at `zoom_level`, and the scale of this level compared to the
+		source (1.0 if the source itself should be used)."""
+		nb_levels = 0
+		while nb_levels < self.MAX_LEVELS and zoom_level <= 0.5 ** (nb_levels + 1):
+			nb_levels += 1
+		if nb_levels == 0:
+			return source, 1.0
+		self._refresh(source, nb_levels)
+		return self._levels[nb_levels - 1], 0.5 ** nb_levels
+
+	############################################################################
+
+	def _refresh(self, source, nb_levels):
+		if source is not self._source:
+			self._source = source
+			self._all_outdated = True
+		if self._all_outdated:
+			self._levels = []
+			self._all_outdated = False
+			self._outdated_area = None
+		elif self._outdated_area is not None:
+			x1, y1, x2, y2 = self._outdated_area
+			previous = self._source
+			for level in self._levels:
+				x1, y1 = math.floor(x1 / 2) - 1, math.floor(y1 / 2) - 1
+				x2, y2 = math.ceil(x2 / 2) + 1, math.ceil(y2 / 2) + 1
+				self._downscale(previous, level, (x1, y1, x2, y2))
+				previous = level
+			self._outdated_area = None
+
+		while len(self._levels) < nb_levels:
+			if len(self._levels) == 0:
+				previous = self._source
+			else:
+				previous = self._levels[-1]
+			w = max(1, math.ceil(previous.get_width() / 2))
+			h = max(1, math.ceil(previous.get_height() / 2))
+			level = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+			self._downscale(previous, level, None)
+			self._levels.append(level)
+
+	def _downscale(self, previous, level, area):
+		"""Paint the previous level at half its size on the given level. With
+		a bilinear filter and a scale of exactly 1/2, each pixel is the average
+		of the 4 pixels it replaces."""
+		cairo_context = cairo.Context(level)
+		if area is not None:
+			x1, y1, x2, y2 = area
+			cairo_context.rectangle(x1, y1, x2 - x1, y2 - y1)
+			cairo_context.clip()
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		cairo_context.scale(0.5, 0.5)
+		cairo_context.set_source_surface(previous, 0, 0)
+		cairo_context.get_source().set_filter(cairo.FILTER_BILINEAR)
+		cairo_context.get_source().set_extend(cairo.Extend.PAD)
+		cairo_context.paint()
+
+	############################################################################
+################################################################################
+
@@ -35,6 +35,7 @@ class OptionsBarFilters(AbstractOptionsBar):
 		self.menu_btn.set_menu_model(self.filters_tool.get_options_model())
 		self._menu_label = builder.get_object('menu_label')
 		self._menu_icon = builder.get_object('menu_icon')
+		self._progress_bar = builder.get_object('progress_bar')
 
 	def add_spinbtn(self, caption, adj_as_array, spin_chars, unit):
 		widget_label = Gtk.Label(label=caption)
@@ -44,11 +45,24 @@ class OptionsBarFilters(AbstractOptionsBar):
 		adj.configure(*adj_as_array)
 		widget_spinbtn.set_adjustment(adj)
 		utilities_add_unit_to_spinbtn(widget_spinbtn, spin_chars, unit)
+		widget_spinbtn.connect('value-changed', self._on_value_changed)
 
 		self.centered_box.add(widget_label)
 		self.centered_box.add(widget_spinbtn)
 		return widget_label, widget_spinbtn
 
+	def _on_value_changed(self, *args):
+		self.filters_tool.on_options_changed()
+
+	def set_progress(self, fraction):
+		"""Show the progress of the filter computed in the background, or hide
+		the progress bar if `fraction` is None."""
+		if fraction is None:
+			self._progress_bar.set_visible(False)
+		else:
+			self._progress_bar.set_fraction(fraction)
+			self._progress_bar.set_visible(True)
+
 	############################################################################
 
 	def init_adaptability(self):
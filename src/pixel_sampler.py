@@ -0,0 +1,68 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import sys
+
+################################################################################
+
+class DrPixelSampler():
+	"""Reads the colors of the pixels of an ARGB32 surface directly from its
+	data, without copying it. The values are unpremultiplied RGBA integers
+	between 0 and 255, like the pixels of a GdkPixbuf. A sampler is bound to
+	one surface: it doesn't copy anything, so it always reads the current
+	pixels, but it must be replaced if the surface is replaced."""
+	__gtype_name__ = 'DrPixelSampler'
+
+	# Order of the channels in the memory: each pixel is a native-endian 32
+	# bits integer, so the blue byte comes first on little-endian machines.
+	if sys.byteorder == 'little':
+		CHANNELS = (2, 1, 0, 3)
+	else:
+		CHANNELS = (1, 2, 3, 0)
+
+	def __init__(self, surface, generation=None, **kwargs):
+		self._surface = surface
+		self._generation = generation
+		self._width = surface.get_width()
+		self._height = surface.get_height()
+		self._stride = surface.get_stride()
+		self._data = surface.get_data()
+
+	def is_valid_for(self, surface, generation=None):
+		return surface is self._surface and generation == self._generation
+
+	############################################################################
+
+	def get_rgba(self, x, y):
+		"""Returns the (red, green, blue, alpha) tuple of the pixel at the given
+		coordinates, or None if they're outside of the surface."""
+		self._surface.flush()
+		return self._read_pixel(x, y)
+
+	def get_rgba_list(self, points):
+		"""Returns the colors of several (x, y) points at once, with None for
+		the points outside of the surface."""
+		self._surface.flush()
+		return [self._read_pixel(x, y) for x, y in points]
+
+	############################################################################
+
+	def _read_pixel(self, x, y):
+		if x < 0 or y < 0 or x >= self._width or y >= self._height:
+			return None
+		index = int(y) * self._stride + int(x) * 4
+		r, g, b, a = [self._data[index + position] for position in self.CHANNELS]
+		return self._unpremultiply(r, g, b, a)
+
+	def _unpremultiply(self, r, g, b, a):
+		"""Same rounding as `Gdk.pixbuf_get_from_surface`."""
+		if a == 0:
+			return (0, 0, 0, 0)
+		if a == 255:
+			return (r, g, b, a)
+		half = a // 2
+		return ((r * 255 + half) // a, (g * 255 + half) // a, \
+		                                          (b * 255 + half) // a, a)
+
+	############################################################################
+################################################################################
+
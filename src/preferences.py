@@ -169,6 +169,7 @@ class DrPrefsWindow(Gtk.Window):
 		self.add_colorbtn(_("Background color"), 'ui-background-rgba')
 
 		self.add_switch(_("Prefer dark theme variant"), 'dark-theme-variant')
+		self.add_switch(_("Split large images into tiles"), 'tiled-canvas')
 
 		self.add_section_separator()
 		# Context: title of a section of the preferences. It corresponds to the
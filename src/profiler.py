@@ -0,0 +1,136 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import json, math
+from collections import deque
+from gi.repository import GLib
+
+################################################################################
+
+class DrProfiler():
+	"""Development only: records the durations (in microseconds) of the redraws
+	of the canvas, of the tools' operations, and the latency between a motion
+	event and the presentation of its rendering, so tools and image sizes can
+	be compared objectively."""
+	__gtype_name__ = 'DrProfiler'
+
+	MAX_SAMPLES = 2000
+	CATEGORIES = ['draw', 'operation', 'latency']
+	HISTOGRAM_BINS = 24
+
+	def __init__(self, **kwargs):
+		self.is_active = False
+		self.reset()
+
+	def reset(self):
+		self._samples = {}
+		for category in self.CATEGORIES:
+			self._samples[category] = deque(maxlen=self.MAX_SAMPLES)
+
+	def add_sample(self, category, duration, label=None):
+		"""Record a duration in microseconds. The label (a tool id for example)
+		is only used in the dumped trace."""
+		if not self.is_active:
+			return
+		timestamp = GLib.get_monotonic_time()
+		self._samples[category].append((timestamp, duration, label))
+
+	############################################################################
+	# Statistics ###############################################################
+
+	def get_percentiles(self, category):
+		"""Returns the 50th, 95th and 99th percentiles (nearest-rank method) of
+		the durations of a category, or None if there is no sample yet."""
+		durations = sorted(sample[1] for sample in self._samples[category])
+		if len(durations) == 0:
+			return None
+		return [self._get_rank(durations, p) for p in (50, 95, 99)]
+
+	def _get_rank(self, sorted_values, percentile):
+		index = math.ceil(percentile / 100 * len(sorted_values)) - 1
+		return sorted_values[max(0, index)]
+
+	def get_histogram(self, category, max_value):
+		"""Returns the number of samples in each of the `HISTOGRAM_BINS` bins
+		between 0 and `max_value`. The last bin also counts greater values."""
+		bins = [0] * self.HISTOGRAM_BINS
+		if max_value <= 0:
+			return bins
+		for sample in self._samples[category]:
+			index = int(sample[1] / max_value * self.HISTOGRAM_BINS)
+			bins[min(index, self.HISTOGRAM_BINS - 1)] += 1
+		return bins
+
+	def get_summary(self):
+		"""Returns a short text describing the percentiles of each category."""
+		summary = []
+		for category in self.CATEGORIES:
+			percentiles = self.get_percentiles(category)
+			if percentiles is None:
+				continue
+			values = "/".join([str(round(p / 1000, 1)) for p in percentiles])
+			summary.append(category + " " + values)
+		if len(summary) == 0:
+			return ""
+		return "p50/p95/p99 (ms): " + ", ".join(summary)
+
+	############################################################################
+	# Output ###################################################################
+
+	OVERLAY_BAR_WIDTH = 3
+	OVERLAY_HEIGHT = 30
+	OVERLAY_TEXT_WIDTH = 120
+
+	def get_overlay_extents(self, x, y):
+		"""Returns the rectangle (x, y, width, height) painted by the overlay,
+		so the widget can queue its redraw."""
+		width = self.OVERLAY_BAR_WIDTH * self.HISTOGRAM_BINS + \
+		                                                self.OVERLAY_TEXT_WIDTH
+		height = (self.OVERLAY_HEIGHT + 4) * len(self.CATEGORIES)
+		return x, y, width, height
+
+	def draw_overlay(self, cairo_context, x, y):
+		"""Paint a small histogram of each category at the given coordinates
+		of a context whose unit is the pixel of the widget."""
+		bar_width = self.OVERLAY_BAR_WIDTH
+		height = self.OVERLAY_HEIGHT
+		for category in self.CATEGORIES:
+			percentiles = self.get_percentiles(category)
+			if percentiles is None:
+				continue
+			# the scale of the histogram depends on the 99th percentile
+			bins = self.get_histogram(category, percentiles[2] * 1.2)
+			max_count = max(bins)
+			cairo_context.set_source_rgba(0.0, 0.0, 0.0, 0.6)
+			cairo_context.rectangle(x, y, bar_width * len(bins), height)
+			cairo_context.fill()
+			cairo_context.set_source_rgba(0.2, 0.8, 0.2, 0.9)
+			for index, count in enumerate(bins):
+				bar_height = height * count / max_count
+				cairo_context.rectangle(x + index * bar_width, \
+				                 y + height - bar_height, bar_width, bar_height)
+			cairo_context.fill()
+			cairo_context.set_source_rgba(1.0, 1.0, 1.0, 1.0)
+			cairo_context.move_to(x + bar_width * len(bins) + 4, y + height)
+			cairo_context.show_text(category + " p99: " + \
+			                            str(round(percentiles[2] / 1000, 1)) + "ms")
+			y += height + 4
+
+	def dump_json(self, file_path):
+		"""Write all samples and their statistics in a JSON file."""
+		data = {}
+		for category in self.CATEGORIES:
+			percentiles = self.get_percentiles(category)
+			data[category] = {
+				'percentiles_us': percentiles,
+				'samples': [{
+					'timestamp_us': sample[0],
+					'duration_us': sample[1],
+					'label': sample[2]
+				} for sample in self._samples[category]]
+			}
+		with open(file_path, 'w') as json_file:
+			json.dump(data, json_file, indent=1)
+
+	############################################################################
+################################################################################
+
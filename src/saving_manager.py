@@ -19,6 +19,7 @@ from gi.repository import Gtk, GdkPixbuf, GLib
 from .message_dialog import DrMessageDialog
 from .utilities_files import utilities_add_filechooser_filters
 from .utilities_colors import utilities_rgb_to_hexadecimal
+from .utilities_tracing import utilities_trace_span
 
 ALL_SUPPORTED_FORMAT = ['jpeg', 'jpg', 'jpe', 'png', 'tiff', 'ico', 'bmp']
 
@@ -92,7 +93,9 @@ class DrSavingManager():
 
 		try:
 			# Actually save the pixbuf to the given file path
-			pixbuf.savev(file_path, file_format, [None], [])
+			with utilities_trace_span('GdkPixbuf.Pixbuf.savev', 'io', \
+			                                         {'format': file_format}):
+				pixbuf.savev(file_path, file_format, [None], [])
 		except Exception as e:
 			print(e)
 			# Context: an error message
@@ -17,6 +17,7 @@
 
 import cairo
 from gi.repository import Gtk, Gdk, GdkPixbuf
+from .selection_mask import DrSelectionMask
 
 class NoSelectionPixbufException(Exception):
 	def __init__(self, *args):
@@ -34,6 +35,7 @@ class DrSelectionManager():
 
 	def __init__(self, image):
 		self.image = image
+		self._pixbuf_generation = 0
 		self.init_pixbuf()
 		self.reset_future_data()
 
@@ -49,8 +51,10 @@ class DrSelectionManager():
 		# print('⇒ init pixbuf')
 		self.selection_pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, \
 		                                                          True, 8, 1, 1)
+		self._pixbuf_generation += 1
 		self.set_coords(True, 0, 0)
 		self.selection_path = None
+		self._mask = None
 		self.is_active = False
 
 	def load_from_path(self, new_path, rgba=None):
@@ -58,29 +62,42 @@ class DrSelectionManager():
 		erasing everything outside of the provided path."""
 		if new_path is None:
 			raise NoSelectionPathException()
-
+		main_width = self.image.get_pixbuf_width()
+		main_height = self.image.get_pixbuf_height()
+		mask = DrSelectionMask.new_from_path(new_path, main_width, main_height)
 		self.selection_path = new_path
+		self._load_from_mask(mask, rgba)
+
+	def load_from_mask(self, new_mask, rgba=None):
+		"""Same as `load_from_path`, with the area defined by a mask (see
+		DrSelectionMask) in image coordinates. The selection has no path then,
+		and none is computed, since the mask is enough to use it."""
+		if new_mask is None:
+			raise NoSelectionPathException()
+		self.selection_path = None
+		self._load_from_mask(new_mask, rgba)
+
+	def _load_from_mask(self, mask, rgba):
 		self.is_active = True
 		main_pixbuf = self.image.main_pixbuf
 
-		# Erase everything outside of the path
+		# Erase everything outside of the mask
 		surface = Gdk.cairo_surface_create_from_pixbuf(main_pixbuf, 0, None)
 		surface.set_device_scale(self.image.SCALE_FACTOR, self.image.SCALE_FACTOR)
 		cairo_context = cairo.Context(surface)
 		cairo_context.set_operator(cairo.Operator.DEST_IN)
-		cairo_context.new_path()
-		cairo_context.append_path(self.selection_path)
-		cairo_context.fill_preserve()
-		cairo_context.set_operator(cairo.Operator.OVER)
+		cairo_context.set_source_surface(mask.get_surface(), mask.x, mask.y)
+		cairo_context.paint()
 
 		# Find the coords to reduce the size of what will be stored
-		main_width = main_pixbuf.get_width()
-		main_height = main_pixbuf.get_height()
-		xmin, ymin, xmax, ymax = cairo_context.path_extents()
-		xmax = min(xmax, main_width)
-		ymax = min(ymax, main_height)
-		xmin = int( max(xmin, 0.0) ) # If everything is right, this is selection_x
-		ymin = int( max(ymin, 0.0) ) # If everything is right, this is selection_y
+		extents = mask.get_extents()
+		if extents is None:
+			extents = (0, 0, 0, 0)
+		xmin, ymin, width, height = extents
+		xmax = min(xmin + width, self.image.get_pixbuf_width())
+		ymax = min(ymin + height, self.image.get_pixbuf_height())
+		xmin = max(xmin, 0) # If everything is right, this is selection_x
+		ymin = max(ymin, 0) # If everything is right, this is selection_y
 		if self.selection_x < 0:
 			xmin = self.selection_x
 		if self.selection_y < 0:
@@ -99,8 +116,13 @@ class DrSelectionManager():
 					                                int(rgba[1] * 255), \
 					                                int(rgba[2] * 255))
 				self.selection_pixbuf = pixbuf
-			# can't use `set_pixbuf` here ^ because it would replace the free
-			# path with a rectangle path
+				self._pixbuf_generation += 1
+				# the mask is stored relatively to the pixbuf, so it moves
+				# with it
+				self._mask = mask.crop(int(xmin), int(ymin), selection_width, \
+				                               selection_height).moved_to(0, 0)
+			# can't use `set_pixbuf` here ^ because it would replace the
+			# area with a rectangle
 		else:
 			self.reset(True)
 		self.image.update_actions_state()
@@ -115,15 +137,23 @@ class DrSelectionManager():
 	def set_pixbuf(self, pixbuf):
 		# print('⇒ set pixbuf')
 		self.selection_pixbuf = pixbuf
+		self._pixbuf_generation += 1
 		self._create_path_from_pixbuf()
 
 	def get_pixbuf(self):
 		return self.selection_pixbuf
 
+	def get_pixbuf_generation(self):
+		"""An integer incremented each time the selection pixbuf is replaced,
+		so anything computed from it can know if it's outdated."""
+		return self._pixbuf_generation
+
 	def reset(self, update_image):
 		# print('⇒ reset pixbuf')
 		self.selection_pixbuf = None
+		self._pixbuf_generation += 1
 		self.selection_path = None
+		self._mask = None
 		self.set_coords(True, 0, 0)
 		self.is_active = False
 		if update_image:
@@ -140,6 +170,17 @@ class DrSelectionManager():
 		cairo_context.close_path()
 		return cairo_context.copy_path()
 
+	def get_mask(self):
+		"""Returns the mask of the selected area, in image coordinates."""
+		return self._mask.moved_to(self.selection_x, self.selection_y)
+
+	def get_mask_with_scroll(self, tool_dx, tool_dy):
+		"""Returns the mask of the selected area, at its position on the widget
+		(in image pixels), like `get_path_with_scroll`."""
+		x = self.selection_x - self.image.scroll_x + tool_dx
+		y = self.selection_y - self.image.scroll_y + tool_dy
+		return self._mask.moved_to(x, y)
+
 	def show_selection_on_surface(self, cairo_context, with_scroll, tool_dx, tool_dy):
 		if self.selection_pixbuf is None:
 			raise NoSelectionPixbufException()
@@ -162,15 +203,12 @@ class DrSelectionManager():
 
 	def point_is_in_selection(self, tested_x, tested_y):
 		"""Returns a boolean if the point whose coordinates are "(tested_x,
-		tested_y)" is in the path defining the selection. If such path doesn't
-		exist, it returns None."""
-		if not self.is_active:
+		tested_y)" is in the selected area. It's a lookup in the mask of the
+		selection, so it's cheap enough to be done on each motion."""
+		if not self.is_active or self._mask is None:
 			return True # shouldn't happen
-		scrolled_path = self.get_path_with_scroll(self.image.scroll_x, self.image.scroll_y)
-		cairo_context = self._get_context()
-		cairo_context.new_path()
-		cairo_context.append_path(scrolled_path)
-		return cairo_context.in_fill(tested_x, tested_y)
+		return self._mask.contains(tested_x - self.selection_x, \
+		                                        tested_y - self.selection_y)
 
 	############################################################################
 
@@ -191,6 +229,9 @@ class DrSelectionManager():
 		cairo_context.rel_line_to(-1 * self.selection_pixbuf.get_width(), 0)
 		cairo_context.close_path()
 		self.selection_path = cairo_context.copy_path()
+		width = self.selection_pixbuf.get_width()
+		height = self.selection_pixbuf.get_height()
+		self._mask = DrSelectionMask.new_filled(0, 0, width, height)
 		self.hide_popovers()
 		self.image.update_actions_state()
 
@@ -238,6 +279,7 @@ class DrSelectionManager():
 		self._future_x = 0
 		self._future_y = 0
 		self._future_path = None
+		self._future_mask = None
 
 	def set_future_coords(self, x, y):
 		self._future_x = int(x)
@@ -248,13 +290,14 @@ class DrSelectionManager():
 
 	def set_future_path(self, path, resync_coords):
 		self._future_path = path
+		self._future_mask = None
 
 		if not resync_coords:
 			return
 		# Convert selection manager's future_path coords from absolute to
 		# relative ones, and sets future coords accordingly.
-		main_width = self.image.main_pixbuf.get_width()
-		main_height = self.image.main_pixbuf.get_height()
+		main_width = self.image.get_pixbuf_width()
+		main_height = self.image.get_pixbuf_height()
 		xmin, ymin = main_width, main_height # TODO context.path_extents() ?
 		for pts in self._future_path:
 			if pts[1] != ():
@@ -265,6 +308,18 @@ class DrSelectionManager():
 	def get_future_path(self):
 		return self._future_path
 
+	def set_future_mask(self, mask):
+		"""Pre-load a mask instead of a path, and set the future coords to the
+		position of the selected pixels."""
+		self._future_mask = mask
+		self._future_path = None
+		extents = mask.get_extents()
+		if extents is not None:
+			self.set_future_coords(extents[0], extents[1])
+
+	def get_future_mask(self):
+		return self._future_mask
+
 	def update_from_transform_tool(self, new_pixbuf, dx, dy):
 		self.set_pixbuf(new_pixbuf)
 		x = self.selection_x + dx
@@ -283,10 +338,13 @@ class DrSelectionManager():
 		print("image.scroll coords", self.image.scroll_x, self.image.scroll_y)
 		print("image.zoom_level", self.image.zoom_level)
 
+		if self._mask is not None:
+			print("mask extents", self.get_mask().get_extents())
+
 		print("selection_path with scroll & temp deltas")
 		delta_x = 0 - self.image.scroll_x + self.selection_x - self.temp_x
 		delta_y = 0 - self.image.scroll_y + self.selection_y - self.temp_y
-		for pts in self.selection_path:
+		for pts in self.selection_path or []:
 			if pts[1] != ():
 				x = pts[1][0] + delta_x
 				y = pts[1][1] + delta_y
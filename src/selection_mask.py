@@ -0,0 +1,190 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo, math
+
+################################################################################
+
+class DrSelectionMask():
+	"""Area of a selection, as an A8 surface whose opaque pixels are selected,
+	with its top-left corner at (x, y) in the image. A mask is never modified:
+	the boolean operations return new masks, computed by cairo on the whole
+	surfaces at once. The bounding box of the selected pixels, and the outline
+	of the area, are computed only once, when they're needed."""
+	__gtype_name__ = 'DrSelectionMask'
+
+	def __init__(self, surface, x=0, y=0, **kwargs):
+		self._surface = surface
+		self.x = x
+		self.y = y
+		# Cached values, shared by the moved copies of this mask
+		self._cache = {}
+
+	@classmethod
+	def new_filled(cls, x, y, width, height):
+		surface = cairo.ImageSurface(cairo.Format.A8, width, height)
+		cairo_context = cairo.Context(surface)
+		cairo_context.paint()
+		return cls(surface, x, y)
+
+	@classmethod
+	def new_from_path(cls, path, width, height):
+		"""Rasterize the cairo path, which is in image coordinates, on a mask
+		of the size of the image."""
+		surface = cairo.ImageSurface(cairo.Format.A8, width, height)
+		cairo_context = cairo.Context(surface)
+		cairo_context.append_path(path)
+		cairo_context.fill()
+		return cls(surface, 0, 0)
+
+	def moved_to(self, x, y):
+		"""Returns the same mask at an other position. The surface isn't copied,
+		since masks are never modified."""
+		moved = DrSelectionMask(self._surface, x, y)
+		moved._cache = self._cache
+		return moved
+
+	############################################################################
+	# Getters ##################################################################
+
+	def get_surface(self):
+		return self._surface
+
+	def get_width(self):
+		return self._surface.get_width()
+
+	def get_height(self):
+		return self._surface.get_height()
+
+	def contains(self, x, y):
+		"""Tells if the pixel at the given image coordinates is selected (at
+		least half-opaque)."""
+		x = math.floor(x - self.x)
+		y = math.floor(y - self.y)
+		if x < 0 or y < 0 or x >= self.get_width() or y >= self.get_height():
+			return False
+		self._surface.flush()
+		return self._surface.get_data()[y * self._surface.get_stride() + x] >= 128
+
+	def get_extents(self):
+		"""Returns the bounding box of the selected pixels as a tuple (x, y,
+		width, height) in image coordinates, or None if the mask is empty."""
+		if 'extents' not in self._cache:
+			self._cache['extents'] = self._compute_extents()
+		extents = self._cache['extents']
+		if extents is None:
+			return None
+		x, y, width, height = extents
+		return x + self.x, y + self.y, width, height
+
+	def _compute_extents(self):
+		"""The rows are scanned as bytes strings, so the transparent pixels at
+		the start and end of each row are skipped by a single operation."""
+		self._surface.flush()
+		data = self._surface.get_data()
+		stride = self._surface.get_stride()
+		width = self.get_width()
+		x1, x2 = width, 0
+		y1, y2 = None, 0
+		for row in range(self.get_height()):
+			line = bytes(data[row * stride:row * stride + width])
+			selected = line.lstrip(b'\x00')
+			if len(selected) == 0:
+				continue
+			if y1 is None:
+				y1 = row
+			y2 = row + 1
+			x1 = min(x1, width - len(selected))
+			x2 = max(x2, len(line.rstrip(b'\x00')))
+		if y1 is None:
+			return None
+		return x1, y1, x2 - x1, y2 - y1
+
+	def get_outline(self):
+		"""Returns an A8 surface of the size of the mask, where only the pixels
+		on the edges of the selected area are opaque."""
+		if 'outline' not in self._cache:
+			# The area is eroded by intersecting it with itself shifted by one
+			# pixel in each direction, and the outline is what the erosion
+			# removed.
+			eroded = self._copy_surface()
+			cairo_context = cairo.Context(eroded)
+			cairo_context.set_operator(cairo.Operator.DEST_IN)
+			for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+				cairo_context.set_source_surface(self._surface, dx, dy)
+				cairo_context.paint()
+			outline = self._copy_surface()
+			cairo_context = cairo.Context(outline)
+			cairo_context.set_operator(cairo.Operator.DEST_OUT)
+			cairo_context.set_source_surface(eroded, 0, 0)
+			cairo_context.paint()
+			self._cache['outline'] = outline
+		return self._cache['outline']
+
+	############################################################################
+	# Boolean operations #######################################################
+
+	def add(self, other):
+		"""Returns the union of this mask and the `other` one."""
+		x1 = min(self.x, other.x)
+		y1 = min(self.y, other.y)
+		x2 = max(self.x + self.get_width(), other.x + other.get_width())
+		y2 = max(self.y + self.get_height(), other.y + other.get_height())
+		result = self._new_combination(x1, y1, x2 - x1, y2 - y1)
+		result._paint(other, cairo.Operator.OVER)
+		return result
+
+	def subtract(self, other):
+		"""Returns this mask without the pixels selected by the `other` one."""
+		result = self._new_combination(self.x, self.y, self.get_width(), \
+		                                                      self.get_height())
+		result._paint(other, cairo.Operator.DEST_OUT)
+		return result
+
+	def intersect(self, other):
+		"""Returns the pixels selected by both this mask and the `other` one."""
+		result = self._new_combination(self.x, self.y, self.get_width(), \
+		                                                      self.get_height())
+		# DEST_IN is unbounded: what is outside of the other mask is cleared
+		result._paint(other, cairo.Operator.DEST_IN)
+		return result
+
+	def invert(self, width, height):
+		"""Returns the pixels of an image of the given size which aren't
+		selected by this mask."""
+		result = DrSelectionMask.new_filled(0, 0, width, height)
+		result._paint(self, cairo.Operator.DEST_OUT)
+		return result
+
+	def crop(self, x, y, width, height):
+		"""Returns the part of this mask in the given rectangle (in image
+		coordinates), with transparent pixels where this mask doesn't exist."""
+		return self._new_combination(x, y, width, height)
+
+	def _new_combination(self, x, y, width, height):
+		"""Returns a new mask at the given position, with this mask painted on
+		it, so the other mask of an operation can be painted on top of it."""
+		surface = cairo.ImageSurface(cairo.Format.A8, width, height)
+		result = DrSelectionMask(surface, x, y)
+		result._paint(self, cairo.Operator.SOURCE)
+		return result
+
+	def _paint(self, other, operator):
+		"""Only used on new masks, before they're shared."""
+		cairo_context = cairo.Context(self._surface)
+		cairo_context.set_operator(operator)
+		cairo_context.set_source_surface(other.get_surface(), \
+		                                      other.x - self.x, other.y - self.y)
+		cairo_context.paint()
+
+	def _copy_surface(self):
+		surface = cairo.ImageSurface(cairo.Format.A8, self.get_width(), \
+		                                                      self.get_height())
+		cairo_context = cairo.Context(surface)
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		cairo_context.set_source_surface(self._surface, 0, 0)
+		cairo_context.paint()
+		return surface
+
+	############################################################################
+################################################################################
+
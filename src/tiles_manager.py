@@ -0,0 +1,89 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo
+
+################################################################################
+
+class DrTilesManager():
+	"""Stable state of a large image, split in square tiles. A tile is never
+	modified in place: updating it creates a new surface, so a copy of the
+	manager is cheap and shares all the tiles that didn't change since."""
+	__gtype_name__ = 'DrTilesManager'
+
+	TILE_SIZE = 256
+
+	def __init__(self, width, height, **kwargs):
+		self._width = width
+		self._height = height
+		self._tiles = {}
+
+	def get_size(self):
+		return self._width, self._height
+
+	def copy(self):
+		"""Returns a snapshot of the current state, sharing the tiles."""
+		new_manager = DrTilesManager(self._width, self._height)
+		new_manager._tiles = self._tiles.copy()
+		return new_manager
+
+	############################################################################
+
+	def load_surface(self, surface, area=None):
+		"""Copy from the surface the tiles intersecting the area (x1, y1, x2, y2
+		in image coordinates). If the area is None, every tile is copied."""
+		for col, row in self._get_keys_for_area(area):
+			x, y, w, h = self._get_tile_rect(col, row)
+			tile = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+			cairo_context = cairo.Context(tile)
+			cairo_context.set_operator(cairo.Operator.SOURCE)
+			cairo_context.set_source_surface(surface, -1 * x, -1 * y)
+			cairo_context.paint()
+			self._tiles[(col, row)] = tile
+
+	def paint_on(self, cairo_context, area=None):
+		"""Paint the tiles intersecting the area (x1, y1, x2, y2 in image
+		coordinates, or None for everything) on the context, replacing its
+		pixels. The context should already be clipped to the area."""
+		cairo_context.save()
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		for key in self._get_keys_for_area(area):
+			if key not in self._tiles:
+				continue
+			x, y, w, h = self._get_tile_rect(*key)
+			cairo_context.set_source_surface(self._tiles[key], x, y)
+			cairo_context.rectangle(x, y, w, h)
+			cairo_context.fill()
+		cairo_context.restore()
+
+	def build_surface(self):
+		surface = cairo.ImageSurface(cairo.Format.ARGB32, self._width, \
+		                                                           self._height)
+		self.paint_on(cairo.Context(surface))
+		return surface
+
+	############################################################################
+
+	def _get_tile_rect(self, col, row):
+		x = col * self.TILE_SIZE
+		y = row * self.TILE_SIZE
+		w = min(self.TILE_SIZE, self._width - x)
+		h = min(self.TILE_SIZE, self._height - y)
+		return x, y, w, h
+
+	def _get_keys_for_area(self, area):
+		if area is None:
+			x1, y1, x2, y2 = 0, 0, self._width, self._height
+		else:
+			x1 = max(0, int(area[0]))
+			y1 = max(0, int(area[1]))
+			x2 = min(self._width, int(area[2]))
+			y2 = min(self._height, int(area[3]))
+		if x2 <= x1 or y2 <= y1:
+			return []
+		cols = range(x1 // self.TILE_SIZE, (x2 - 1) // self.TILE_SIZE + 1)
+		rows = range(y1 // self.TILE_SIZE, (y2 - 1) // self.TILE_SIZE + 1)
+		return [(col, row) for row in rows for col in cols]
+
+	############################################################################
+################################################################################
+
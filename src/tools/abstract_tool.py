@@ -15,8 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import cairo
-from gi.repository import Gtk, Gdk
+import cairo, functools
+from gi.repository import Gtk, Gdk, GLib
+from .utilities_overlay import utilities_show_mask_overlay
+from .utilities_tracing import utilities_traced
 
 class WrongToolIdException(Exception):
 	def __init__(self, expected, actual):
@@ -24,6 +26,25 @@ class WrongToolIdException(Exception):
 		msg = _("Can't start operation: wrong tool id (expected {0}, got {1})")
 		super().__init__(msg.format(expected, actual))
 
+def _profiled_operation(do_tool_operation):
+	"""Development only: decorator measuring the duration of an operation, if
+	the profiler of the window is active. Nested calls (a tool calling the
+	method of its super-class) are measured only once."""
+	@functools.wraps(do_tool_operation)
+	def wrapper(tool, operation):
+		profiler = tool.window.profiler
+		if profiler is None or not profiler.is_active or tool._is_profiled:
+			return do_tool_operation(tool, operation)
+		tool._is_profiled = True
+		start = GLib.get_monotonic_time()
+		try:
+			return do_tool_operation(tool, operation)
+		finally:
+			tool._is_profiled = False
+			duration = GLib.get_monotonic_time() - start
+			profiler.add_sample('operation', duration, tool.id)
+	return wrapper
+
 ################################################################################
 
 class AbstractAbstractTool():
@@ -32,6 +53,13 @@ class AbstractAbstractTool():
 	__gtype_name__ = 'AbstractAbstractTool'
 	UI_PATH = '/com/github/maoschanz/drawing/tools/ui/'
 
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		if 'do_tool_operation' in cls.__dict__:
+			traced = utilities_traced(cls.__name__ + '.do_tool_operation', \
+			                               'operation')(cls.do_tool_operation)
+			cls.do_tool_operation = _profiled_operation(traced)
+
 	def __init__(self, tool_id, label, icon_name, window, **kwargs):
 		self.window = window
 		# The tool's identity
@@ -47,8 +75,11 @@ class AbstractAbstractTool():
 		# The tool's state
 		self.cursor_name = 'cell'
 		self._ongoing_operation = False
+		self._is_profiled = False
 		self._modifier_keys = []
 		self._last_btn = 1
+		self._area_pointer = None
+		self._area_outline = None
 		# Once everything is set, build the UI
 		self.try_build_pane()
 
@@ -335,6 +366,49 @@ class AbstractAbstractTool():
 	def restore_pixbuf(self):
 		self.get_image().use_stable_pixbuf()
 
+	def report_damage(self, extents):
+		"""Tell the image which area of the surface has been modified by the
+		operation, as a tuple (x1, y1, x2, y2) in image coordinates such as the
+		results of `cairo_context.stroke_extents()`. This is optional, but it
+		allows to restore and redraw only this area."""
+		self.get_image().add_dirty_area(*extents)
+
+	############################################################################
+	# Areas of uniform color ###################################################
+
+	def update_area_outline(self, x, y):
+		"""Outline the area of uniform color at the given coordinates, if the
+		label map of the image (see `DrImage.prepare_label_map`) is ready. The
+		tool should call this method when the pointer moves, with None to
+		remove the outline."""
+		self._area_pointer = None if x is None else (x, y)
+		label_map = self.get_image().get_label_map()
+		outline = None
+		if label_map is not None and x is not None:
+			outline = label_map.get_area_outline(x, y)
+		if self._area_outline is None and outline is None:
+			return
+		if self._area_outline is not None and self._area_outline[1] is outline:
+			return
+		self._area_outline = None if outline is None else (label_map, outline)
+		self.get_image().update_view()
+
+	def on_label_map_ready(self):
+		if self._area_pointer is not None:
+			self.update_area_outline(*self._area_pointer)
+
+	def show_area_outline(self, cairo_context):
+		if self._area_outline is None:
+			return
+		image = self.get_image()
+		label_map, outline = self._area_outline
+		if label_map is not image.get_label_map():
+			# the image changed since the outline was computed
+			return
+		mask, x, y = outline
+		utilities_show_mask_overlay(cairo_context, mask, x - image.scroll_x, \
+		                                       y - image.scroll_y, image.zoom_level)
+
 	############################################################################
 	# Signals handling #########################################################
 
@@ -92,11 +92,13 @@ class AbstractClassicTool(AbstractAbstractTool):
 		context.set_antialias(antialias)
 		return context
 
-	def set_dashes_and_cap(self, cairo_context, lw, dashes_type, line_cap):
+	def set_dashes_and_cap(self, cairo_context, lw, dashes_type, line_cap, \
+	                                                             dash_offset=0):
 		"""Set a cairo dash pattern to the given context. The pattern we want
 		is described by its name as a string (`dashes_type`), but the actual
 		lengths that cairo wants depend also on the line width (`lw`) and the
-		`line_cap`. The line cap is also set here."""
+		`line_cap`. The line cap is also set here. The `dash_offset` allows to
+		stroke the end of a path with the same dash phase as the full path."""
 		cairo_context.set_line_cap(line_cap)
 		dashes_descriptor = []
 		if dashes_type == 'regular':
@@ -120,7 +122,7 @@ class AbstractClassicTool(AbstractAbstractTool):
 				actual_length = actual_length + 1
 			dashes_descriptor[i] = actual_length
 			i = i + 1
-		cairo_context.set_dash(dashes_descriptor)
+		cairo_context.set_dash(dashes_descriptor, dash_offset)
 
 	############################################################################
 ################################################################################
@@ -45,13 +45,12 @@ class EraserArea(AbstractEraser):
 		cairo_context.set_operator(cairo.Operator.SOURCE)
 		censor_type = operation['censor-type']
 
+		cairo_context.append_path(operation['path'])
+		self._tool.report_damage(cairo_context.path_extents())
 		if censor_type == 'solid':
 			cairo_context.set_source_rgba(*operation['replacement'])
-			cairo_context.append_path(operation['path'])
 			cairo_context.fill()
 			return
-		else:
-			cairo_context.append_path(operation['path'])
 
 		[r0, r1, r2, r3] = cairo_context.path_extents()
 		[r0, r1, r2, r3] = [int(r0), int(r1), int(r2), int(r3)]
@@ -70,7 +69,7 @@ class EraserArea(AbstractEraser):
 		if censor_type == 'mosaic':
 			bs = utilities_blur_surface(surface, b_rad, BlurType.TILES, b_dir)
 		elif censor_type == 'blur':
-			bs = utilities_blur_surface(surface, b_rad, BlurType.PX_BOX, b_dir)
+			bs = utilities_blur_surface(surface, b_rad, BlurType.AUTO, b_dir)
 		elif censor_type == 'shuffle':
 			bs = self._shuffle_pixels(surface, shuffle_intensity)
 		elif censor_type == 'mixed':
@@ -1,8 +1,10 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
 import cairo
+from gi.repository import Gdk
 from .abstract_eraser import AbstractEraser
-from .utilities_paths import utilities_get_rgba_for_xy
+from .utilities_color_distance import utilities_get_color_mask, \
+                                      utilities_color_distance_is_vectorized
 
 class EraserColor(AbstractEraser):
 	__gtype_name__ = 'EraserColor'
@@ -20,8 +22,9 @@ class EraserColor(AbstractEraser):
 		# in this eraser, "path" is actually a list of rgba
 		if path is None:
 			path = []
-		new_rgba = utilities_get_rgba_for_xy(self._tool.get_surface(), *event)
-		if new_rgba[3] == 0:
+		sampler = self._tool.get_image().get_pixel_sampler()
+		new_rgba = sampler.get_rgba(*event)
+		if new_rgba is None or new_rgba[3] == 0:
 			# no need to erase what's already erased
 			return path
 		path.append(new_rgba)
@@ -30,38 +33,35 @@ class EraserColor(AbstractEraser):
 	############################################################################
 
 	def do_operation(self, cairo_context, operation):
-		"""Replace the color with transparency by adding an alpha channel."""
-		all_rgbas = operation['path']
-		for rgba in all_rgbas:
-			self._erase_rgb(rgba[0:3])
-			# ^ it's not possible to take into account the alpha channel :(
-
-	def _erase_rgb(self, rgb0, margin=0):
-		self._clip_red(*rgb0, margin)
-		self._tool.restore_pixbuf()
-		self._tool.non_destructive_show_modif()
-
-	def _clip_red(self, r0, g0, b0, margin=0):
-		for i in range(-1 * margin, margin + 1):
-			r = r0 + i
-			if r <= 255 and r >= 0:
-				self._clip_green(r, g0, b0, margin)
+		"""The pixels whose color is close enough to one of the clicked colors
+		are replaced with transparency, in one pass over the image. As it has
+		always been the case with this eraser, the opacity of the pixels isn't
+		compared, only their colors."""
+		surface = self._tool.get_surface()
+		if operation['tolerance'] == 0 \
+		or not utilities_color_distance_is_vectorized():
+			self._erase_exact_colors(cairo_context, surface, operation['path'])
+			return
+		mask = utilities_get_color_mask(surface, operation['path'], \
+		                      operation['tolerance'], operation['metric'], True)
+		cairo_context.set_operator(cairo.Operator.DEST_OUT)
+		cairo_context.set_source_rgba(0.0, 0.0, 0.0, 1.0)
+		cairo_context.mask_surface(mask, 0, 0)
 
-	def _clip_green(self, r, g0, b0, margin=0):
-		for i in range(-1 * margin, margin + 1):
-			g = g0 + i
-			if g <= 255 and g >= 0:
-				self._clip_blue(r, g, b0, margin)
-
-	def _clip_blue(self, r, g, b0, margin=0):
-		for i in range(-1 * margin, margin + 1):
-			b = b0 + i
-			if b <= 255 and b >= 0:
-				self._replace_main_with_alpha(r, g, b)
-
-	def _replace_main_with_alpha(self, red, green, blue):
-		new_pixbuf = self._tool.get_main_pixbuf().add_alpha(True, red, green, blue)
-		self._tool.get_image().set_main_pixbuf(new_pixbuf)
+	def _erase_exact_colors(self, cairo_context, surface, all_rgbas):
+		"""GdkPixbuf replaces an exact color with transparency in C, which is
+		way faster than comparing each pixel in Python, so the tolerance is
+		ignored if NumPy isn't available."""
+		if len(all_rgbas) == 0:
+			return
+		w = surface.get_width()
+		h = surface.get_height()
+		pixbuf = Gdk.pixbuf_get_from_surface(surface, 0, 0, w, h)
+		for rgba in all_rgbas:
+			pixbuf = pixbuf.add_alpha(True, *rgba[0:3])
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		Gdk.cairo_set_source_pixbuf(cairo_context, pixbuf, 0, 0)
+		cairo_context.paint()
 
 	############################################################################
 ################################################################################
@@ -6,8 +6,9 @@ from .abstract_eraser import AbstractEraser
 class EraserRubber(AbstractEraser):
 	__gtype_name__ = 'EraserRubber'
 
-	def __init__(self):
+	def __init__(self, tool):
 		super().__init__()
+		self._tool = tool
 
 	def get_label_options(self, options={}):
 		label_options = _("Rubber eraser")
@@ -41,6 +42,7 @@ class EraserRubber(AbstractEraser):
 		cairo_context.set_line_join(cairo.LineJoin.ROUND)
 		cairo_context.set_line_width(operation['line_width'])
 		cairo_context.append_path(operation['path'])
+		self._tool.report_damage(cairo_context.stroke_extents())
 		cairo_context.stroke()
 
 	############################################################################
@@ -18,6 +18,9 @@
 import cairo
 from gi.repository import Gdk, GdkPixbuf
 from .abstract_classic_tool import AbstractClassicTool
+from .utilities_color_distance import utilities_get_tolerance, \
+                                      utilities_get_metric, \
+                                      utilities_color_distance_is_vectorized
 
 from .eraser_area import EraserArea
 from .eraser_color import EraserColor
@@ -34,10 +37,12 @@ class ToolEraser(AbstractClassicTool):
 		self.load_tool_action_enum('eraser-shape', 'last-eraser-type')
 		self.load_tool_action_enum('selection-color', 'last-delete-replace')
 		self.add_tool_action_enum('eraser-type', 'mosaic')
+		self.add_tool_action_enum('eraser-tolerance', 'none')
+		self.add_tool_action_enum('eraser-metric', 'perceptual')
 		self._rgba = [0.0, 0.0, 0.0, 0.0]
 
 		self._erasers = {
-			'rubber': EraserRubber(),
+			'rubber': EraserRubber(self),
 			'rectangle': EraserArea(self),
 			'color': EraserColor(self),
 		}
@@ -92,6 +97,12 @@ class ToolEraser(AbstractClassicTool):
 			# en fallback qui afficherait l'icône avec les gouttes.
 			# En fait on devrait yeet le délire du `_fallback_operator` ?
 
+		# without NumPy, only the exact colors are erased
+		use_tolerance = 'color' == self._eraser_shape \
+		                           and utilities_color_distance_is_vectorized()
+		self.set_action_sensitivity('eraser-tolerance', use_tolerance)
+		self.set_action_sensitivity('eraser-metric', use_tolerance)
+
 		self.use_size = self.get_eraser().use_size()
 		self.window.options_manager.update_pane(self)
 
@@ -160,6 +171,10 @@ class ToolEraser(AbstractClassicTool):
 			'replacement': self._rgba,
 			'censor-type': eraser_type,
 			'censor-shape': self._eraser_shape,
+			'tolerance': utilities_get_tolerance( \
+			                        self.get_option_value('eraser-tolerance')),
+			'metric': utilities_get_metric( \
+			                           self.get_option_value('eraser-metric')),
 			'antialias': self._use_antialias,
 			'path': self._path
 		}
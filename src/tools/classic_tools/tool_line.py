@@ -190,6 +190,7 @@ class ToolLine(AbstractClassicTool):
 		if operation['outline']:
 			cairo_context.set_source_rgba(*operation['rgba2'])
 			cairo_context.set_line_width(line_width * 1.2 + 2)
+			self.report_damage(cairo_context.stroke_extents())
 			cairo_context.stroke_preserve()
 
 		if operation['gradient']:
@@ -200,6 +201,8 @@ class ToolLine(AbstractClassicTool):
 		else:
 			cairo_context.set_source_rgba(*operation['rgba'])
 		cairo_context.set_line_width(line_width)
+		if not operation['outline']:
+			self.report_damage(cairo_context.stroke_extents())
 		cairo_context.stroke()
 
 	############################################################################
@@ -16,10 +16,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import cairo
-from gi.repository import Gdk
 from .abstract_classic_tool import AbstractClassicTool
-from .utilities_paths import utilities_get_magic_path
-from .utilities_paths import utilities_get_rgba_for_xy
+from .utilities_color_distance import utilities_get_tolerance, \
+                                      utilities_get_metric
+from .utilities_flood_fill import utilities_get_fill_mask
 
 class ToolPaint(AbstractClassicTool):
 	__gtype_name__ = 'ToolPaint'
@@ -27,9 +27,11 @@ class ToolPaint(AbstractClassicTool):
 	def __init__(self, window, **kwargs):
 		# Context: the name of a tool to fill an area of one color with an other
 		super().__init__('paint', _("Paint"), 'tool-paint-symbolic', window)
-		self._magic_path = None
 		self.use_size = False
 		self.add_tool_action_enum('paint_algo', 'replace')
+		self.add_tool_action_enum('paint_tolerance', 'none')
+		self.add_tool_action_enum('paint_metric', 'perceptual')
+		self.add_tool_action_boolean('areas-outline', False)
 
 	def get_options_label(self):
 		return _("Painting options")
@@ -41,13 +43,43 @@ class ToolPaint(AbstractClassicTool):
 		elif paint_algo == 'whole':
 			return [_("Click on the canvas to entirely paint it")]
 
-		label_warning1 = self.label + " - " + _("May not work for complex shapes")
-		label_warning2 = self.label + " - " + _("It will not work well if " + \
+		if self.get_option_value('paint_tolerance') != 'none':
+			return [self.label]
+		label_warning = self.label + " - " + _("It will not work well if " + \
 		                                          "the area's edges are blurry")
-		return [label_warning1, label_warning2]
+		return [label_warning]
 
 	############################################################################
 
+	def on_tool_selected(self, *args):
+		super().on_tool_selected()
+		if self._uses_label_map():
+			self.get_image().prepare_label_map()
+
+	def on_tool_unselected(self, *args):
+		self.update_area_outline(None, None)
+		super().on_tool_unselected()
+
+	def _uses_label_map(self):
+		"""The areas of uniform color are computed in the background, so the
+		clicks and the outline of the hovered area don't need a flood fill. It
+		only works for areas of exactly the same color, and only if the user
+		enabled it, since it uses a lot of memory."""
+		return self.get_option_value('areas-outline') \
+		                 and self.get_option_value('paint_algo') != 'whole' \
+		                 and self.get_option_value('paint_tolerance') == 'none'
+
+	def on_unclicked_motion_on_area(self, event, surface):
+		if not self._uses_label_map():
+			self.update_area_outline(None, None)
+			return
+		self.get_image().prepare_label_map()
+		x, y = self.get_image().get_event_coords(event)
+		self.update_area_outline(x, y)
+
+	def on_draw_above(self, area, cairo_context):
+		self.show_area_outline(cairo_context)
+
 	def on_press_on_area(self, event, surface, event_x, event_y):
 		self.set_common_values(event.button, event_x, event_y)
 
@@ -57,17 +89,6 @@ class ToolPaint(AbstractClassicTool):
 		or event_y < 0 or event_y > surface.get_height():
 			return
 
-		self.old_color = utilities_get_rgba_for_xy(surface, event_x, event_y)
-
-		if self.get_option_value('paint_algo') == 'fill':
-			self._magic_path = utilities_get_magic_path(surface, event_x, \
-			                                            event_y, self.window, 1)
-		elif self.get_option_value('paint_algo') == 'replace':
-			self._magic_path = utilities_get_magic_path(surface, event_x, \
-			                                            event_y, self.window, 2)
-		else:
-			pass # == 'whole'
-
 		operation = self.build_operation(event_x, event_y)
 		self.apply_operation(operation)
 
@@ -77,12 +98,14 @@ class ToolPaint(AbstractClassicTool):
 		operation = {
 			'tool_id': self.id,
 			'algo': self.get_option_value('paint_algo'),
-			# 'x': x,
-			# 'y': y,
+			'x': x,
+			'y': y,
 			'new_rgba': self.main_color,
+			'tolerance': utilities_get_tolerance( \
+			                         self.get_option_value('paint_tolerance')),
+			'metric': utilities_get_metric( \
+			                            self.get_option_value('paint_metric')),
 			'antialias': self._use_antialias,
-			'old_rgba': self.old_color,
-			'path': self._magic_path
 		}
 		return operation
 
@@ -90,11 +113,11 @@ class ToolPaint(AbstractClassicTool):
 		self.start_tool_operation(operation) # XXX expose antialiasing option?
 
 		if operation['algo'] == 'replace':
-			self._op_replace(operation)
+			self._op_fill(operation, cairo.Operator.SOURCE)
 		elif operation['algo'] == 'whole':
 			self._op_whole(operation)
 		else: # if operation['algo'] == 'fill':
-			self._op_fill(operation)
+			self._op_fill(operation, cairo.Operator.OVER)
 
 	############################################################################
 
@@ -104,101 +127,31 @@ class ToolPaint(AbstractClassicTool):
 		cairo_context.set_source_rgba(*operation['new_rgba'])
 		cairo_context.paint()
 
-	def _op_fill(self, operation):
-		"""Simple but ugly, and it's relying on the precision of the provided
-		path whose creation is based on shitty heurisctics."""
-		if operation['path'] is None:
+	def _op_fill(self, operation, cairo_operator):
+		"""The area of the color the user clicked is computed as a mask by a
+		flood fill, and the new color is painted through this mask. With the
+		OVER operator, the new color is blended with the old one (this only
+		matters if the new color is semi-transparent), with SOURCE the old
+		color is replaced."""
+		# The mask is computed again when the history is rebuilt, but since
+		# the pixels are the same, so is the mask.
+		x, y = operation['x'], operation['y']
+		label_map = self.get_image().get_label_map()
+		if label_map is not None and operation['tolerance'] == 0:
+			area = label_map.get_area_mask(x, y)
+		else:
+			mask = utilities_get_fill_mask(self.get_surface(), x, y, \
+			                         operation['tolerance'], operation['metric'])
+			area = None if mask is None else (mask, 0, 0)
+		if area is None:
 			return
+		mask, mask_x, mask_y = area
 		cairo_context = self.get_context()
+		cairo_context.set_operator(cairo_operator)
 		cairo_context.set_source_rgba(*operation['new_rgba'])
-		cairo_context.append_path(operation['path'])
-		# can_fill = cairo_context.in_fill(operation['x'], operation['y'])
-		# print(can_fill)
-		# if not can_fill:
-		# 	cairo_context.set_fill_rule(cairo.FillRule.EVEN_ODD)
-		# 	XXX doesn't work as i expected
-		cairo_context.fill()
-
-	def _op_replace(self, operation):
-		"""Algorithmically less ugly than `_op_fill`, but the replacing strategy
-		itself doesn't handle (semi-) transparent colors correctly. Looks fine
-		when there is no alpha at all and the anti-aliasing is off."""
-		# In this example, the user paints in blue and clicks on X (red):
-		#
-		# rrrrrrrrrrrrrrrrrrrrrrrrr
-		# rrrgggggggggggggggggrrXrr
-		# rrrgaaaaaaaaaaaaaaagrrrrr
-		# rrrgaaaaaaaaaaaaaaagrrrrr
-		# rrrgggggggggggggggggrraaa
-		# rrrrrrrrrrrrrrrrrrrrrraaa
-		#
-		# All red pixels will be painted blue, but FIXME all the green ones too.
-		if operation['path'] is None:
-			return
-
-		# First, everything BUT the targeted area is erased
-		surface = self.get_surface()
-		cairo_context = cairo.Context(surface)
-		old_rgba = operation['old_rgba']
-		cairo_context.set_source_rgba(255, 255, 255, 1.0)
-		cairo_context.append_path(operation['path'])
-		cairo_context.set_operator(cairo.Operator.DEST_IN)
-		cairo_context.set_line_width(4) # ptêt too much mdr
-		cairo_context.set_antialias(cairo.Antialias.NONE)
-		cairo_context.stroke_preserve()
-		# cairo_context.fill_preserve()
-
-		# The result is loaded as the temp pixbuf…
-		self.get_image().set_temp_pixbuf(Gdk.pixbuf_get_from_surface(surface, \
-		                       0, 0, surface.get_width(), surface.get_height()))
-		# …where the targeted color is replaced by pure alpha
-		TOLERANCE = 10 # XXX uuugly
-		i = -1 * TOLERANCE
-		while i < TOLERANCE:
-			red = max(0, old_rgba[0]+i)
-			green = max(0, old_rgba[1]+i)
-			blue = max(0, old_rgba[2]+i)
-			red = int(min(255, red))
-			green = int(min(255, green))
-			blue = int(min(255, blue))
-			self._replace_temp_with_alpha(red, green, blue)
-			i = i+1
-
-		# The main pixbuf is restored, since its alterations were a side effect
-		# of this highly stupid algorithm
-		self.restore_pixbuf()
-		# We get a context from it again
-		cairo_context2 = self.get_context()
-
-		# The content of the path is cleared
-		cairo_context2.append_path(operation['path'])
-		cairo_context2.set_operator(cairo.Operator.CLEAR)
-		cairo_context2.set_source_rgba(255, 255, 255, 1.0)
-		cairo_context2.set_line_width(3) # ptêt too much mdr
-		cairo_context.set_antialias(cairo.Antialias.NONE)
-		cairo_context2.stroke_preserve()
-		cairo_context2.fill()
-
-		# The temp pixbuf (where "only" the pixels around the outline which are
-		# not in the targeted color still exist) is shown on top of the image
-		cairo_context2.set_operator(cairo.Operator.OVER)
-		Gdk.cairo_set_source_pixbuf(cairo_context2, \
-		                                     self.get_image().temp_pixbuf, 0, 0)
-		cairo_context2.paint()
-		self.non_destructive_show_modif()
-
-		# The transparent pixels within the path are painted with the new color
-		cairo_context2.set_operator(cairo.Operator.DEST_OVER)
-		cairo_context2.set_source_rgba(*operation['new_rgba'])
-		cairo_context2.append_path(operation['path'])
-		# cairo_context2.paint()
-		cairo_context2.set_line_width(3) # ptêt too much mdr
-		cairo_context2.stroke_preserve()
-		cairo_context2.fill()
-
-	def _replace_temp_with_alpha(self, red, green, blue):
-		new_pixbuf = self.get_image().temp_pixbuf.add_alpha(True, red, green, blue)
-		self.get_image().set_temp_pixbuf(new_pixbuf)
+		cairo_context.mask_surface(mask, mask_x, mask_y)
+		self.report_damage((mask_x, mask_y, mask_x + mask.get_width(), \
+		                                            mask_y + mask.get_height()))
 
 	############################################################################
 ################################################################################
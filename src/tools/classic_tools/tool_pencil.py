@@ -27,6 +27,10 @@ class ToolPencil(AbstractClassicTool):
 		self.use_operator = True
 
 		self._path = None
+		self._points = []
+		self._lengths = []
+		self._nb_drawn_points = 0
+		self._incremental = False
 		self._shape_label = _("Round")
 		self._cap_id = cairo.LineCap.ROUND
 		self._join_id = cairo.LineCap.ROUND
@@ -80,26 +84,41 @@ class ToolPencil(AbstractClassicTool):
 	def on_press_on_area(self, event, surface, event_x, event_y):
 		self.set_common_values(event.button, event_x, event_y)
 		self._path = None
+		self._points = [(self.x_press, self.y_press)]
+		self._lengths = [0.0]
+		self._nb_drawn_points = 0
 
 		self.update_modifier_state(event.state)
 		if 'ALT' in self._modifier_keys:
 			self._use_outline = not self._use_outline
+		self._incremental = self._can_render_incrementally()
 
 	def _add_point(self, event_x, event_y):
-		cairo_context = self.get_context()
+		last_x, last_y = self._points[-1]
+		segment_length = math.sqrt((event_x - last_x) ** 2 + \
+		                                                  (event_y - last_y) ** 2)
+		self._points.append((event_x, event_y))
+		self._lengths.append(self._lengths[-1] + segment_length)
+		self._path = None # it will be built again only if it's needed
+
+	def _get_path(self):
 		if self._path is None:
-			cairo_context.move_to(self.x_press, self.y_press)
-		else:
-			cairo_context.append_path(self._path)
-		cairo_context.line_to(event_x, event_y)
-		self._path = cairo_context.copy_path()
+			cairo_context = self.get_context()
+			cairo_context.move_to(*self._points[0])
+			for point in self._points[1:]:
+				cairo_context.line_to(*point)
+			self._path = cairo_context.copy_path()
+		return self._path
 
 	def on_motion_on_area(self, event, surface, event_x, event_y, render=True):
 		self._add_point(event_x, event_y)
 		if not render:
 			return
-		operation = self.build_operation()
-		self.do_tool_operation(operation)
+		if self._incremental:
+			self._draw_new_segments()
+		else:
+			operation = self.build_operation()
+			self.do_tool_operation(operation)
 
 	def on_release_on_area(self, event, surface, event_x, event_y):
 		self._add_point(event_x, event_y)
@@ -123,6 +142,52 @@ class ToolPencil(AbstractClassicTool):
 		operation = self.build_operation()
 		self.apply_operation(operation)
 
+	############################################################################
+	# Incremental rendering ####################################################
+
+	def _can_render_incrementally(self):
+		"""During the drag, the stroke can be rendered segment by segment on
+		the working surface only if stroking a part of it twice changes nothing,
+		i.e. if the color is opaque and the operator doesn't accumulate. The
+		outline would be painted over the previous segments, so it's excluded
+		too. Otherwise, the full path is replayed at each motion event."""
+		if self._use_outline or self.main_color[3] < 1.0:
+			return False
+		return self._operator in (cairo.Operator.OVER, cairo.Operator.SOURCE)
+
+	def _draw_new_segments(self):
+		"""Stroke only the segments added since the previous rendering, without
+		restoring the pixbuf. The last already-rendered segment is stroked again
+		so the join between the old and the new segments is correct, and the
+		dash pattern is shifted by the length of the path that isn't stroked.
+		The smoothing is ignored: the complete path will be replayed once, when
+		the operation will be applied."""
+		if self._nb_drawn_points == 0:
+			self.restore_pixbuf()
+			self._ongoing_operation = True
+		first_index = max(0, self._nb_drawn_points - 2)
+		if len(self._points) - first_index < 2:
+			return
+
+		cairo_context = self.get_context()
+		if self._use_antialias:
+			cairo_context.set_antialias(cairo.Antialias.DEFAULT)
+		else:
+			cairo_context.set_antialias(cairo.Antialias.NONE)
+		cairo_context.set_operator(self._operator)
+		self.set_dashes_and_cap(cairo_context, self.tool_width, \
+		        self._dashes_type, self._cap_id, self._lengths[first_index])
+		cairo_context.set_line_join(self._join_id)
+
+		cairo_context.move_to(*self._points[first_index])
+		for point in self._points[first_index + 1:]:
+			cairo_context.line_to(*point)
+		cairo_context.set_source_rgba(*self.main_color)
+		cairo_context.set_line_width(self.tool_width)
+		self.report_damage(cairo_context.stroke_extents())
+		cairo_context.stroke()
+		self._nb_drawn_points = len(self._points)
+
 	############################################################################
 
 	def build_operation(self):
@@ -138,7 +203,7 @@ class ToolPencil(AbstractClassicTool):
 			'line_cap': self._cap_id,
 			'line_join': self._join_id,
 			'dashes': self._dashes_type,
-			'path': self._path
+			'path': self._get_path()
 		}
 		return operation
 
@@ -161,10 +226,13 @@ class ToolPencil(AbstractClassicTool):
 		if operation['outline']:
 			cairo_context.set_source_rgba(*operation['rgba2'])
 			cairo_context.set_line_width(line_width * 1.2 + 2)
+			self.report_damage(cairo_context.stroke_extents())
 			cairo_context.stroke_preserve()
 
 		cairo_context.set_source_rgba(*operation['rgba'])
 		cairo_context.set_line_width(line_width)
+		if not operation['outline']:
+			self.report_damage(cairo_context.stroke_extents())
 		cairo_context.stroke()
 
 	############################################################################
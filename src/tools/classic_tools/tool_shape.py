@@ -362,6 +362,8 @@ class ToolShape(AbstractClassicTool):
 			cairo_context.append_path(operation['path'])
 		if operation['closed']:
 			cairo_context.close_path()
+		# the filling is never out of the outline's extents
+		self.report_damage(cairo_context.stroke_extents())
 
 		cairo_context.set_operator(operation['operator'])
 		color_main = operation['rgba_main']
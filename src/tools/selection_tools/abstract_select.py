@@ -20,7 +20,8 @@ from gi.repository import Gtk
 from .abstract_tool import AbstractAbstractTool
 from .optionsbar_selection import OptionsBarSelection
 from .utilities_colors import utilities_gdk_rgba_to_normalized_array
-from .utilities_overlay import utilities_show_overlay_on_context
+from .utilities_overlay import utilities_show_overlay_on_context, \
+                              utilities_show_mask_overlay_on_context
 from .selection_manager import NoSelectionPixbufException
 
 class AbstractSelectionTool(AbstractAbstractTool):
@@ -175,6 +176,14 @@ class AbstractSelectionTool(AbstractAbstractTool):
 		ldx = self.local_dx
 		ldy = self.local_dy
 		self.get_selection().show_selection_on_surface(ccontext, True, ldx, ldy)
+		if self.get_selection().selection_path is None:
+			# the selection was defined by a mask, which isn't converted to a
+			# path just to be shown
+			dragged_mask = self.get_selection().get_mask_with_scroll(ldx, ldy)
+			zoom_level = self.get_image().zoom_level
+			utilities_show_mask_overlay_on_context(ccontext, dragged_mask, \
+			                                                         zoom_level)
+			return
 		dragged_path = self.get_selection().get_path_with_scroll(ldx, ldy)
 		# ^ Method not really use elsewhere, could it be private?
 		thickness = self.get_overlay_thickness()
@@ -200,6 +209,9 @@ class AbstractSelectionTool(AbstractAbstractTool):
 	def _pre_load_path(self, path, resync_coords=True):
 		self.get_selection().set_future_path(path, resync_coords)
 
+	def _pre_load_mask(self, mask):
+		self.get_selection().set_future_mask(mask)
+
 	def _build_rectangle_path(self, press_x, press_y, release_x, release_y):
 		"""Build rectangle path and pre-load it in the selection manager. This
 		is used in `self.select_all` (abstract, here), and in the "rectangle
@@ -239,8 +251,8 @@ class AbstractSelectionTool(AbstractAbstractTool):
 		self.operation_type = 'op-define'
 
 	def select_all(self):
-		total_w = self.get_main_pixbuf().get_width()
-		total_h = self.get_main_pixbuf().get_height()
+		total_w = self.get_image().get_pixbuf_width()
+		total_h = self.get_image().get_pixbuf_height()
 		self._build_rectangle_path(0, 0, total_w, total_h)
 		self.operation_type = 'op-define'
 		operation = self.build_operation()
@@ -279,7 +291,24 @@ class AbstractSelectionTool(AbstractAbstractTool):
 		self.operation_type = 'op-define'
 
 	def invert_selection(self):
-		pass # TODO
+		"""The current selection is applied, and then the pixels it didn't
+		cover are selected."""
+		if not self.selection_is_active():
+			self.select_all()
+			return
+		total_w = self.get_image().get_pixbuf_width()
+		total_h = self.get_image().get_pixbuf_height()
+		inverted_mask = self.get_selection().get_mask().invert(total_w, total_h)
+		self.unselect_and_apply()
+		self._define_from_mask(inverted_mask)
+
+	def _define_from_mask(self, mask):
+		if mask.get_extents() is None:
+			return # nothing to select
+		self._pre_load_mask(mask)
+		self.operation_type = 'op-define'
+		operation = self.build_operation()
+		self.apply_operation(operation)
 
 	def unselect_and_apply(self):
 		# Pre-loading the coords is NEEDED because we may "unselect_and_apply" a
@@ -327,6 +356,7 @@ class AbstractSelectionTool(AbstractAbstractTool):
 			'tool_id': self.id,
 			'operation_type': self.operation_type,
 			'initial_path': self.get_selection().get_future_path(),
+			'initial_mask': self.get_selection().get_future_mask(),
 			'replacement': color,
 			'extract': self.get_option_value('selection-extract'),
 			'pixbuf': pixbuf,
@@ -358,15 +388,20 @@ class AbstractSelectionTool(AbstractAbstractTool):
 		self.get_selection().reset_future_data()
 
 	def _op_clean(self, operation):
-		if operation['initial_path'] is None:
+		initial_mask = operation.get('initial_mask')
+		if operation['initial_path'] is None and initial_mask is None:
 			return # The user double-clicked: there is no path, and it's normal
 		cairo_context = self.get_context()
-		cairo_context.new_path()
-		cairo_context.append_path(operation['initial_path'])
 		replacement_rgba = operation['replacement']
 		cairo_context.set_operator(cairo.Operator.SOURCE)
 		cairo_context.set_source_rgba(*replacement_rgba)
-		cairo_context.fill()
+		if initial_mask is not None:
+			cairo_context.mask_surface(initial_mask.get_surface(), \
+			                                     initial_mask.x, initial_mask.y)
+		else:
+			cairo_context.new_path()
+			cairo_context.append_path(operation['initial_path'])
+			cairo_context.fill()
 		cairo_context.set_operator(cairo.Operator.OVER)
 
 	def _op_drag(self, op):
@@ -375,14 +410,18 @@ class AbstractSelectionTool(AbstractAbstractTool):
 		self.non_destructive_show_modif()
 
 	def _op_define(self, op):
-		if op['initial_path'] is None:
+		initial_mask = op.get('initial_mask')
+		if op['initial_path'] is None and initial_mask is None:
 			return # The user double-clicked: there is no path, and it's normal
 		self.get_selection().set_coords(True, op['pixb_x'], op['pixb_y'])
 		if op['extract']:
 			replacement = op['replacement']
 		else:
 			replacement = None
-		self.get_selection().load_from_path(op['initial_path'], replacement)
+		if initial_mask is not None:
+			self.get_selection().load_from_mask(initial_mask, replacement)
+		else:
+			self.get_selection().load_from_path(op['initial_path'], replacement)
 
 	def _op_apply(self, operation):
 		cairo_context = self.get_context()
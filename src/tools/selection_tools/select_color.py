@@ -15,11 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from gi.repository import Gio
 from .abstract_select import AbstractSelectionTool
 from .utilities_colors import utilities_get_rgba_name, \
                               utilities_gdk_rgba_from_xy, \
                               utilities_gdk_rgba_to_hexadecimal
-from .utilities_paths import utilities_get_magic_path
+from .utilities_flood_fill import utilities_get_fill_mask
+from .selection_mask import DrSelectionMask
 
 class ToolColorSelect(AbstractSelectionTool):
 	__gtype_name__ = 'ToolColorSelect'
@@ -29,9 +31,22 @@ class ToolColorSelect(AbstractSelectionTool):
 		# color. For example clicking on a white pixel will select the
 		# surrounding area made of white pixels.
 		super().__init__('color_select', _("Color selection"), 'tool-magic-symbolic', window)
+		self.add_tool_action_boolean('areas-outline', False)
+
+	def get_options_model(self):
+		"""The menu shared by the selection tools, with the option specific to
+		this tool."""
+		model = super().get_options_model()
+		section = Gio.Menu()
+		# Context: an option to analyze the image when the tool is selected,
+		# and show the area that would be selected by a click
+		section.append(_("Outline the hovered area"), 'win.areas-outline')
+		model.append_section(None, section)
+		return model
 
 	def get_tooltip(self, event_x, event_y, motion_behavior):
-		color = utilities_gdk_rgba_from_xy(self.get_surface(), event_x, event_y)
+		sampler = self.get_image().get_pixel_sampler()
+		color = utilities_gdk_rgba_from_xy(sampler, event_x, event_y)
 		if color is None:
 			return None
 		color_name = utilities_get_rgba_name(color)
@@ -40,16 +55,53 @@ class ToolColorSelect(AbstractSelectionTool):
 
 	def get_editing_tips(self):
 		tips = super().get_editing_tips()
-		if not self.selection_is_active():
-			label_warning1 = self.label + " - " + _("May not work for complex shapes")
-			tips.append(label_warning1)
-			label_warning2 = self.label + " - " + _("It will not work well " + \
+		if self.selection_is_active():
+			label_combine = _("Click with Shift to add an area to the " + \
+			               "selection, with Alt to remove it, or with both " + \
+			                            "to keep only what they have in common")
+			tips.append(label_combine)
+		else:
+			label_warning = self.label + " - " + _("It will not work well " + \
 				                               "if the area's edges are blurry")
-			tips.append(label_warning2)
+			tips.append(label_warning)
 		return tips
 
 	############################################################################
 
+	def on_tool_selected(self, *args):
+		super().on_tool_selected()
+		if self.get_option_value('areas-outline'):
+			self.get_image().prepare_label_map()
+
+	def on_tool_unselected(self, *args):
+		self.update_area_outline(None, None)
+		super().on_tool_unselected()
+
+	def on_unclicked_motion_on_area(self, event, surface):
+		super().on_unclicked_motion_on_area(event, surface)
+		if self.selection_is_active() \
+		or not self.get_option_value('areas-outline'):
+			self.update_area_outline(None, None)
+			return
+		self.get_image().prepare_label_map()
+		x, y = self.get_image().get_event_coords(event)
+		self.update_area_outline(x, y)
+
+	def on_draw_above(self, area, ccontext):
+		super().on_draw_above(area, ccontext)
+		if not self.selection_is_active():
+			self.show_area_outline(ccontext)
+
+	############################################################################
+
+	def _get_press_behavior(self, event):
+		self.update_modifier_state(event.state)
+		if event.button == 1 and self.selection_is_active() \
+		and len(self._modifier_keys) > 0:
+			# the clicked area will be combined with the selection
+			return 'define'
+		return super()._get_press_behavior(event)
+
 	def press_define(self, event_x, event_y):
 		pass
 
@@ -57,13 +109,46 @@ class ToolColorSelect(AbstractSelectionTool):
 		pass
 
 	def release_define(self, surfc, event_x, event_y):
-		path = utilities_get_magic_path(surfc, event_x, event_y, self.window, 1)
-		self._pre_load_path(path)
-		if path is None:
+		x, y = int(event_x), int(event_y)
+		if x < 0 or y < 0 or x >= surfc.get_width() or y >= surfc.get_height():
+			return
+		selection_mask = None
+		if self.selection_is_active():
+			selection_mask = self.get_selection().get_mask()
+			# The current selection is applied first, so the clicked area is
+			# found in the pixels as the user sees them, and not in what was
+			# below the selection.
+			self.unselect_and_apply()
+			surfc = self.get_surface()
+		mask = self._get_area_mask(surfc, event_x, event_y)
+		if mask is None:
 			return
-		self.operation_type = 'op-define'
-		operation = self.build_operation()
-		self.apply_operation(operation)
+		if selection_mask is not None:
+			mask = self._combine_with_selection(selection_mask, mask)
+		self._define_from_mask(mask)
+
+	def _get_area_mask(self, surface, x, y):
+		"""The area of the clicked color is exactly the one the paint tool
+		would fill, read from the label map if it's ready (it isn't if the
+		selection has just been applied)."""
+		label_map = self.get_image().get_label_map()
+		if label_map is not None:
+			area = label_map.get_area_mask(x, y)
+			if area is None:
+				return None
+			return DrSelectionMask(*area)
+		fill_mask = utilities_get_fill_mask(surface, x, y)
+		if fill_mask is None:
+			return None
+		return DrSelectionMask(fill_mask)
+
+	def _combine_with_selection(self, selection_mask, mask):
+		if 'SHIFT' in self._modifier_keys and 'ALT' in self._modifier_keys:
+			return selection_mask.intersect(mask)
+		elif 'SHIFT' in self._modifier_keys:
+			return selection_mask.add(mask)
+		else: # if 'ALT' in self._modifier_keys:
+			return selection_mask.subtract(mask)
 
 	############################################################################
 ################################################################################
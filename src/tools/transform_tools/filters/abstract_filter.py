@@ -1,5 +1,7 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
+from .utilities_color_ops import utilities_apply_color_op
+
 class AbstractFilter():
 	__gtype_name__ = 'AbstractFilter'
 
@@ -20,7 +22,34 @@ class AbstractFilter():
 		return {}
 
 	def do_filter_operation(self, source_pixbuf, operation):
-		pass
+		"""Returns a new pixbuf: the result of the filter applied on
+		`source_pixbuf` with the parameters of the operation."""
+		steps = self.get_color_steps(operation)
+		if steps is None:
+			return source_pixbuf.copy()
+		return utilities_apply_color_op(source_pixbuf, steps)
+
+	def get_color_steps(self, operation):
+		"""If the filter only changes the color of each pixel independently of
+		its neighbors, returns the steps of the color operation doing it (see
+		utilities_color_ops), so it can be fused with similar filters."""
+		return None
+
+	def scale_filter_op(self, operation, scale):
+		"""Returns the operation with its parameters adapted to a source which
+		has been downscaled by `scale`, to render a quick preview."""
+		return operation
+
+	def get_needed_area(self, area, operation):
+		"""Returns the rectangle (x, y, width, height) of the source which is
+		needed to compute exactly the given rectangle of the result."""
+		return area
+
+	def get_grid_size(self, operation):
+		"""Returns the width and height of the grid to which the result of the
+		filter is aligned (if the source is cropped, it should start on this
+		grid to give the same result)."""
+		return 1, 1
 
 	############################################################################
 ################################################################################
@@ -1,8 +1,10 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
+import math
 from gi.repository import Gdk
 from .abstract_filter import AbstractFilter
-from .utilities_blur import utilities_blur_surface, BlurType, BlurDirection
+from .utilities_blur import utilities_blur_surface, BlurType, BlurDirection, \
+                            utilities_get_blur_grid_size
 
 class FilterBlur(AbstractFilter):
 	__gtype_name__ = 'FilterBlur'
@@ -44,7 +46,7 @@ class FilterBlur(AbstractFilter):
 	def do_filter_operation(self, source_pixbuf, operation):
 		blur_algo = operation['blur_algo']
 		if blur_algo == BlurType.INVALID:
-			return
+			return source_pixbuf.copy()
 		b_radius = operation['radius']
 		b_direction = operation['blur_direction']
 
@@ -54,7 +56,45 @@ class FilterBlur(AbstractFilter):
 
 		bs = utilities_blur_surface(surface, b_radius, blur_algo, b_direction)
 		bp = Gdk.pixbuf_get_from_surface(bs, 0, 0, bs.get_width(), bs.get_height())
-		self._tool.get_image().set_temp_pixbuf(bp)
+		return bp
+
+	def scale_filter_op(self, operation, scale):
+		if operation['radius'] > 0:
+			radius = max(1, round(operation['radius'] * scale))
+			return {**operation, 'radius': radius}
+		return operation
+
+	def get_grid_size(self, operation):
+		radius = operation['radius']
+		if operation['blur_algo'] == BlurType.TILES:
+			tile_w = tile_h = radius
+			if operation['blur_direction'] == BlurDirection.HORIZONTAL:
+				tile_h = 1
+			elif operation['blur_direction'] == BlurDirection.VERTICAL:
+				tile_w = 1
+			return tile_w, tile_h
+		grid = utilities_get_blur_grid_size(radius, operation['blur_algo'])
+		return grid, grid
+
+	def get_needed_area(self, area, operation):
+		x, y, width, height = area
+		radius = operation['radius']
+		if operation['blur_algo'] == BlurType.TILES:
+			# the area is extended to complete tiles, whose grid starts at 0, 0
+			tile_w, tile_h = self.get_grid_size(operation)
+			x1 = (x // tile_w) * tile_w
+			y1 = (y // tile_h) * tile_h
+			x2 = math.ceil((x + width) / tile_w) * tile_w
+			y2 = math.ceil((y + height) / tile_h) * tile_h
+			return x1, y1, x2 - x1, y2 - y1
+		# the gaussian and approximate blurs spread further than the radius
+		margin = 2 * radius + 2
+		grid = self.get_grid_size(operation)[0]
+		x1 = ((x - margin) // grid) * grid
+		y1 = ((y - margin) // grid) * grid
+		x2 = math.ceil((x + width + margin) / grid) * grid
+		y2 = math.ceil((y + height + margin) / grid) * grid
+		return x1, y1, x2 - x1, y2 - y1
 
 	############################################################################
 ################################################################################
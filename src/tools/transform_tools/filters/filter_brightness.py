@@ -0,0 +1,34 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+from .abstract_filter import AbstractFilter
+from .utilities_color_ops import utilities_color_matrix_brightness
+
+class FilterBrightness(AbstractFilter):
+	__gtype_name__ = 'FilterBrightness'
+
+	def __init__(self, filter_id, filters_tool, *args):
+		super().__init__(filter_id, filters_tool)
+		self._label, self._spinbtn = self._tool.bar.add_spinbtn( \
+		                    _("Brightness"), [0, -100, 100, 5, 10, 0], 3, '%')
+		# it's [value, lower, upper, step_increment, page_increment, page_size]
+
+	def get_preferred_minimum_width(self):
+		return self._label.get_preferred_width()[0] + \
+		     self._spinbtn.get_preferred_width()[0]
+
+	def set_filter_compact(self, is_active, is_compact):
+		self._label.set_visible(is_active and not is_compact)
+		self._spinbtn.set_visible(is_active)
+
+	def build_filter_op(self):
+		options = {
+			'percent': self._spinbtn.get_value() / 100
+		}
+		return options
+
+	def get_color_steps(self, operation):
+		return [utilities_color_matrix_brightness(operation['percent'])]
+
+	############################################################################
+################################################################################
+
@@ -1,8 +1,7 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
-import cairo
-from gi.repository import Gdk
 from .abstract_filter import AbstractFilter
+from .utilities_color_ops import utilities_color_lut_contrast
 
 class FilterContrast(AbstractFilter):
 	__gtype_name__ = 'FilterContrast'
@@ -27,32 +26,12 @@ class FilterContrast(AbstractFilter):
 		}
 		return options
 
-	def do_filter_operation(self, source_pixbuf, operation):
-		"""Create a temp_pixbuf from a surface of the same size, whose cairo
-		context is first painted using the original surface (source operator),
-		which is basically a stupid way to copy it, and then painted again (with
-		alpha this time) using a blending mode that will increase the contrast.
-		Both OVERLAY, SOFT_LIGHT, and HARD_LIGHT can work as operators."""
-		percent = operation['percent']
-		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
-		scale = self._tool.scale_factor()
-		surface.set_device_scale(scale, scale)
-		width = source_pixbuf.get_width()
-		height = source_pixbuf.get_height()
-		new_surface = cairo.ImageSurface(cairo.Format.ARGB32, width, height)
-		cairo_context = cairo.Context(new_surface)
-		cairo_context.set_source_surface(surface)
-
-		cairo_context.set_operator(cairo.Operator.SOURCE)
-		cairo_context.paint()
-
-		cairo_context.set_operator(cairo.Operator.SOFT_LIGHT)
-		# OVERLAY SOFT_LIGHT HARD_LIGHT
-		cairo_context.paint_with_alpha(percent)
-
-		new_pixbuf = Gdk.pixbuf_get_from_surface(new_surface, 0, 0, \
-		                      new_surface.get_width(), new_surface.get_height())
-		self._tool.get_image().set_temp_pixbuf(new_pixbuf)
+	def get_color_steps(self, operation):
+		"""The contrast is increased as if the image was painted again over
+		itself, with the SOFT_LIGHT blending mode, and `percent` as the alpha.
+		Since the result of this blending only depends on the value of each
+		channel, it's computed once in a lookup table."""
+		return [utilities_color_lut_contrast(operation['percent'])]
 
 	############################################################################
 ################################################################################
@@ -0,0 +1,37 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+from gi.repository import Gdk
+from .abstract_filter import AbstractFilter
+from .utilities_convolution import utilities_convolve_surface, \
+                                   utilities_convolution_is_available, \
+                                   utilities_edges_surface, \
+                                   utilities_get_kernel_radius
+
+class FilterEdges(AbstractFilter):
+	__gtype_name__ = 'FilterEdges'
+
+	# Laplacian kernel: the flat areas become black, the edges become bright
+	KERNEL = [
+		[-1, -1, -1],
+		[-1, 8, -1],
+		[-1, -1, -1],
+	]
+
+	def get_needed_area(self, area, operation):
+		margin = utilities_get_kernel_radius(self.KERNEL)
+		x, y, width, height = area
+		return x - margin, y - margin, width + 2 * margin, height + 2 * margin
+
+	def do_filter_operation(self, source_pixbuf, operation):
+		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
+		if utilities_convolution_is_available():
+			new_surface = utilities_convolve_surface(surface, self.KERNEL)
+		else:
+			new_surface = utilities_edges_surface(surface)
+		new_pixbuf = Gdk.pixbuf_get_from_surface(new_surface, 0, 0, \
+		                      new_surface.get_width(), new_surface.get_height())
+		return new_pixbuf
+
+	############################################################################
+################################################################################
+
@@ -1,40 +1,37 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
-import cairo
 from gi.repository import Gdk
 from .abstract_filter import AbstractFilter
-from .utilities_blur import utilities_blur_surface, BlurType, BlurDirection
+from .utilities_convolution import utilities_convolve_surface, \
+                                   utilities_convolution_is_available, \
+                                   utilities_get_kernel_radius, \
+                                   utilities_high_pass_surface
 
 class FilterEmboss(AbstractFilter):
 	__gtype_name__ = 'FilterEmboss'
 
-	def do_filter_operation(self, source_pixbuf, operation):
-		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
-		scale = self._tool.scale_factor()
-		surface.set_device_scale(scale, scale)
-		width = source_pixbuf.get_width()
-		height = source_pixbuf.get_height()
-		new_surface = cairo.ImageSurface(cairo.Format.ARGB32, width, height)
-
-		cairo_context = cairo.Context(new_surface)
-		cairo_context.set_source_surface(surface)
-		cairo_context.set_operator(cairo.Operator.SOURCE)
-		cairo_context.paint()
+	# The light comes from the top-left corner, and the flat areas become gray
+	KERNEL = [
+		[-0.5, -0.5, 0.0],
+		[-0.5, 0.0, 0.5],
+		[0.0, 0.5, 0.5],
+	]
 
-		bdir = BlurDirection.BOTH # could be an option
-		bs = utilities_blur_surface(surface, 1, BlurType.CAIRO_REPAINTS, bdir)
-		cairo_context2 = cairo.Context(bs)
-		cairo_context2.set_operator(cairo.Operator.DIFFERENCE)
-		cairo_context2.set_source_rgba(1.0, 1.0, 1.0, 1.0)
-		cairo_context2.paint()
-
-		cairo_context.set_source_surface(bs)
-		cairo_context.set_operator(cairo.Operator.OVER)
-		cairo_context.paint_with_alpha(0.5)
+	def get_needed_area(self, area, operation):
+		margin = utilities_get_kernel_radius(self.KERNEL)
+		x, y, width, height = area
+		return x - margin, y - margin, width + 2 * margin, height + 2 * margin
 
+	def do_filter_operation(self, source_pixbuf, operation):
+		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
+		if utilities_convolution_is_available():
+			new_surface = utilities_convolve_surface(surface, self.KERNEL, 0.5)
+		else:
+			# approximation, which is how this filter worked before kernels
+			new_surface = utilities_high_pass_surface(surface)
 		new_pixbuf = Gdk.pixbuf_get_from_surface(new_surface, 0, 0, \
 		                      new_surface.get_width(), new_surface.get_height())
-		self._tool.get_image().set_temp_pixbuf(new_pixbuf)
+		return new_pixbuf
 
 	############################################################################
 ################################################################################
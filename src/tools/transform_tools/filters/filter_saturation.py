@@ -1,6 +1,8 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
 from .abstract_filter import AbstractFilter
+from .utilities_color_ops import utilities_color_matrix_saturation, \
+                                 utilities_is_color_op_fast
 
 class FilterSaturation(AbstractFilter):
 	__gtype_name__ = 'FilterSaturation'
@@ -25,10 +27,20 @@ class FilterSaturation(AbstractFilter):
 		}
 		return options
 
+	def get_color_steps(self, operation):
+		steps = [utilities_color_matrix_saturation(operation['percent'])]
+		if utilities_is_color_op_fast(steps):
+			return steps
+		# without NumPy, GdkPixbuf does the same much faster than Python
+		return None
+
 	def do_filter_operation(self, source_pixbuf, operation):
-		self._tool.get_image().set_temp_pixbuf(source_pixbuf.copy())
-		temp = self._tool.get_image().temp_pixbuf
-		source_pixbuf.saturate_and_pixelate(temp, operation['percent'], False)
+		if self.get_color_steps(operation) is not None:
+			return super().do_filter_operation(source_pixbuf, operation)
+		new_pixbuf = source_pixbuf.copy()
+		source_pixbuf.saturate_and_pixelate(new_pixbuf, operation['percent'], \
+		                                                                 False)
+		return new_pixbuf
 
 	############################################################################
 ################################################################################
@@ -0,0 +1,70 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo
+from gi.repository import Gdk
+from .abstract_filter import AbstractFilter
+from .utilities_convolution import utilities_convolve_surface, \
+                                   utilities_convolution_is_available, \
+                                   utilities_get_kernel_radius, \
+                                   utilities_high_pass_surface
+
+class FilterSharpen(AbstractFilter):
+	__gtype_name__ = 'FilterSharpen'
+
+	def __init__(self, filter_id, filters_tool, *args):
+		super().__init__(filter_id, filters_tool)
+		self._label, self._spinbtn = self._tool.bar.add_spinbtn( \
+		                          _("Sharpness"), [50, 0, 100, 5, 10, 0], 3, '%')
+		# it's [value, lower, upper, step_increment, page_increment, page_size]
+
+	def get_preferred_minimum_width(self):
+		return self._label.get_preferred_width()[0] + \
+		     self._spinbtn.get_preferred_width()[0]
+
+	def set_filter_compact(self, is_active, is_compact):
+		self._label.set_visible(is_active and not is_compact)
+		self._spinbtn.set_visible(is_active)
+
+	def build_filter_op(self):
+		options = {
+			'percent': self._spinbtn.get_value() / 100
+		}
+		return options
+
+	def _get_kernel(self, percent):
+		"""The difference between the pixel and its neighbors is amplified."""
+		return [
+			[0, -1 * percent, 0],
+			[-1 * percent, 1 + 4 * percent, -1 * percent],
+			[0, -1 * percent, 0],
+		]
+
+	def get_needed_area(self, area, operation):
+		margin = utilities_get_kernel_radius(self._get_kernel(0))
+		x, y, width, height = area
+		return x - margin, y - margin, width + 2 * margin, height + 2 * margin
+
+	def do_filter_operation(self, source_pixbuf, operation):
+		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
+		if utilities_convolution_is_available():
+			kernel = self._get_kernel(operation['percent'])
+			new_surface = utilities_convolve_surface(surface, kernel)
+		else:
+			new_surface = self._sharpen_with_cairo(surface, operation['percent'])
+		new_pixbuf = Gdk.pixbuf_get_from_surface(new_surface, 0, 0, \
+		                      new_surface.get_width(), new_surface.get_height())
+		return new_pixbuf
+
+	def _sharpen_with_cairo(self, surface, percent):
+		"""Approximation without NumPy: the details of the image are overlaid
+		on it, so they're more contrasted."""
+		high_pass = utilities_high_pass_surface(surface)
+		cairo_context = cairo.Context(surface)
+		cairo_context.set_operator(cairo.Operator.OVERLAY)
+		cairo_context.set_source_surface(high_pass)
+		cairo_context.paint_with_alpha(percent)
+		return surface
+
+	############################################################################
+################################################################################
+
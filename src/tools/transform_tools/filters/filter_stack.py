@@ -0,0 +1,73 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import math
+from .abstract_filter import AbstractFilter
+from .utilities_color_ops import utilities_apply_color_op
+
+class FilterStack(AbstractFilter):
+	"""Applies in one operation the filters of the stack (the operations in
+	`operation['stack']`), and then the filter of the operation itself."""
+	__gtype_name__ = 'FilterStack'
+
+	def _get_layers(self, operation):
+		"""Returns the list of the (filter, operation) tuples to apply, in the
+		order of their application."""
+		layers = operation['stack'] + [operation]
+		return [(self._tool.get_filter(op['filter_id']), op) for op in layers]
+
+	def do_filter_operation(self, source_pixbuf, operation):
+		"""The consecutive filters which only change the colors are fused, so
+		their result is computed in one pass, without intermediate pixbuf."""
+		pixbuf = source_pixbuf
+		pending_steps = []
+		for layer_filter, layer_op in self._get_layers(operation):
+			steps = layer_filter.get_color_steps(layer_op)
+			if steps is not None:
+				pending_steps += steps
+				continue
+			if len(pending_steps) > 0:
+				pixbuf = utilities_apply_color_op(pixbuf, pending_steps)
+				pending_steps = []
+			pixbuf = layer_filter.do_filter_operation(pixbuf, layer_op)
+		if len(pending_steps) > 0:
+			pixbuf = utilities_apply_color_op(pixbuf, pending_steps)
+		if pixbuf is source_pixbuf:
+			pixbuf = source_pixbuf.copy()
+		return pixbuf
+
+	def get_color_steps(self, operation):
+		all_steps = []
+		for layer_filter, layer_op in self._get_layers(operation):
+			steps = layer_filter.get_color_steps(layer_op)
+			if steps is None:
+				return None
+			all_steps += steps
+		return all_steps
+
+	def scale_filter_op(self, operation, scale):
+		layers = [f.scale_filter_op(op, scale) for f, op in \
+		                                            self._get_layers(operation)]
+		return {**layers[-1], 'stack': layers[:-1]}
+
+	def get_needed_area(self, area, operation):
+		"""The area needed by each filter is what the previous filter has to
+		compute exactly. The result starts on the grids of all the filters."""
+		for layer_filter, layer_op in reversed(self._get_layers(operation)):
+			area = layer_filter.get_needed_area(area, layer_op)
+		grid_w, grid_h = self.get_grid_size(operation)
+		x, y, width, height = area
+		x1 = (x // grid_w) * grid_w
+		y1 = (y // grid_h) * grid_h
+		return x1, y1, x + width - x1, y + height - y1
+
+	def get_grid_size(self, operation):
+		grid_w, grid_h = 1, 1
+		for layer_filter, layer_op in self._get_layers(operation):
+			layer_w, layer_h = layer_filter.get_grid_size(layer_op)
+			grid_w = grid_w * layer_w // math.gcd(grid_w, layer_w)
+			grid_h = grid_h * layer_h // math.gcd(grid_h, layer_h)
+		return grid_w, grid_h
+
+	############################################################################
+################################################################################
+
@@ -1,8 +1,7 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
-import cairo
-from gi.repository import Gdk
 from .abstract_filter import AbstractFilter
+from .utilities_color_ops import utilities_color_matrix_alpha
 
 class FilterTransparency(AbstractFilter):
 	__gtype_name__ = 'FilterTransparency'
@@ -27,27 +26,8 @@ class FilterTransparency(AbstractFilter):
 		}
 		return options
 
-	def do_filter_operation(self, source_pixbuf, operation):
-		"""Create a temp_pixbuf from a surface of the same size, whose cairo
-		context is painted (with alpha) using the original surface."""
-		percent = operation['percent']
-		surface = Gdk.cairo_surface_create_from_pixbuf(source_pixbuf, 0, None)
-		scale = self._tool.scale_factor()
-		surface.set_device_scale(scale, scale)
-		width = source_pixbuf.get_width()
-		height = source_pixbuf.get_height()
-		new_surface = cairo.ImageSurface(cairo.Format.ARGB32, width, height)
-		cairo_context = cairo.Context(new_surface)
-		cairo_context.set_source_surface(surface)
-		cairo_context.set_operator(cairo.Operator.SOURCE)
-
-		cairo_context.paint_with_alpha(1.0 - percent)
-		# TODO if percent is negative, paint first the normal version, and then
-		# paint with [-1 * percent] alpha the pixbuf
-
-		new_pixbuf = Gdk.pixbuf_get_from_surface(new_surface, 0, 0, \
-		                      new_surface.get_width(), new_surface.get_height())
-		self._tool.get_image().set_temp_pixbuf(new_pixbuf)
+	def get_color_steps(self, operation):
+		return [utilities_color_matrix_alpha(1.0 - operation['percent'])]
 
 	############################################################################
 ################################################################################
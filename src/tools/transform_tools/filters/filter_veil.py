@@ -8,9 +8,13 @@ class FilterVeil(AbstractFilter):
 	__gtype_name__ = 'FilterVeil'
 
 	def do_filter_operation(self, source_pixbuf, operation):
-		self._tool.get_image().set_temp_pixbuf(source_pixbuf.copy())
-		temp = self._tool.get_image().temp_pixbuf
-		source_pixbuf.saturate_and_pixelate(temp, 1, True)
+		new_pixbuf = source_pixbuf.copy()
+		source_pixbuf.saturate_and_pixelate(new_pixbuf, 1, True)
+		return new_pixbuf
+
+	def get_grid_size(self, operation):
+		# the pixelation darkens every other pixel, as a checkerboard
+		return 2, 2
 
 	############################################################################
 ################################################################################
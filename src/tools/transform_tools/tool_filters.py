@@ -15,22 +15,36 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import cairo
+import cairo, math, threading
+from collections import OrderedDict
 from gi.repository import Gdk, GdkPixbuf, Gio, GLib
 from .abstract_transform_tool import AbstractCanvasTool
 from .filter_blur import FilterBlur
+from .filter_brightness import FilterBrightness
 from .filter_colors import FilterColors
 from .filter_contrast import FilterContrast
+from .filter_edges import FilterEdges
 from .filter_emboss import FilterEmboss
 from .filter_saturation import FilterSaturation
+from .filter_sharpen import FilterSharpen
+from .filter_stack import FilterStack
 from .filter_transparency import FilterTransparency
 from .filter_veil import FilterVeil
 from .optionsbar_filters import OptionsBarFilters
+from .utilities_tracing import utilities_trace_span
 from .utilities_blur import utilities_blur_surface, BlurType, BlurDirection
 
 class ToolFilters(AbstractCanvasTool):
 	__gtype_name__ = 'ToolFilters'
 
+	# Above this number of pixels, the preview is first rendered on a smaller
+	# copy of the image, and then refined where the image is visible.
+	PROXY_MAX_PIXELS = 1024 * 1024
+	# Height of the bands computed successively in the background
+	BAND_HEIGHT = 256
+	# Maximal size of the previews kept in memory, in bytes
+	CACHE_MAX_BYTES = 128 * 1024 * 1024
+
 	def __init__(self, window):
 		super().__init__('filters', _("Filters"), 'tool-filters-symbolic', window)
 		self.cursor_name = 'pointer'
@@ -43,16 +57,33 @@ class ToolFilters(AbstractCanvasTool):
 		self.add_tool_action_enum('filters_blur_dir', 'none')
 		self.blur_algo = BlurType.INVALID
 
+		# Filters to apply before the active one, in the same operation
+		self._stack = []
+		self.add_tool_action_simple('filters_stack_push', self._push_to_stack)
+		self.add_tool_action_simple('filters_stack_clear', self._clear_stack)
+
+		# Filter computed in the background for the preview
+		self._filter_task = None
+		self._scale_factor = 1.0
+
+		# Least recently used previews, to show them again instantly
+		self._cache = OrderedDict()
+		self._cache_bytes = 0
+
 		# Initialisation of the filters
 		self._all_filters = {
 			'blur': FilterBlur('blur', self),
+			'brightness': FilterBrightness('brightness', self),
 			'colors': FilterColors('colors', self),
 			'contrast': FilterContrast('contrast', self),
+			'edges': FilterEdges('edges', self),
 			'emboss': FilterEmboss('emboss', self),
 			'saturation': FilterSaturation('saturation', self),
+			'sharpen': FilterSharpen('sharpen', self),
 			'transparency': FilterTransparency('transparency', self),
 			'veil': FilterVeil('veil', self),
 		}
+		self._stack_filter = FilterStack('stack', self)
 
 	def try_build_pane(self):
 		self.pane_id = 'filters'
@@ -74,18 +105,42 @@ class ToolFilters(AbstractCanvasTool):
 		for f_id, f in self._all_filters.items():
 			f.set_filter_compact(f_id == self._active_filter, is_compact)
 
+	def get_filter(self, filter_id):
+		return self._all_filters[filter_id]
+
+	def _get_operation_filter(self, operation):
+		if len(operation['stack']) > 0:
+			return self._stack_filter
+		return self._all_filters[operation['filter_id']]
+
 	def get_options_label(self):
 		return _("Active filter")
 
 	def get_editing_tips(self):
 		tip_label = _("Click on the image to preview the selected filter")
-		return [self.type_label, tip_label]
+		if len(self._stack) == 0:
+			return [self.type_label, tip_label]
+		stack_label = _("Filters applied before: %s") % len(self._stack)
+		return [self.type_label, stack_label, tip_label]
 
 	def on_options_changed(self):
 		self._preview_filter()
 
 	############################################################################
 
+	def _push_to_stack(self, *args):
+		"""The active filter, with its current options, will be applied before
+		the next active filter."""
+		options = self._all_filters[self._active_filter].build_filter_op()
+		self._stack.append({'filter_id': self._active_filter, **options})
+		self.window.set_window_subtitles()
+		self._preview_filter()
+
+	def _clear_stack(self, *args):
+		self._stack = []
+		self.window.set_window_subtitles()
+		self._preview_filter()
+
 	def _set_blur_direction(self, *args):
 		self._all_filters['blur'].set_attributes_values()
 
@@ -98,9 +153,13 @@ class ToolFilters(AbstractCanvasTool):
 			self.type_label =  _("Fast blur")
 			self._active_filter = 'blur'
 		elif state_as_string == 'blur_slow':
-			self.blur_algo = BlurType.PX_BOX
+			self.blur_algo = BlurType.GAUSSIAN
 			self.type_label = _("Slow blur")
 			self._active_filter = 'blur'
+		elif state_as_string == 'blur_downscaled':
+			self.blur_algo = BlurType.DOWNSCALED
+			self.type_label = _("Approximate blur")
+			self._active_filter = 'blur'
 		elif state_as_string == 'tiles':
 			self.blur_algo = BlurType.TILES
 			self.type_label = _("Mosaic")
@@ -116,11 +175,19 @@ class ToolFilters(AbstractCanvasTool):
 		elif state_as_string == 'contrast':
 			self.type_label = _("Increase contrast")
 			self._active_filter = 'contrast'
-		# TODO changer la luminosity tant qu'à faire
+		elif state_as_string == 'brightness':
+			self.type_label = _("Change brightness")
+			self._active_filter = 'brightness'
 		elif state_as_string == 'emboss':
 			# Context: a filter. See "image embossing" on wikipedia
 			self.type_label = _("Emboss")
 			self._active_filter = 'emboss'
+		elif state_as_string == 'sharpen':
+			self.type_label = _("Sharpen")
+			self._active_filter = 'sharpen'
+		elif state_as_string == 'edges':
+			self.type_label = _("Detect edges")
+			self._active_filter = 'edges'
 
 		elif state_as_string == 'invert':
 			self.type_label = _("Invert colors")
@@ -137,18 +204,17 @@ class ToolFilters(AbstractCanvasTool):
 
 	def on_tool_selected(self, *args):
 		super().on_tool_selected()
+		self._stack = []
 		self._set_active_type()
 		self._set_blur_direction()
 		GLib.timeout_add(100, self._async_open_menu, {})
-		if self.blur_algo == BlurType.INVALID:
-			self._preview_filter()
-		else:
-			operation = self.build_operation()
-			operation['radius'] = 0
-			# when the active filter is blurring the image, we cheat a little to
-			# improve performance, but the filtered pixbuf isn't preview until
-			# the user explicitly clicks on the canvas to preview
-			self.do_tool_operation(operation)
+		self._preview_filter()
+
+	def on_tool_unselected(self, *args):
+		self._cancel_filter_task()
+		# this is also how the tool knows the tab has been closed, or changed
+		self._cache_clear()
+		super().on_tool_unselected()
 
 	def _async_open_menu(self, *args):
 		"""This is used as a GSourceFunc so it should return False."""
@@ -172,22 +238,259 @@ class ToolFilters(AbstractCanvasTool):
 			'is_preview': True,
 			'local_dx': 0,
 			'local_dy': 0,
-			'filter_id': self._active_filter
+			'filter_id': self._active_filter,
+			'stack': [layer.copy() for layer in self._stack],
 		}
 		options = self._all_filters[self._active_filter].build_filter_op()
 		return {**operation, **options}
 
 	def do_tool_operation(self, operation):
 		self.start_tool_operation(operation)
+		self._cancel_filter_task()
+		self._scale_factor = super().scale_factor()
 		if operation['is_selection']:
 			source_pixbuf = self.get_selection_pixbuf()
 		else:
 			source_pixbuf = self.get_main_pixbuf()
+		active_filter = self._get_operation_filter(operation)
+
+		new_pixbuf = self._cache_get(self._get_cache_key(operation, 'exact'))
+		if new_pixbuf is None and not operation['is_preview']:
+			# Applying the operation, or rebuilding the history: the result is
+			# needed right now, at full resolution.
+			with utilities_trace_span('filter ' + operation['filter_id'], 'filters'):
+				new_pixbuf = active_filter.do_filter_operation(source_pixbuf, \
+				                                                       operation)
+		if new_pixbuf is not None:
+			self.get_image().set_temp_pixbuf(new_pixbuf)
+			self.common_end_operation(operation)
+			return
+
+		scale = self._get_proxy_scale(source_pixbuf)
+		width = source_pixbuf.get_width()
+		height = source_pixbuf.get_height()
+		if scale < 1:
+			area = None
+			# the proxy is less detailed than what's displayed
+			if scale < min(1, self.get_image().zoom_level):
+				area = self._get_visible_area(operation, source_pixbuf)
+			preview_key = self._get_cache_key(operation, area)
+			new_pixbuf = self._cache_get(preview_key)
+			if new_pixbuf is not None:
+				# this part of the image has already been refined with these
+				# exact parameters
+				area = None
+			else:
+				with utilities_trace_span('proxy ' + operation['filter_id'], \
+				                                                      'filters'):
+					new_pixbuf = self._filter_proxy(active_filter, \
+					                             source_pixbuf, operation, scale)
+				if area is None:
+					self._cache_put(preview_key, new_pixbuf)
+			self.get_image().set_temp_pixbuf(new_pixbuf)
+		else:
+			# until the result is computed, the previous preview is shown, or
+			# the unfiltered source if there is none
+			temp_pixbuf = self.get_image().temp_pixbuf
+			if temp_pixbuf.get_width() != width \
+			or temp_pixbuf.get_height() != height:
+				self.get_image().set_temp_pixbuf(source_pixbuf.copy())
+			area = (0, 0, width, height)
+		self.common_end_operation(operation)
 
-		active_filter = self._all_filters[operation['filter_id']]
-		active_filter.do_filter_operation(source_pixbuf, operation)
+		if area is not None:
+			self._start_filter_task(active_filter, source_pixbuf, operation, area)
 
-		self.common_end_operation(operation)
+	############################################################################
+	# Cache of the previews ####################################################
+
+	def _get_cache_key(self, operation, view):
+		"""The key of a result depends on the parameters of the operation, on
+		the version of its source, and on `view`: 'exact' for a result computed
+		entirely at full resolution, or else the area refined on the proxy.
+		The image is identified by its id, so the cache doesn't keep it alive."""
+		image = self.get_image()
+		if operation['is_selection']:
+			generation = self.get_selection().get_pixbuf_generation()
+		else:
+			generation = image.get_stable_generation()
+		options = [(key, value) for key, value in operation.items() \
+		                       if key not in ('tool_id', 'is_preview', 'stack')]
+		stack = tuple(tuple(sorted(layer.items())) for layer in operation['stack'])
+		return (id(image), generation, tuple(sorted(options)), stack, view)
+
+	def _cache_get(self, key):
+		if key not in self._cache:
+			return None
+		self._cache.move_to_end(key)
+		return self._cache[key]
+
+	def _cache_put(self, key, pixbuf):
+		size = pixbuf.get_byte_length()
+		if size > self.CACHE_MAX_BYTES:
+			return
+		if key in self._cache:
+			self._cache_bytes -= self._cache.pop(key).get_byte_length()
+		self._cache[key] = pixbuf
+		self._cache_bytes += size
+		while self._cache_bytes > self.CACHE_MAX_BYTES:
+			key, old_pixbuf = self._cache.popitem(last=False)
+			self._cache_bytes -= old_pixbuf.get_byte_length()
+
+	def _cache_clear(self):
+		self._cache.clear()
+		self._cache_bytes = 0
+
+	############################################################################
+	# Progressive preview ######################################################
+
+	def _get_proxy_scale(self, source_pixbuf):
+		nb_pixels = source_pixbuf.get_width() * source_pixbuf.get_height()
+		if nb_pixels <= self.PROXY_MAX_PIXELS:
+			return 1.0
+		return math.sqrt(self.PROXY_MAX_PIXELS / nb_pixels)
+
+	def _filter_proxy(self, active_filter, source_pixbuf, operation, scale):
+		"""Quick preview: the filter is applied on a downscaled copy of the
+		source, and the result is upscaled back to the size of the source."""
+		width = source_pixbuf.get_width()
+		height = source_pixbuf.get_height()
+		proxy = source_pixbuf.scale_simple(max(1, int(width * scale)), \
+		           max(1, int(height * scale)), GdkPixbuf.InterpType.BILINEAR)
+		proxy_op = active_filter.scale_filter_op(operation, scale)
+		filtered_proxy = active_filter.do_filter_operation(proxy, proxy_op)
+		return filtered_proxy.scale_simple(width, height, \
+		                                         GdkPixbuf.InterpType.BILINEAR)
+
+	def _get_visible_area(self, operation, source_pixbuf):
+		"""Returns the rectangle of the source which is visible on the canvas,
+		or None if it isn't visible at all."""
+		image = self.get_image()
+		x = int(image.scroll_x)
+		y = int(image.scroll_y)
+		if operation['is_selection']:
+			x -= self.get_selection().selection_x
+			y -= self.get_selection().selection_y
+		width, height = image.get_visible_size()
+		return self._clamp_area((x, y, width + 1, height + 1), source_pixbuf)
+
+	def _clamp_area(self, area, source_pixbuf):
+		x1 = max(0, area[0])
+		y1 = max(0, area[1])
+		x2 = min(source_pixbuf.get_width(), area[0] + area[2])
+		y2 = min(source_pixbuf.get_height(), area[1] + area[3])
+		if x2 <= x1 or y2 <= y1:
+			return None
+		return x1, y1, x2 - x1, y2 - y1
+
+	############################################################################
+	# Computation in the background ############################################
+
+	def scale_factor(self):
+		# The filters may call this method from the thread, where the active
+		# image can't be safely accessed.
+		return self._scale_factor
+
+	def _start_filter_task(self, active_filter, source_pixbuf, operation, area):
+		"""Compute at full resolution the given area (x, y, width, height) of
+		the filtered source in a thread, and show it when it's done."""
+		task = {
+			'cancelled': threading.Event(),
+			'image': self.get_image(),
+			'filter': active_filter,
+			# the source can change (undo, other tab...) during the computation
+			'source': source_pixbuf.copy(),
+			'operation': operation,
+			'area': area,
+			'result': None,
+		}
+		if area == (0, 0, source_pixbuf.get_width(), source_pixbuf.get_height()):
+			task['cache_key'] = self._get_cache_key(operation, 'exact')
+		else:
+			task['cache_key'] = self._get_cache_key(operation, area)
+		self._filter_task = task
+		self.bar.set_progress(0.0)
+		thread = threading.Thread(target=self._run_filter_task, args=(task,), \
+		                                                            daemon=True)
+		thread.start()
+
+	def _cancel_filter_task(self):
+		if self._filter_task is not None:
+			self._filter_task['cancelled'].set()
+			self._filter_task = None
+		self.bar.set_progress(None)
+
+	def _run_filter_task(self, task):
+		"""Executed in a thread: the area is filtered by horizontal bands, so
+		the progress can be reported, and the task cancelled, between them."""
+		try:
+			task['result'] = self._filter_by_bands(task)
+		except Exception as e:
+			# the task is done anyway, with no result
+			print(e)
+		GLib.idle_add(self._on_filter_task_done, task)
+
+	def _filter_by_bands(self, task):
+		operation = task['operation']
+		source = task['source']
+		x, y, width, height = task['area']
+		result = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, \
+		                                                          width, height)
+		band_height = self._get_band_height(task)
+		nb_bands = math.ceil(height / band_height)
+		for index in range(0, nb_bands):
+			if task['cancelled'].is_set():
+				return None
+			band_y = y + index * band_height
+			band = (x, band_y, width, min(band_height, y + height - band_y))
+			needed = task['filter'].get_needed_area(band, operation)
+			needed = self._clamp_area(needed, source)
+			sub_source = source.new_subpixbuf(*needed)
+			with utilities_trace_span('band ' + operation['filter_id'], 'filters'):
+				sub_result = task['filter'].do_filter_operation(sub_source, \
+				                                                       operation)
+			sub_result.copy_area(band[0] - needed[0], band[1] - needed[1], \
+			                  band[2], band[3], result, 0, band_y - y)
+			GLib.idle_add(self._on_filter_task_progress, task, \
+			                                            (index + 1) / nb_bands)
+		return result
+
+	def _get_band_height(self, task):
+		"""The bands are high enough for the pixels computed only because the
+		filter needs them (above and below each band) to remain a minority."""
+		x, y, width, height = task['area']
+		needed = task['filter'].get_needed_area((x, y, width, 1), \
+		                                                     task['operation'])
+		margin = max(y - needed[1], needed[1] + needed[3] - y - 1)
+		return max(self.BAND_HEIGHT, 4 * margin)
+
+	def _on_filter_task_progress(self, task, fraction):
+		"""This is used as a GSourceFunc so it should return False."""
+		if task is self._filter_task:
+			self.bar.set_progress(fraction)
+		return False
+
+	def _on_filter_task_done(self, task):
+		"""Show the result of the task, unless it's outdated.
+		This is used as a GSourceFunc so it should return False."""
+		if task is not self._filter_task or task['cancelled'].is_set():
+			return False
+		self._filter_task = None
+		self.bar.set_progress(None)
+		image = task['image']
+		if task['result'] is None or image is not self.get_image():
+			return False
+		x, y, width, height = task['area']
+		if task['cache_key'][-1] == 'exact':
+			image.set_temp_pixbuf(task['result'])
+		else:
+			# the temp pixbuf is the proxy, rendered for this same task
+			task['result'].copy_area(0, 0, width, height, image.temp_pixbuf, x, y)
+		# the temp pixbuf can still be modified in place by the next tasks
+		self._cache_put(task['cache_key'], image.temp_pixbuf.copy())
+		self.restore_pixbuf()
+		self.common_end_operation(task['operation'])
+		return False
 
 	############################################################################
 ################################################################################
@@ -1,7 +1,15 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
-import cairo, threading
-# from datetime import datetime # Not actually needed, just to measure perfs
+import cairo, functools, json, math, multiprocessing, os, threading, time
+from multiprocessing import shared_memory
+from gi.repository import GLib
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency, BlurType.NUMPY_BOX won't be available
+	numpy = None
 
 class BlurType(int):
 	INVALID = -1
@@ -10,6 +18,9 @@ class BlurType(int):
 	PX_BOX_MULTI = 2
 	CAIRO_REPAINTS = 3
 	TILES = 4
+	NUMPY_BOX = 5
+	GAUSSIAN = 6
+	DOWNSCALED = 7
 
 class BlurDirection(int):
 	INVALID = -1
@@ -19,6 +30,7 @@ class BlurDirection(int):
 
 ################################################################################
 
+@utilities_traced('utilities_blur_surface', 'filters')
 def utilities_blur_surface(surface, radius, blur_type, blur_direction):
 	"""This is the 'official' method to access the blur algorithms.
 	The third argument is an integer corresponding to the BlurType enumeration.
@@ -27,28 +39,326 @@ def utilities_blur_surface(surface, radius, blur_type, blur_direction):
 	if radius < 1:
 		return surface
 	blurred_surface = None
-	# time0 = datetime.now()
-	# print('blurring begins, using algo ', blur_type, '-', blur_direction)
 
 	if blur_type == BlurType.INVALID:
 		return surface
 	elif blur_type == BlurType.AUTO:
+		blur_type = _get_fastest_blur_type(surface, radius, True)
+	elif blur_type == BlurType.NUMPY_BOX and numpy is None:
 		blur_type = BlurType.PX_BOX
-		# XXX c'est nul ça mdr, mais bon c'est peu utilisé
 
-	if blur_type == BlurType.PX_BOX:
-		blurred_surface = _generic_px_box_blur(surface, radius, blur_direction)
-	elif blur_type == BlurType.PX_BOX_MULTI:
-		blurred_surface = _generic_multi_threaded_blur(surface, radius, blur_direction)
-	elif blur_type == BlurType.CAIRO_REPAINTS:
-		blurred_surface = _generic_cairo_blur(surface, radius, blur_direction)
+	if blur_type == BlurType.GAUSSIAN:
+		blurred_surface = _generic_gaussian_blur(surface, radius, blur_direction)
 	elif blur_type == BlurType.TILES:
 		blurred_surface = _generic_tiled_blur(surface, radius, blur_direction)
+	else:
+		blurred_surface = _blur_with_type(surface, radius, blur_type, blur_direction)
 
-	# time1 = datetime.now()
-	# print('blurring ended, total time:', time1 - time0)
 	return blurred_surface
 
+################################################################################
+# BlurType.AUTO ################################################################
+
+# The duration of a blur is estimated as `fixed + pixels * (k0 + k1 * radius)`,
+# with coefficients measured once per machine for each algorithm, and cached.
+# Until they're measured, rough values measured on an average laptop are used.
+_DEFAULT_BLUR_COSTS = {
+	str(BlurType.PX_BOX): [0.0005, 1.5e-6, 0.0],
+	str(BlurType.PX_BOX_MULTI): [0.01, 4e-7, 0.0],
+	str(BlurType.NUMPY_BOX): [0.001, 5e-8, 0.0],
+	str(BlurType.CAIRO_REPAINTS): [0.0002, 1e-9, 4e-9],
+	'resampling': 5e-9,
+}
+_BLUR_COSTS = None
+_BLUR_COSTS_VERSION = 3
+_BLUR_COSTS_LOCK = threading.Lock()
+_BLUR_COSTS_MEASURE = None
+# Above this radius, the repeated repaints are visible (and ugly)
+_CAIRO_REPAINTS_MAX_RADIUS = 4
+# Below this radius, downscaling the image would lose visible details
+_DOWNSCALED_MIN_RADIUS = 16
+
+def _get_fastest_blur_type(surface, radius, allow_approximations):
+	"""Returns the blur type whose estimated duration is the shortest for
+	this surface and this radius. If `allow_approximations` is false, only the
+	algorithms giving an exact box blur are considered."""
+	nb_pixels = surface.get_width() * surface.get_height()
+	costs = _get_blur_costs()
+	candidates = _get_exact_blur_types()
+	if allow_approximations and radius <= _CAIRO_REPAINTS_MAX_RADIUS:
+		candidates.append(BlurType.CAIRO_REPAINTS)
+	if allow_approximations and radius >= _DOWNSCALED_MIN_RADIUS:
+		candidates.append(BlurType.DOWNSCALED)
+	return min(candidates, key=lambda blur_type: \
+	                _estimate_blur_cost(costs, blur_type, nb_pixels, radius))
+
+def _estimate_blur_cost(costs, blur_type, nb_pixels, radius):
+	if blur_type == BlurType.DOWNSCALED:
+		# resampling the image twice, and an exact blur of the small image
+		factor = _get_downscale_factor(radius)
+		small_cost = min(_estimate_blur_cost(costs, exact_type, \
+		                  nb_pixels / (factor * factor), radius / factor) \
+		                  for exact_type in _get_exact_blur_types())
+		return nb_pixels * costs['resampling'] + small_cost
+	fixed, k0, k1 = costs[str(blur_type)]
+	return fixed + nb_pixels * (k0 + k1 * radius)
+
+def _get_exact_blur_types():
+	exact_types = [BlurType.PX_BOX, BlurType.PX_BOX_MULTI]
+	if numpy is not None:
+		exact_types.append(BlurType.NUMPY_BOX)
+	return exact_types
+
+def _get_blur_costs():
+	"""Returns the costs measured on this machine if they're known, or the
+	default ones, in which case the costs are measured in the background."""
+	global _BLUR_COSTS_MEASURE
+	if _BLUR_COSTS is not None:
+		return _BLUR_COSTS
+	with _BLUR_COSTS_LOCK:
+		if _BLUR_COSTS_MEASURE is None:
+			_BLUR_COSTS_MEASURE = threading.Thread(target=_measure_blur_costs, \
+			                                                         daemon=True)
+			_BLUR_COSTS_MEASURE.start()
+	return _DEFAULT_BLUR_COSTS
+
+def _get_blur_costs_file():
+	path = os.path.join(GLib.get_user_cache_dir(), 'drawing', 'blur-costs.json')
+	# the results depend on the available engines, not only on the hardware
+	machine_key = [_BLUR_COSTS_VERSION, _NB_PROCESSES, numpy is not None]
+	return path, machine_key
+
+def _measure_blur_costs():
+	"""Executed by a thread: load the costs cached by a previous session, or
+	measure them and cache them for the next sessions."""
+	global _BLUR_COSTS
+	file_path, machine_key = _get_blur_costs_file()
+	try:
+		with open(file_path, 'r') as json_file:
+			cached = json.load(json_file)
+		if cached['machine'] == machine_key:
+			_BLUR_COSTS = cached['costs']
+			return
+	except (OSError, ValueError, KeyError):
+		pass
+
+	costs = _calibrate_blur_costs()
+	_BLUR_COSTS = costs
+	try:
+		os.makedirs(os.path.dirname(file_path), exist_ok=True)
+		with open(file_path, 'w') as json_file:
+			json.dump({'machine': machine_key, 'costs': costs}, json_file)
+	except OSError:
+		pass # it will be measured again next time
+
+def _calibrate_blur_costs():
+	"""Measure each algorithm on several sizes and radii, and fit the
+	coefficients of its cost model to these measures."""
+	blur_types = _get_exact_blur_types() + [BlurType.CAIRO_REPAINTS]
+	# the process pool is started before measuring it
+	_generic_multi_process_blur(_get_calibration_surface(8), 1, BlurDirection.BOTH)
+	costs = dict(_DEFAULT_BLUR_COSTS)
+	for blur_type in blur_types:
+		samples = []
+		for size in (32, 64, 128):
+			surface = _get_calibration_surface(size)
+			for radius in (1, 3, 6):
+				duration = _measure_duration(_blur_with_type, surface, radius, \
+				                                  blur_type, BlurDirection.BOTH)
+				samples.append((size * size, radius, duration))
+		coefs = _fit_cost_model(samples)
+		if coefs is not None:
+			costs[str(blur_type)] = coefs
+
+	size = 128
+	surface = _get_calibration_surface(size)
+	small_size = math.ceil(size / 4)
+	def resample_twice():
+		small_surface = _resample_surface(surface, 4, 4, small_size, \
+		                                         small_size, cairo.FILTER_GOOD)
+		_resample_surface(small_surface, 0.25, 0.25, size, size, \
+		                                                 cairo.FILTER_BILINEAR)
+	costs['resampling'] = _measure_duration(resample_twice) / (size * size)
+	return costs
+
+def _measure_duration(function, *args):
+	"""The shortest duration of 2 runs, since the measures happen while the
+	app is used, which can only make them longer."""
+	durations = []
+	for i in range(0, 2):
+		start = time.perf_counter()
+		function(*args)
+		durations.append(time.perf_counter() - start)
+	return min(durations)
+
+def _get_calibration_surface(size):
+	surface = cairo.ImageSurface(cairo.Format.ARGB32, size, size)
+	cairo_context = cairo.Context(surface)
+	cairo_context.set_source_rgba(0.2, 0.4, 0.6, 0.8)
+	cairo_context.paint()
+	return surface
+
+def _fit_cost_model(samples):
+	"""Least squares fit of the 3 coefficients of the cost model to the
+	samples (tuples of the number of pixels, the radius, and the duration).
+	A negative coefficient can only come from the noise of the measures, so
+	it's set to 0 and the other coefficients are fitted again without it.
+	Returns None if the samples can't give a model."""
+	rows = []
+	durations = []
+	for nb_pixels, radius, duration in samples:
+		rows.append([1.0, nb_pixels, nb_pixels * radius])
+		durations.append(duration)
+	used_columns = [0, 1, 2]
+	while len(used_columns) > 0:
+		matrix = [[row[col] for col in used_columns] for row in rows]
+		solution = _solve_least_squares(matrix, durations)
+		if solution is None:
+			return None
+		if min(solution) >= 0:
+			coefs = [0.0, 0.0, 0.0]
+			for col, coef in zip(used_columns, solution):
+				coefs[col] = coef
+			return coefs
+		used_columns.pop(solution.index(min(solution)))
+	return None
+
+def _solve_least_squares(matrix, constants):
+	"""Solve the normal equations of the overdetermined system, by gaussian
+	elimination. The columns are normalized first, since their orders of
+	magnitude are very different (the constant term, and numbers of pixels)."""
+	nb_cols = len(matrix[0])
+	scales = [max(abs(row[col]) for row in matrix) or 1.0 \
+	                                               for col in range(0, nb_cols)]
+	matrix = [[row[col] / scales[col] for col in range(0, nb_cols)] \
+	                                                           for row in matrix]
+	# augmented matrix of the normal equations: (At.A | At.b)
+	system = []
+	for i in range(0, nb_cols):
+		line = [sum(row[i] * row[j] for row in matrix) \
+		                                            for j in range(0, nb_cols)]
+		line.append(sum(row[i] * c for row, c in zip(matrix, constants)))
+		system.append(line)
+
+	for col in range(0, nb_cols):
+		pivot = max(range(col, nb_cols), key=lambda i: abs(system[i][col]))
+		if abs(system[pivot][col]) < 1e-12:
+			return None
+		system[col], system[pivot] = system[pivot], system[col]
+		for i in range(col + 1, nb_cols):
+			factor = system[i][col] / system[col][col]
+			for j in range(col, nb_cols + 1):
+				system[i][j] -= factor * system[col][j]
+	solution = [0.0] * nb_cols
+	for i in range(nb_cols - 1, -1, -1):
+		known = sum(system[i][j] * solution[j] for j in range(i + 1, nb_cols))
+		solution[i] = (system[i][nb_cols] - known) / system[i][i]
+	return [solution[col] / scales[col] for col in range(0, nb_cols)]
+
+def _blur_with_type(surface, radius, blur_type, blur_direction):
+	if blur_type == BlurType.NUMPY_BOX:
+		return _generic_numpy_box_blur(surface, radius, blur_direction)
+	elif blur_type == BlurType.DOWNSCALED:
+		return _generic_downscaled_blur(surface, radius, blur_direction)
+	elif blur_type == BlurType.PX_BOX_MULTI:
+		return _generic_multi_process_blur(surface, radius, blur_direction)
+	elif blur_type == BlurType.CAIRO_REPAINTS:
+		return _generic_cairo_blur(surface, radius, blur_direction)
+	else:
+		return _generic_px_box_blur(surface, radius, blur_direction)
+
+################################################################################
+# BlurType.DOWNSCALED ##########################################################
+
+# Radius of the blur applied to the downscaled image
+_DOWNSCALED_BLUR_RADIUS = 8
+
+def _generic_downscaled_blur(surface, radius, blur_direction):
+	"""Fast approximation of a box blur with a large radius: the result is
+	low-frequency anyway, so the image is downscaled, blurred with a small
+	radius, and upscaled back with a bilinear filter. The duration is almost
+	the same regardless of the radius."""
+	factor = _get_downscale_factor(radius)
+	if factor < 2:
+		blur_type = _get_fastest_blur_type(surface, radius, False)
+		return _blur_with_type(surface, radius, blur_type, blur_direction)
+	# the image isn't downscaled along an axis which isn't blurred
+	factor_x = factor_y = factor
+	if blur_direction == BlurDirection.VERTICAL:
+		factor_x = 1
+	elif blur_direction == BlurDirection.HORIZONTAL:
+		factor_y = 1
+	w = surface.get_width()
+	h = surface.get_height()
+	small_w = math.ceil(w / factor_x)
+	small_h = math.ceil(h / factor_y)
+
+	small_surface = _resample_surface(surface, factor_x, factor_y, small_w, \
+	                                               small_h, cairo.FILTER_GOOD)
+	small_radius = max(1, round(radius / factor))
+	blur_type = _get_fastest_blur_type(small_surface, small_radius, False)
+	small_surface = _blur_with_type(small_surface, small_radius, blur_type, \
+	                                                           blur_direction)
+	return _resample_surface(small_surface, 1 / factor_x, 1 / factor_y, w, h, \
+	                                                    cairo.FILTER_BILINEAR)
+
+def utilities_get_blur_grid_size(radius, blur_type):
+	"""Returns the size of the grid (starting at 0, 0) on which a part of a
+	surface should be aligned, so blurring only this part gives exactly the
+	same pixels as blurring the whole surface."""
+	if blur_type == BlurType.DOWNSCALED:
+		return _get_downscale_factor(radius)
+	return 1
+
+def _get_downscale_factor(radius):
+	return max(1, radius // _DOWNSCALED_BLUR_RADIUS)
+
+def _resample_surface(surface, factor_x, factor_y, width, height, filter_type):
+	"""Returns a new surface of the given size, where `surface` is painted
+	with its size divided by the factors."""
+	resampled = cairo.ImageSurface(cairo.Format.ARGB32, width, height)
+	cairo_context = cairo.Context(resampled)
+	cairo_context.set_operator(cairo.Operator.SOURCE)
+	cairo_context.scale(1 / factor_x, 1 / factor_y)
+	cairo_context.set_source_surface(surface, 0, 0)
+	cairo_context.get_source().set_filter(filter_type)
+	cairo_context.get_source().set_extend(cairo.Extend.PAD)
+	cairo_context.paint()
+	return resampled
+
+################################################################################
+# BlurType.GAUSSIAN ############################################################
+
+def _generic_gaussian_blur(surface, radius, blur_direction):
+	"""Approximation of a gaussian blur by 3 successive box blurs, each using
+	the fastest exact algorithm available for its own radius. The gaussian has
+	the same variance as a single box blur of the given radius."""
+	for box_radius in _get_gaussian_box_radii(radius):
+		if box_radius < 1:
+			continue
+		blur_type = _get_fastest_blur_type(surface, box_radius, False)
+		surface = _blur_with_type(surface, box_radius, blur_type, blur_direction)
+	return surface
+
+@functools.lru_cache(maxsize=None)
+def _get_gaussian_box_radii(radius, nb_boxes=3):
+	"""Returns the radii of the box blurs whose successive application is
+	the closest to a gaussian blur, as explained by P. Kovesi in "Fast almost-
+	gaussian filtering" (2010)."""
+	sigma = math.sqrt(radius * (radius + 1) / 3)
+	ideal_width = math.sqrt(12 * sigma * sigma / nb_boxes + 1)
+	lower_width = math.floor(ideal_width)
+	if lower_width % 2 == 0:
+		lower_width -= 1
+	upper_width = lower_width + 2
+	ideal_count = (12 * sigma * sigma - nb_boxes * lower_width * lower_width \
+	               - 4 * nb_boxes * lower_width - 3 * nb_boxes) \
+	                                               / (-4 * lower_width - 4)
+	nb_lower = round(ideal_count)
+	widths = [lower_width if i < nb_lower else upper_width \
+	                                               for i in range(0, nb_boxes)]
+	return tuple((width - 1) // 2 for width in widths)
+
 ################################################################################
 # BlurType.PX_BOX ##############################################################
 
@@ -164,100 +474,198 @@ def _box_blur_2nd_phase(w, h, channels, radius, pixels, buff0, vmin, vmax, dv):
 ################################################################################
 # BlurType.PX_BOX_MULTI ########################################################
 
-def _generic_multi_threaded_blur(surface, radius, blur_direction):
-	"""Experimental multi-threaded blur. The parameter `blur_direction` will be
-	ignored (it always blurs in both directions)."""
+_PROCESS_POOL = None
+_NB_PROCESSES = os.cpu_count() or 1
+
+def _generic_multi_process_blur(surface, radius, blur_direction):
+	"""Same box blur as BlurType.PX_BOX, computed by a pool of processes (so
+	it's not serialized by the GIL) working on pixels in shared memory. Rows
+	are blurred horizontally by strips of rows, then columns are blurred
+	vertically by strips of columns: each strip covers the whole axis of the
+	blur, so the strips are independent and don't need to overlap."""
 	w = surface.get_width()
 	h = surface.get_height()
-	channels = 4 # ARGB
 	if radius > w - 1 or radius > h - 1:
-		return
+		return surface
 
 	original = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
 	cairo_context = cairo.Context(original)
-	# cairo_context.set_operator(cairo.Operator.SOURCE)
 	cairo_context.set_source_surface(surface, 0, 0)
 	cairo_context.paint()
 	original.flush()
-	pixels = original.get_data()
+	stride = original.get_stride()
+	size = stride * h
+
+	passes = []
+	if blur_direction != BlurDirection.VERTICAL:
+		passes.append(True)
+	if blur_direction != BlurDirection.HORIZONTAL:
+		passes.append(False)
+
+	source = None
+	destination = None
+	try:
+		try:
+			pool = _get_process_pool()
+			source = shared_memory.SharedMemory(create=True, size=size)
+			destination = shared_memory.SharedMemory(create=True, size=size)
+		except OSError:
+			# no shared memory (or no process) available in this environment
+			return _generic_px_box_blur(surface, radius, blur_direction)
+		source.buf[:size] = original.get_data()
+		for is_horizontal in passes:
+			_blur_strips(pool, source.name, destination.name, w, h, stride, \
+			                                              radius, is_horizontal)
+			source, destination = destination, source
+		original.get_data()[:] = source.buf[:size]
+	finally:
+		for memory in (source, destination):
+			if memory is not None:
+				memory.close()
+				memory.unlink()
+	original.mark_dirty()
+	return original
 
-	buffer0 = [None] * (w * h * channels)
-	vmin = [None] * max(w, h)
-	vmax = [None] * max(w, h)
+def _get_process_pool():
+	"""The pool is created when it's first needed, and then kept, because
+	starting the processes is slower than most blurs."""
+	global _PROCESS_POOL
+	if _PROCESS_POOL is None:
+		# the processes are spawned because forking a GTK app isn't safe
+		context = multiprocessing.get_context('spawn')
+		_PROCESS_POOL = context.Pool(_NB_PROCESSES)
+	return _PROCESS_POOL
+
+def _blur_strips(pool, source_name, destination_name, w, h, stride, radius, \
+                                                                 is_horizontal):
+	if is_horizontal:
+		length = h
+	else:
+		length = w
+	# more strips than processes, so a slow process doesn't delay the others
+	nb_strips = min(length, _NB_PROCESSES * 2)
+	bounds = [int(length * i / nb_strips) for i in range(0, nb_strips + 1)]
+	tasks = []
+	for i in range(0, nb_strips):
+		tasks.append((source_name, destination_name, w, h, stride, radius, \
+		                                 is_horizontal, bounds[i], bounds[i + 1]))
+	pool.map(_blur_strip, tasks)
+
+def _blur_strip(task):
+	"""Executed by a process of the pool: blur the rows (or the columns) from
+	`start` to `end` of the source, and write them in the destination."""
+	source_name, destination_name, w, h, stride, radius, is_horizontal, \
+	                                                              start, end = task
+	source = _attach_shared_memory(source_name)
+	destination = _attach_shared_memory(destination_name)
+	try:
+		if numpy is not None:
+			_blur_strip_numpy(source.buf, destination.buf, w, h, stride, \
+			                                  radius, is_horizontal, start, end)
+		elif is_horizontal:
+			for y in range(start, end):
+				_box_blur_line(source.buf, destination.buf, y * stride, 4, w, \
+				                                                         radius)
+		else:
+			for x in range(start, end):
+				_box_blur_line(source.buf, destination.buf, x * 4, stride, h, \
+				                                                         radius)
+	finally:
+		source.close()
+		destination.close()
+
+def _attach_shared_memory(name):
+	try:
+		# the memory is unlinked by the process which created it, and shouldn't
+		# be tracked by the pool's processes (python 3.13 and newer)
+		return shared_memory.SharedMemory(name=name, track=False)
+	except TypeError:
+		return shared_memory.SharedMemory(name=name)
+
+def _blur_strip_numpy(source, destination, w, h, stride, radius, \
+                                                      is_horizontal, start, end):
+	source = numpy.ndarray(shape=(h, w, 4), dtype=numpy.uint8, \
+	                                        buffer=source, strides=(stride, 4, 1))
+	destination = numpy.ndarray(shape=(h, w, 4), dtype=numpy.uint8, \
+	                                   buffer=destination, strides=(stride, 4, 1))
+	if is_horizontal:
+		destination[start:end] = _numpy_box_blur_axis(source[start:end], \
+		                                                              radius, 1)
+	else:
+		destination[:, start:end] = _numpy_box_blur_axis(source[:, start:end], \
+		                                                              radius, 0)
+
+def _box_blur_line(source, destination, offset, step, length, radius):
+	"""Blur one row (or column) of pixels, whose first byte is at `offset`,
+	and whose pixels are `step` bytes away from each other. The edges are
+	extended, as with BlurType.PX_BOX."""
 	div = 2 * radius + 1
-	dv = [None] * (256 * div)
-	for i in range(0, len(dv)):
-		dv[i] = int(i / div)
+	last = length - 1
+	for channel in range(0, 4):
+		first = offset + channel
+		channel_sum = (radius + 1) * source[first]
+		for i in range(1, radius + 1):
+			channel_sum += source[first + min(i, last) * step]
+		for i in range(0, length):
+			destination[first + i * step] = channel_sum // div
+			channel_sum += source[first + min(i + radius + 1, last) * step]
+			channel_sum -= source[first + max(i - radius, 0) * step]
+
+################################################################################
+# BlurType.NUMPY_BOX ###########################################################
+
+def _generic_numpy_box_blur(surface, radius, blur_direction):
+	"""Same box blur as BlurType.PX_BOX (the edges are extended), but the
+	sliding sums are computed by NumPy on the buffer of the surface, instead of
+	by python loops over each channel of each pixel."""
+	w = surface.get_width()
+	h = surface.get_height()
+	if radius > w - 1 or radius > h - 1:
+		return surface
 
-	full_buff = _box_blur_1st_phase_multi(w, h, channels, radius, pixels, vmin, vmax, dv)
-	# print('end of the 1st phase…', datetime.now() - time0)
-	_box_blur_2nd_phase(w, h, channels, radius, pixels, full_buff, vmin, vmax, dv)
+	original = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+	cairo_context = cairo.Context(original)
+	cairo_context.set_source_surface(surface, 0, 0)
+	cairo_context.paint()
+	original.flush()
+	pixels = utilities_get_surface_array(original)
 
+	if blur_direction != BlurDirection.VERTICAL:
+		pixels[:] = _numpy_box_blur_axis(pixels, radius, 1)
+	if blur_direction != BlurDirection.HORIZONTAL:
+		pixels[:] = _numpy_box_blur_axis(pixels, radius, 0)
+	original.mark_dirty()
 	return original
 
-# this code a modified version of a naïve approach to box blur, copied from
-# here: https://github.com/elementary/granite/blob/14e3aaa216b61f7e63762214c0b36ee97fa7c52b/lib/Drawing/BufferSurface.vala#L230
-# the main differences (aside of the language) is the poor attempt to use
-# multithreading (i'm quite sure the access to buffers are not safe at all)
-# during the first phase. Multithreading of the second phase has not even been
-# tried because this multithreaded version is slower than _box_blur_1st_phase
-
-def _box_blur_1st_phase_multi(w, h, channels, radius, pixels, vmin, vmax, dv):
-	NB_THREADS = 4
-	t1 = [None] * NB_THREADS
-	full_buffer = []
-	buffers = []
-	y_end = 0
-	for x in range(0, w):
-		vmin[x] = min(x + radius + 1, w - 1)
-		vmax[x] = max(x - radius, 0)
-	for t in range(0, NB_THREADS):
-		y_start = y_end
-		if t == NB_THREADS - 1:
-			y_end = h
-		else:
-			y_end = y_start + int(h / NB_THREADS)
-		buff_size = w * (y_end - y_start) * channels
-		buff = [0] * buff_size
-		buffers.append(buff)
-		t1[t] = threading.Thread(target=_blur_rows3, args=(x, y_start, y_end, \
-		                     w, channels, radius, pixels, buff, vmin, vmax, dv))
-	for t in range(0, NB_THREADS):
-		t1[t].start()
-	for t in range(0, NB_THREADS):
-		t1[t].join()
-		full_buffer += buffers[t]
-	return full_buffer
-
-def _blur_rows3(x, y0, y1, w, channels, radius, pixels, buff0, vmin, vmax, dv):
-	# print('row thread with', y0, y1, '(begin)')
-	diff = y0 * w * channels
-	for y in range(y0, y1):
-		cur_pixel = y * w * channels
-		asum = radius * pixels[cur_pixel + 0]
-		rsum = radius * pixels[cur_pixel + 1]
-		gsum = radius * pixels[cur_pixel + 2]
-		bsum = radius * pixels[cur_pixel + 3]
-		for i in range(0, radius+1):
-			asum += pixels[cur_pixel + 0]
-			rsum += pixels[cur_pixel + 1]
-			gsum += pixels[cur_pixel + 2]
-			bsum += pixels[cur_pixel + 3]
-			cur_pixel += channels
-		cur_pixel = y * w * channels - diff
-		for x in range(0, w):
-			p1 = (y * w + vmin[x]) * channels
-			p2 = (y * w + vmax[x]) * channels
-			buff0[cur_pixel + 0] = dv[asum]
-			buff0[cur_pixel + 1] = dv[rsum]
-			buff0[cur_pixel + 2] = dv[gsum]
-			buff0[cur_pixel + 3] = dv[bsum]
-			asum += pixels[p1 + 0] - pixels[p2 + 0]
-			rsum += pixels[p1 + 1] - pixels[p2 + 1]
-			gsum += pixels[p1 + 2] - pixels[p2 + 2]
-			bsum += pixels[p1 + 3] - pixels[p2 + 3]
-			cur_pixel += channels
-	# print('row thread with', y0, y1, '(end)')
+def utilities_get_surface_array(surface):
+	"""Returns a NumPy array of shape (height, width, 4) sharing its memory
+	with the given ARGB32 surface: no pixel is copied, so the surface should
+	be flushed before reading it, and marked dirty after writing it."""
+	w = surface.get_width()
+	h = surface.get_height()
+	return numpy.ndarray(shape=(h, w, 4), dtype=numpy.uint8, \
+	          buffer=surface.get_data(), strides=(surface.get_stride(), 4, 1))
+
+def _numpy_box_blur_axis(pixels, radius, axis):
+	"""Returns the average of each pixel and its neighbors along the given
+	axis (0 is vertical, 1 is horizontal). The sum of a window is obtained as
+	the difference of 2 values of the cumulative sum, so the cost doesn't
+	depend on the radius."""
+	div = 2 * radius + 1
+	length = pixels.shape[axis]
+	padding = [(0, 0), (0, 0), (0, 0)]
+	# one more pixel before, so the cumulative sum "before the first pixel" of
+	# a window always exists
+	padding[axis] = (radius + 1, radius)
+	sums = numpy.pad(pixels, padding, mode='edge').astype(numpy.uint32)
+	numpy.cumsum(sums, axis=axis, out=sums)
+	upper = [slice(None)] * 3
+	upper[axis] = slice(div, div + length)
+	lower = [slice(None)] * 3
+	lower[axis] = slice(0, length)
+	window_sums = sums[tuple(upper)] - sums[tuple(lower)]
+	window_sums //= div
+	return window_sums
 
 ################################################################################
 # BlurType.CAIRO_REPAINTS ######################################################
@@ -313,40 +721,49 @@ def _generic_tiled_blur(surface, radius, blur_direction):
 	else:
 		tile_width = radius
 		tile_height = radius
-	return _get_tiled_surface(surface, tile_width, tile_height)
-
-def _get_tiled_surface(surface, tile_width, tile_height):
+	if numpy is not None:
+		return _get_numpy_tiled_surface(surface, tile_width, tile_height)
+	return _get_cairo_tiled_surface(surface, tile_width, tile_height)
+
+def _get_numpy_tiled_surface(surface, tile_width, tile_height):
+	"""Mosaic where each tile is filled with the average (premultiplied) color
+	of its pixels. The sums of the tiles are computed by `numpy.add.reduceat`
+	along each axis, so the tiles on the right and bottom edges can be smaller
+	than the others."""
 	w = surface.get_width()
 	h = surface.get_height()
-	channels = 4 # ARGB
-	pixels = surface.get_data()
-	pixel_max = w * h * channels
-
-	for x in range(0, w, tile_width):
-		for y in range(0, h, tile_height):
-			current_pixel = (x + (w * y)) * channels
-			if current_pixel >= pixel_max:
-				continue
-			tile_b = pixels[current_pixel + 0]
-			tile_g = pixels[current_pixel + 1]
-			tile_r = pixels[current_pixel + 2]
-			tile_a = pixels[current_pixel + 3]
-			for tx in range(0, tile_width):
-				for ty in range(0, tile_height):
-					current_pixel = ((x + tx) + (w * (y + ty))) * channels
-					if current_pixel >= pixel_max:
-						continue
-					if current_pixel >= (w * (y + ty + 1)) * channels:
-						# the current tile is out of the surface, this guard
-						# clause avoids corrupting the next tile
-						continue
-					pixels[current_pixel + 0] = tile_b
-					pixels[current_pixel + 1] = tile_g
-					pixels[current_pixel + 2] = tile_r
-					pixels[current_pixel + 3] = tile_a
-			# end of one tile
-	# end of the "for each tile"
-	return surface
+	tiled = cairo.ImageSurface(cairo.Format.ARGB32, w, h)
+	cairo_context = cairo.Context(tiled)
+	cairo_context.set_source_surface(surface, 0, 0)
+	cairo_context.paint()
+	tiled.flush()
+	pixels = utilities_get_surface_array(tiled)
+
+	row_starts = numpy.arange(0, h, tile_height)
+	col_starts = numpy.arange(0, w, tile_width)
+	sums = numpy.add.reduceat(pixels, row_starts, axis=0, dtype=numpy.uint32)
+	sums = numpy.add.reduceat(sums, col_starts, axis=1, dtype=numpy.uint32)
+	rows_per_tile = numpy.diff(numpy.append(row_starts, h))
+	cols_per_tile = numpy.diff(numpy.append(col_starts, w))
+	counts = numpy.outer(rows_per_tile, cols_per_tile)[:, :, numpy.newaxis]
+	averages = (sums + counts // 2) // counts
+
+	averages = numpy.repeat(averages, rows_per_tile, axis=0)
+	pixels[:] = numpy.repeat(averages, cols_per_tile, axis=1)
+	tiled.mark_dirty()
+	return tiled
+
+def _get_cairo_tiled_surface(surface, tile_width, tile_height):
+	"""Mosaic without NumPy: the surface is downscaled to one pixel per tile,
+	and upscaled back without interpolation. The colors are averaged by the
+	filter of the downscaling, but less exactly than with NumPy."""
+	w = surface.get_width()
+	h = surface.get_height()
+	small_surface = _resample_surface(surface, tile_width, tile_height, \
+	            math.ceil(w / tile_width), math.ceil(h / tile_height), \
+	                                                        cairo.FILTER_GOOD)
+	return _resample_surface(small_surface, 1 / tile_width, 1 / tile_height, \
+	                                                 w, h, cairo.FILTER_NEAREST)
 
 ################################################################################
 
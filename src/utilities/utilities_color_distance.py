@@ -0,0 +1,178 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo, math
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency: without it, the distances are computed
+	# pixel by pixel in Python, which is slow on large areas.
+	numpy = None
+
+class ColorMetric(int):
+	CHANNELS = 0 # greatest difference between 2 channels
+	RGB = 1 # euclidean distance in the RGB cube
+	PERCEPTUAL = 2 # weighted euclidean distance ("redmean" approximation)
+
+# Values of the 'color-tolerance' option, as fractions of the distance between
+# black and white.
+TOLERANCE_LEVELS = {
+	'none': 0.0,
+	'low': 0.05,
+	'medium': 0.15,
+	'high': 0.3,
+}
+
+# Values of the 'color-metric' options
+METRICS = {
+	'channels': ColorMetric.CHANNELS,
+	'rgb': ColorMetric.RGB,
+	'perceptual': ColorMetric.PERCEPTUAL,
+}
+
+################################################################################
+
+def utilities_get_tolerance(level_name):
+	return TOLERANCE_LEVELS.get(level_name, 0.0)
+
+def utilities_get_metric(metric_name):
+	return METRICS.get(metric_name, ColorMetric.PERCEPTUAL)
+
+def utilities_color_distance_is_vectorized():
+	"""Without NumPy, the colors are compared pixel by pixel in Python, so
+	callers may prefer a faster way to find the pixels of an exact color."""
+	return numpy is not None
+
+def utilities_get_pixel_rgba(pixel):
+	"""Returns the unpremultiplied (red, green, blue, alpha) values of an ARGB32
+	pixel read as a native-endian 32 bits integer."""
+	alpha = pixel >> 24
+	channels = ((pixel >> 16) & 255, (pixel >> 8) & 255, pixel & 255)
+	if alpha == 0:
+		return (0, 0, 0, 0)
+	return tuple((c * 255 + alpha // 2) // alpha for c in channels) + (alpha,)
+
+def utilities_get_matching_pixels(pixels, targets, tolerance, \
+                          metric=ColorMetric.PERCEPTUAL, ignore_alpha=False):
+	"""Tells which pixels are close enough to one of the targets. The pixels are
+	ARGB32 pixels read as native-endian 32 bits integers: a NumPy array if
+	NumPy is available, or any sequence otherwise. The targets are a list of
+	unpremultiplied (red, green, blue, alpha) tuples. The tolerance is between
+	0 (only the exact colors match) and 1, and the metric is one of the values
+	of `ColorMetric`. If `ignore_alpha` is true, only the colors are compared. Returns an array of booleans (or a list without NumPy)
+	of the same length as `pixels`."""
+	if numpy is None:
+		return [_is_matching(utilities_get_pixel_rgba(pixel), targets, \
+		                  tolerance, metric, ignore_alpha) for pixel in pixels]
+	if tolerance == 0 and not ignore_alpha:
+		# the pixels are compared to the premultiplied targets directly
+		matches = numpy.zeros(pixels.shape, dtype=bool)
+		for target in targets:
+			matches |= (pixels == _get_premultiplied_pixel(target))
+		return matches
+
+	channels = _get_unpremultiplied_channels(pixels)
+	matches = numpy.zeros(pixels.shape, dtype=bool)
+	for target in targets:
+		distances = _get_distances_numpy(channels, target, metric, \
+		                                                          ignore_alpha)
+		matches |= (distances <= tolerance)
+	return matches
+
+@utilities_traced('utilities_get_color_mask', 'tools')
+def utilities_get_color_mask(surface, targets, tolerance, \
+                          metric=ColorMetric.PERCEPTUAL, ignore_alpha=False):
+	"""Returns an A8 surface of the size of `surface`, where the pixels close
+	enough to one of the targets are opaque, and the others are transparent.
+	The pixels are compared in one pass over the data of the surface."""
+	surface.flush()
+	w = surface.get_width()
+	h = surface.get_height()
+	row_length = surface.get_stride() // 4
+	pixels = surface.get_data().cast('I')
+	mask = cairo.ImageSurface(cairo.Format.A8, w, h)
+	mask_data = mask.get_data()
+	mask_stride = mask.get_stride()
+
+	if numpy is not None:
+		pixels = numpy.frombuffer(pixels, dtype=numpy.uint32)
+		pixels = pixels.reshape(h, row_length)[:, :w]
+		matches = utilities_get_matching_pixels(pixels, targets, tolerance, \
+		                                                  metric, ignore_alpha)
+		mask_array = numpy.frombuffer(mask_data, dtype=numpy.uint8)
+		mask_array = mask_array.reshape(h, mask_stride)[:, :w]
+		mask_array[matches] = 255
+	else:
+		for y in range(h):
+			row = pixels[y * row_length:y * row_length + w]
+			matches = utilities_get_matching_pixels(row, targets, tolerance, \
+			                                              metric, ignore_alpha)
+			for x, is_matching in enumerate(matches):
+				if is_matching:
+					mask_data[y * mask_stride + x] = 255
+	mask.mark_dirty()
+	return mask
+
+################################################################################
+
+def _get_premultiplied_pixel(rgba):
+	r, g, b, a = rgba
+	r, g, b = [(c * a + 127) // 255 for c in (r, g, b)]
+	return (a << 24) | (r << 16) | (g << 8) | b
+
+def _get_unpremultiplied_channels(pixels):
+	"""Returns the 4 unpremultiplied channels as arrays of floats."""
+	alpha = (pixels >> 24).astype(numpy.int32)
+	safe_alpha = numpy.maximum(alpha, 1)
+	channels = []
+	for shift in (16, 8, 0):
+		value = ((pixels >> shift) & 255).astype(numpy.int32)
+		value = (value * 255 + alpha // 2) // safe_alpha
+		channels.append(value.astype(numpy.float32))
+	channels.append(alpha.astype(numpy.float32))
+	return channels
+
+def _get_distances_numpy(channels, target, metric, ignore_alpha):
+	"""Returns the distances of the pixels to the target, where 1 is the
+	distance between black and white. Unless `ignore_alpha` is true, a
+	difference of alpha counts at least as much as the same difference on a
+	single channel."""
+	r, g, b, a = channels
+	dr, dg, db = r - target[0], g - target[1], b - target[2]
+	if metric == ColorMetric.CHANNELS:
+		distances = numpy.maximum(numpy.abs(dr), numpy.abs(dg))
+		distances = numpy.maximum(distances, numpy.abs(db)) / 255
+	elif metric == ColorMetric.RGB:
+		distances = numpy.sqrt(dr * dr + dg * dg + db * db) / (255 * math.sqrt(3))
+	else:
+		red_mean = (r + target[0]) / 2
+		distances = numpy.sqrt((2 + red_mean / 256) * dr * dr + 4 * dg * dg \
+		                     + (2 + (255 - red_mean) / 256) * db * db) / (255 * 3)
+	if ignore_alpha:
+		return distances
+	return numpy.maximum(distances, numpy.abs(a - target[3]) / 255)
+
+def _is_matching(rgba, targets, tolerance, metric, ignore_alpha):
+	for target in targets:
+		if _get_distance(rgba, target, metric, ignore_alpha) <= tolerance:
+			return True
+	return False
+
+def _get_distance(rgba, target, metric, ignore_alpha):
+	"""Same as `_get_distances_numpy`, for one pixel."""
+	dr, dg, db = [rgba[i] - target[i] for i in range(3)]
+	if metric == ColorMetric.CHANNELS:
+		distance = max(abs(dr), abs(dg), abs(db)) / 255
+	elif metric == ColorMetric.RGB:
+		distance = math.sqrt(dr * dr + dg * dg + db * db) / (255 * math.sqrt(3))
+	else:
+		red_mean = (rgba[0] + target[0]) / 2
+		distance = math.sqrt((2 + red_mean / 256) * dr * dr + 4 * dg * dg \
+		                     + (2 + (255 - red_mean) / 256) * db * db) / (255 * 3)
+	if ignore_alpha:
+		return distance
+	return max(distance, abs(rgba[3] - target[3]) / 255)
+
+################################################################################
+
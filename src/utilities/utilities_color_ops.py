@@ -0,0 +1,241 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import math
+from gi.repository import GdkPixbuf, GLib
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency: without it, the lookup tables are still
+	# applied by `bytes.translate`, but the color matrices mixing channels have
+	# to be applied pixel by pixel, which is slow.
+	numpy = None
+
+# A color operation is a list of steps, each step being a tuple:
+# - ('matrix', m) where m is a 4×5 color matrix: the rows give the red, green,
+#   blue and alpha of the result, as a linear combination of the red, green,
+#   blue and alpha of the source (first 4 columns), plus an offset (5th column).
+#   All values are normalized between 0 and 1.
+# - ('lut', luts) where luts is a list of 4 lookup tables (bytes of length 256)
+#   for the red, green, blue and alpha channels.
+# Pixbufs aren't premultiplied, so all operations apply to the real colors,
+# whatever the alpha of the pixel is.
+
+# Coefficients used by GdkPixbuf to compute the intensity of a color
+LUMINANCE = [0.30, 0.59, 0.11]
+
+# Number of pixels converted to floats at once when applying a color matrix
+MATRIX_CHUNK_PIXELS = 64 * 1024
+
+################################################################################
+# Building the steps ###########################################################
+
+def utilities_color_matrix_saturation(saturation):
+	"""Same result as `GdkPixbuf.Pixbuf.saturate_and_pixelate`: 0 means gray
+	levels, 1 means unchanged, and greater values increase the saturation."""
+	matrix = _get_identity_matrix()
+	for row in range(3):
+		for col in range(3):
+			matrix[row][col] = (1 - saturation) * LUMINANCE[col]
+		matrix[row][row] += saturation
+	return ('matrix', matrix)
+
+def utilities_color_matrix_alpha(factor):
+	matrix = _get_identity_matrix()
+	matrix[3][3] = factor
+	return ('matrix', matrix)
+
+def utilities_color_matrix_invert():
+	matrix = _get_identity_matrix()
+	for channel in range(3):
+		matrix[channel][channel] = -1.0
+		matrix[channel][4] = 1.0
+	return ('matrix', matrix)
+
+def utilities_color_matrix_brightness(delta):
+	"""Add `delta` (between -1 and 1) to the red, green and blue channels."""
+	matrix = _get_identity_matrix()
+	for channel in range(3):
+		matrix[channel][4] = delta
+	return ('matrix', matrix)
+
+def utilities_color_lut_contrast(percent):
+	"""Same result as painting an opaque image over itself with the SOFT_LIGHT
+	operator, with `percent` as the alpha."""
+	def soft_light(value):
+		if value <= 0.5:
+			return value - (1 - 2 * value) * value * (1 - value)
+		return value + (2 * value - 1) * (math.sqrt(value) - value)
+	return _get_colors_lut_step(lambda v: v + percent * (soft_light(v) - v))
+
+def utilities_color_lut_levels(black, white, gamma=1.0):
+	"""Map `black` to 0 and `white` to 1 (both between 0 and 1), and apply a
+	gamma correction to the values in between."""
+	span = max(white - black, 1 / 255)
+	def levels(value):
+		value = min(1.0, max(0.0, (value - black) / span))
+		return value ** (1 / gamma)
+	return _get_colors_lut_step(levels)
+
+def utilities_color_lut_curve(points):
+	"""The curve is a sorted list of (input, output) points, between 0 and 1,
+	linearly interpolated, and extended horizontally before the first point and
+	after the last one."""
+	def curve(value):
+		if value <= points[0][0]:
+			return points[0][1]
+		for (x1, y1), (x2, y2) in zip(points, points[1:]):
+			if value <= x2:
+				if x2 == x1:
+					return y2
+				return y1 + (y2 - y1) * (value - x1) / (x2 - x1)
+		return points[-1][1]
+	return _get_colors_lut_step(curve)
+
+def _get_identity_matrix():
+	return [[1.0 if row == col else 0.0 for col in range(5)] for row in range(4)]
+
+def _get_identity_lut():
+	return bytes(range(256))
+
+def _get_colors_lut_step(function):
+	"""Returns a step applying `function` (from [0, 1] to [0, 1]) to the red,
+	green and blue channels, and leaving the alpha channel unchanged."""
+	lut = bytes([_to_byte(function(value / 255) * 255) for value in range(256)])
+	return ('lut', [lut, lut, lut, _get_identity_lut()])
+
+def _to_byte(value):
+	return min(255, max(0, int(value + 0.5)))
+
+################################################################################
+# Compiling the steps ##########################################################
+
+def utilities_compile_color_op(steps):
+	"""Returns an equivalent list of steps, as short as possible: the matrices
+	which don't mix channels become lookup tables, and consecutive steps of the
+	same kind are fused, so the pixels are read and written fewer times."""
+	compiled = []
+	for kind, value in steps:
+		if kind == 'matrix' and not _is_mixing_channels(value):
+			kind, value = 'lut', _matrix_to_luts(value)
+		if len(compiled) > 0 and compiled[-1][0] == kind:
+			previous = compiled.pop()[1]
+			if kind == 'matrix':
+				value = _multiply_matrices(value, previous)
+			else:
+				value = _compose_luts(value, previous)
+		compiled.append((kind, value))
+	return compiled
+
+def utilities_is_color_op_fast(steps):
+	"""Tells whether the steps can be applied without a loop over the pixels
+	in Python, i.e. if NumPy is available or if no step mixes channels."""
+	if numpy is not None:
+		return True
+	steps = utilities_compile_color_op(steps)
+	return all(kind == 'lut' for kind, value in steps)
+
+def _is_mixing_channels(matrix):
+	for row in range(4):
+		for col in range(4):
+			if row != col and matrix[row][col] != 0:
+				return True
+	return False
+
+def _matrix_to_luts(matrix):
+	luts = []
+	for channel in range(4):
+		factor = matrix[channel][channel]
+		offset = matrix[channel][4] * 255
+		luts.append(bytes([_to_byte(factor * v + offset) for v in range(256)]))
+	return luts
+
+def _multiply_matrices(second, first):
+	"""Returns the matrix applying `first`, and then `second`."""
+	result = []
+	for row in range(4):
+		new_row = []
+		for col in range(5):
+			value = sum(second[row][k] * first[k][col] for k in range(4))
+			if col == 4:
+				value += second[row][4]
+			new_row.append(value)
+		result.append(new_row)
+	return result
+
+def _compose_luts(second, first):
+	"""Returns the lookup tables applying `first`, and then `second`."""
+	return [first[c].translate(second[c]) for c in range(4)]
+
+################################################################################
+# Applying the steps ###########################################################
+
+@utilities_traced('utilities_apply_color_op', 'filters')
+def utilities_apply_color_op(pixbuf, steps):
+	"""Returns a new pixbuf, with the color operation described by `steps`
+	applied to each pixel of `pixbuf`, in as few passes as possible."""
+	if not pixbuf.get_has_alpha():
+		pixbuf = pixbuf.add_alpha(False, 0, 0, 0)
+	width = pixbuf.get_width()
+	height = pixbuf.get_height()
+	# The pixels are processed as a flat sequence of RGBA values, so the rows
+	# are copied without their padding.
+	pixels = _get_unpadded_pixels(pixbuf)
+	for kind, value in utilities_compile_color_op(steps):
+		if kind == 'lut':
+			_apply_luts(pixels, value)
+		elif numpy is not None:
+			_apply_matrix_numpy(pixels, value)
+		else:
+			_apply_matrix_python(pixels, value)
+	return GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(bytes(pixels)), \
+	                 GdkPixbuf.Colorspace.RGB, True, 8, width, height, width * 4)
+
+def _get_unpadded_pixels(pixbuf):
+	"""The rows of a pixbuf can be longer than its pixels (for example if it's
+	a subpixbuf of the selection, or because of the alignment of the rows), so
+	the end of each row is sliced off."""
+	height = pixbuf.get_height()
+	rowstride = pixbuf.get_rowstride()
+	row_length = pixbuf.get_width() * 4
+	data = pixbuf.get_pixels()
+	if rowstride == row_length:
+		return bytearray(data)
+	if numpy is not None:
+		# the last row may not be padded, so the data can't be reshaped
+		pixels = numpy.ndarray(shape=(height, row_length), dtype=numpy.uint8, \
+		                                buffer=data, strides=(rowstride, 1))
+		return bytearray(pixels.tobytes())
+	return bytearray().join(data[y * rowstride:y * rowstride + row_length] \
+	                                                     for y in range(height))
+
+def _apply_luts(pixels, luts):
+	for channel in range(4):
+		if luts[channel] != _get_identity_lut():
+			pixels[channel::4] = pixels[channel::4].translate(luts[channel])
+
+def _apply_matrix_numpy(pixels, matrix):
+	matrix = numpy.array(matrix, dtype=numpy.float32)
+	linear = matrix[:, :4].T
+	# adding 0.5 before the truncation rounds the values
+	offset = matrix[:, 4] * 255 + 0.5
+	pixels_array = numpy.frombuffer(pixels, dtype=numpy.uint8).reshape(-1, 4)
+	for start in range(0, len(pixels_array), MATRIX_CHUNK_PIXELS):
+		chunk = pixels_array[start:start + MATRIX_CHUNK_PIXELS]
+		result = chunk.astype(numpy.float32) @ linear
+		result += offset
+		numpy.clip(result, 0, 255, out=result)
+		chunk[:] = result.astype(numpy.uint8)
+
+def _apply_matrix_python(pixels, matrix):
+	scaled = [row[:4] + [row[4] * 255 + 0.5] for row in matrix]
+	for index in range(0, len(pixels), 4):
+		r, g, b, a = pixels[index:index + 4]
+		for channel in range(4):
+			m = scaled[channel]
+			value = int(m[0] * r + m[1] * g + m[2] * b + m[3] * a + m[4])
+			pixels[index + channel] = min(255, max(0, value))
+
+################################################################################
+
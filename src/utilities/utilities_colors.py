@@ -2,8 +2,6 @@
 
 from gi.repository import Gdk
 
-from .utilities_paths import utilities_get_rgba_for_xy
-
 ################################################################################
 
 def utilities_gdk_rgba_to_color_array(gdk_rgba):
@@ -54,8 +52,10 @@ def utilities_gdk_rgba_to_hexadecimal(gdk_rgba):
 
 ################################################################################
 
-def utilities_gdk_rgba_from_xy(surface, event_x, event_y):
-	rgba_vals = utilities_get_rgba_for_xy(surface, event_x, event_y)
+def utilities_gdk_rgba_from_xy(sampler, event_x, event_y):
+	"""Returns the color of a pixel, read by `sampler` (a DrPixelSampler), as
+	a Gdk.RGBA object."""
+	rgba_vals = sampler.get_rgba(event_x, event_y)
 	if rgba_vals is None:
 		return # event outside of the surface
 	rgba_vals = [*rgba_vals]
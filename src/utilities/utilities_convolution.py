@@ -0,0 +1,178 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import cairo, sys
+from .utilities_blur import utilities_blur_surface, BlurType, BlurDirection
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency: without it, the filters using kernels
+	# fall back to approximations made with cairo.
+	numpy = None
+
+# In an ARGB32 surface, each pixel is a native-endian 32 bits integer, so the
+# position of the alpha byte depends on the architecture.
+ALPHA_INDEX = 3 if sys.byteorder == 'little' else 0
+
+# How far (in pixels) from a pixel the cairo approximations can change it
+_FALLBACK_RADIUS = 2
+
+################################################################################
+
+def utilities_convolution_is_available():
+	"""Kernels are only applied with NumPy, since python loops over each
+	channel of each pixel would be way too slow."""
+	return numpy is not None
+
+@utilities_traced('utilities_convolve_surface', 'filters')
+def utilities_convolve_surface(surface, kernel, bias=0.0, keep_alpha=True):
+	"""Returns a new ARGB32 surface, where each pixel is the sum of its
+	neighbors weighted by `kernel`, a list of rows whose sizes are odd numbers.
+	The edges of the surface are extended. `bias` (between 0 and 1) is added
+	to the colors, for kernels whose sum is 0. If `keep_alpha` is true, only
+	the colors are convolved, and the pixels keep their original opacity.
+	The colors are premultiplied by the alpha, so transparent pixels don't
+	bleed their (meaningless) color on their neighbors.
+	This requires NumPy, see `utilities_convolution_is_available`."""
+	original = _copy_surface(surface)
+	original.flush()
+	_convolve_numpy(original, _get_passes(kernel), bias, keep_alpha)
+	original.mark_dirty()
+	return original
+
+def utilities_get_kernel_radius(kernel):
+	"""Returns how far (in pixels) from a pixel its neighbors can change it,
+	with the kernel or with the cairo approximation used instead of it."""
+	if numpy is None:
+		return _FALLBACK_RADIUS
+	return max(len(kernel), len(kernel[0])) // 2
+
+################################################################################
+# Preparation of the kernel ####################################################
+
+def _get_taps(kernel):
+	"""Returns the non-null weights of the kernel, as a list of tuples (dy, dx,
+	weight) where dy and dx are relative to the center of the kernel."""
+	center_y = len(kernel) // 2
+	center_x = len(kernel[0]) // 2
+	taps = []
+	for y, kernel_row in enumerate(kernel):
+		for x, weight in enumerate(kernel_row):
+			if weight != 0:
+				taps.append((y - center_y, x - center_x, weight))
+	return taps
+
+def _get_passes(kernel):
+	"""Returns the list of the taps (see `_get_taps`) of each pass. A kernel
+	which is the product of a column and a row is applied as 2 one-dimensional
+	passes: for a kernel of size n×m, it costs n + m operations per pixel
+	instead of n*m."""
+	factors = _get_separable_factors(kernel)
+	if factors is None:
+		return [_get_taps(kernel)]
+	column, row = factors
+	return [_get_taps([row]), _get_taps([[v] for v in column])]
+
+def _get_separable_factors(kernel):
+	"""If the kernel is the product of a column vector by a row vector, returns
+	these 2 vectors, else returns None."""
+	if len(kernel) == 1 or len(kernel[0]) == 1:
+		return None
+	# the row with the greatest weight is used as a reference
+	ref_y, ref_x = 0, 0
+	for y, kernel_row in enumerate(kernel):
+		for x, weight in enumerate(kernel_row):
+			if abs(weight) > abs(kernel[ref_y][ref_x]):
+				ref_y, ref_x = y, x
+	pivot = kernel[ref_y][ref_x]
+	if pivot == 0:
+		return None
+	row = kernel[ref_y]
+	column = [kernel_row[ref_x] / pivot for kernel_row in kernel]
+	for y, kernel_row in enumerate(kernel):
+		for x, weight in enumerate(kernel_row):
+			if abs(column[y] * row[x] - weight) > 1e-9:
+				return None
+	return column, row
+
+################################################################################
+# Implementation ###############################################################
+
+def _convolve_numpy(surface, passes, bias, keep_alpha):
+	w = surface.get_width()
+	h = surface.get_height()
+	pixels = numpy.ndarray(shape=(h, w, 4), dtype=numpy.uint8, \
+	          buffer=surface.get_data(), strides=(surface.get_stride(), 4, 1))
+	alpha = pixels[:, :, ALPHA_INDEX:ALPHA_INDEX + 1].astype(numpy.float32)
+	result = pixels.astype(numpy.float32)
+	for taps in passes:
+		radius_y = max(abs(tap[0]) for tap in taps)
+		radius_x = max(abs(tap[1]) for tap in taps)
+		padding = ((radius_y, radius_y), (radius_x, radius_x), (0, 0))
+		padded = numpy.pad(result, padding, mode='edge')
+		result = numpy.zeros((h, w, 4), dtype=numpy.float32)
+		for dy, dx, weight in taps:
+			y = radius_y + dy
+			x = radius_x + dx
+			result += weight * padded[y:y + h, x:x + w]
+
+	if keep_alpha:
+		result[:, :, ALPHA_INDEX:ALPHA_INDEX + 1] = alpha
+	else:
+		numpy.clip(result, 0, 255, out=result)
+		alpha = result[:, :, ALPHA_INDEX:ALPHA_INDEX + 1].copy()
+	# the bias is premultiplied too, and no color can exceed the alpha
+	result += bias * alpha
+	result[:, :, ALPHA_INDEX:ALPHA_INDEX + 1] = alpha
+	numpy.clip(result, 0, alpha, out=result)
+	pixels[:] = (result + 0.5).astype(numpy.uint8)
+
+################################################################################
+# Approximations without NumPy #################################################
+
+def utilities_high_pass_surface(surface):
+	"""Returns a new surface, gray where the image is flat, and lighter or
+	darker where it's lighter or darker than its neighbors. It's the average of
+	the image and of its blurred negative."""
+	new_surface = _copy_surface(surface)
+	blurred = utilities_blur_surface(_copy_surface(surface), 1, \
+	                                  BlurType.CAIRO_REPAINTS, BlurDirection.BOTH)
+	cairo_context = cairo.Context(blurred)
+	cairo_context.set_operator(cairo.Operator.DIFFERENCE)
+	cairo_context.set_source_rgba(1.0, 1.0, 1.0, 1.0)
+	cairo_context.paint()
+
+	cairo_context = cairo.Context(new_surface)
+	cairo_context.set_source_surface(blurred)
+	cairo_context.set_operator(cairo.Operator.OVER)
+	cairo_context.paint_with_alpha(0.5)
+	return new_surface
+
+def utilities_edges_surface(surface, nb_doublings=3):
+	"""Returns a new surface, black where the image is flat, and bright where
+	it differs from its neighbors: the difference between the image and its
+	blurred copy, brightened by adding it to itself `nb_doublings` times."""
+	new_surface = utilities_blur_surface(_copy_surface(surface), 1, \
+	                                  BlurType.CAIRO_REPAINTS, BlurDirection.BOTH)
+	cairo_context = cairo.Context(new_surface)
+	cairo_context.set_operator(cairo.Operator.DIFFERENCE)
+	cairo_context.set_source_surface(surface)
+	cairo_context.paint()
+	for i in range(0, nb_doublings):
+		cairo_context.set_operator(cairo.Operator.ADD)
+		cairo_context.set_source_surface(_copy_surface(new_surface))
+		cairo_context.paint()
+	return new_surface
+
+def _copy_surface(surface):
+	new_surface = cairo.ImageSurface(cairo.Format.ARGB32, \
+	                                  surface.get_width(), surface.get_height())
+	cairo_context = cairo.Context(new_surface)
+	cairo_context.set_operator(cairo.Operator.SOURCE)
+	cairo_context.set_source_surface(surface, 0, 0)
+	cairo_context.paint()
+	return new_surface
+
+################################################################################
+
@@ -0,0 +1,154 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import bisect, cairo, re
+from .utilities_color_distance import utilities_get_matching_pixels, \
+                                      utilities_get_pixel_rgba, ColorMetric
+from .utilities_tracing import utilities_traced
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is an optional dependency: without it, the rows are compared to the
+	# exact color by operations on whole rows, and to similar colors (with a
+	# tolerance) pixel by pixel in Python, which is slower.
+	numpy = None
+
+################################################################################
+
+@utilities_traced('utilities_get_fill_mask', 'tools')
+def utilities_get_fill_mask(surface, x, y, tolerance=0.0, \
+                                                 metric=ColorMetric.PERCEPTUAL):
+	"""Returns an A8 surface of the size of `surface`, where the pixels of the
+	area of the same color as the pixel at (x, y), and connected to it, are
+	opaque, and the others are transparent. With a tolerance (see
+	utilities_color_distance), the area includes the pixels of similar colors.
+	Returns None if (x, y) is outside of the surface."""
+	x, y = int(x), int(y)
+	w = surface.get_width()
+	h = surface.get_height()
+	if x < 0 or x >= w or y < 0 or y >= h:
+		return None
+	surface.flush()
+	runs = _get_filled_runs(surface, x, y, tolerance, metric)
+
+	mask = cairo.ImageSurface(cairo.Format.A8, w, h)
+	mask_data = mask.get_data()
+	mask_stride = mask.get_stride()
+	for row, x1, x2 in runs:
+		offset = row * mask_stride
+		mask_data[offset + x1:offset + x2] = b'\xff' * (x2 - x1)
+	mask.mark_dirty()
+	return mask
+
+################################################################################
+
+def _get_filled_runs(surface, x, y, tolerance, metric):
+	"""Scanline flood fill: the area is explored by runs, i.e. horizontal
+	segments of pixels of the targeted color, as tuples (y, x1, x2) where x2 is
+	excluded. A run is part of the area if it touches, above or below, a run
+	which is already part of it. The runs of a row are only computed if the
+	area reaches this row."""
+	w = surface.get_width()
+	h = surface.get_height()
+	# each pixel is read as a native-endian 32 bits integer: comparing these
+	# integers compares the 4 channels at once
+	data = surface.get_data()
+	stride = surface.get_stride()
+	pixels = data.cast('I')
+	row_length = stride // 4
+	target = pixels[y * row_length + x]
+	target_row = bytes(data[y * stride + x * 4:y * stride + x * 4 + 4]) * w
+	target_rgba = utilities_get_pixel_rgba(target)
+	if numpy is not None:
+		pixels = numpy.frombuffer(pixels, dtype=numpy.uint32)
+
+	all_runs = {} # for each explored row, the lists of the starts and ends
+	def get_runs(row):
+		if row not in all_runs:
+			all_runs[row] = get_row_runs(row)
+		return all_runs[row]
+
+	def get_row_runs(row):
+		if tolerance == 0 and numpy is None:
+			row_data = data[row * stride:row * stride + w * 4]
+			return _get_row_runs_bytes(row_data, target_row)
+		row_pixels = pixels[row * row_length:row * row_length + w]
+		if tolerance == 0:
+			matches = (row_pixels == target)
+		else:
+			matches = utilities_get_matching_pixels(row_pixels, \
+			                                 [target_rgba], tolerance, metric)
+		if numpy is not None:
+			return _get_row_runs_numpy(matches)
+		return _get_row_runs_python(matches)
+
+	starts, ends = get_runs(y)
+	index = bisect.bisect_right(starts, x) - 1
+	visited = {(y, index)}
+	pending = [(y, index)]
+	filled = []
+	while len(pending) > 0:
+		row, index = pending.pop()
+		starts, ends = all_runs[row]
+		x1, x2 = starts[index], ends[index]
+		filled.append((row, x1, x2))
+		for next_row in (row - 1, row + 1):
+			if next_row < 0 or next_row >= h:
+				continue
+			next_starts, next_ends = get_runs(next_row)
+			# the runs touching [x1, x2) are those ending after x1 and
+			# starting before x2
+			first = bisect.bisect_right(next_ends, x1)
+			last = bisect.bisect_left(next_starts, x2)
+			for next_index in range(first, last):
+				if (next_row, next_index) not in visited:
+					visited.add((next_row, next_index))
+					pending.append((next_row, next_index))
+	return filled
+
+def _get_row_runs_numpy(matches):
+	padded = numpy.zeros(len(matches) + 2, dtype=numpy.int8)
+	padded[1:-1] = matches
+	changes = numpy.diff(padded)
+	starts = numpy.flatnonzero(changes == 1).tolist()
+	ends = numpy.flatnonzero(changes == -1).tolist()
+	return starts, ends
+
+# Translation table replacing each non-null byte with 1
+_NON_NULL_TO_ONE = bytes([0] + [1] * 255)
+
+def _get_row_runs_bytes(row_data, target_row):
+	"""Without NumPy, the pixels of a row are compared to the target with
+	operations on the whole row, as bytes and as a big integer, so the loops
+	over the pixels run in C. `target_row` is a row made of the target."""
+	length = len(target_row)
+	diff = int.from_bytes(row_data, 'big') ^ int.from_bytes(target_row, 'big')
+	diff = diff.to_bytes(length, 'big').translate(_NON_NULL_TO_ONE)
+	diff = int.from_bytes(diff, 'big')
+	# the last byte of each pixel is 1 if any of the 4 bytes is different
+	diff |= (diff >> 8) | (diff >> 16) | (diff >> 24)
+	mismatches = diff.to_bytes(length, 'big')[3::4]
+	starts = []
+	ends = []
+	for run in re.finditer(b'\x00+', mismatches):
+		starts.append(run.start())
+		ends.append(run.end())
+	return starts, ends
+
+def _get_row_runs_python(matches):
+	starts = []
+	ends = []
+	in_run = False
+	for x, is_matching in enumerate(matches):
+		if is_matching != in_run:
+			in_run = not in_run
+			if in_run:
+				starts.append(x)
+			else:
+				ends.append(x)
+	if in_run:
+		ends.append(len(matches))
+	return starts, ends
+
+################################################################################
+
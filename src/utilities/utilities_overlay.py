@@ -50,6 +50,19 @@ def utilities_show_composite_overlay(ccontext, thickness=1, x_press=None, y_pres
 
 	return press_in_filled_area
 
+def utilities_show_mask_overlay(ccontext, mask, x, y, zoom_level):
+	"""Draw the opaque pixels of `mask`, an A8 surface whose top-left corner is
+	at (x, y), for example the outline of the area a click would affect."""
+	ccontext.set_source_rgba(0.5, 0.5, 0.8, 1.0)
+	ccontext.mask(_get_mask_pattern(mask, x, y, zoom_level))
+
+def _get_mask_pattern(mask, x, y, zoom_level):
+	pattern = cairo.SurfacePattern(mask)
+	pattern.set_matrix(cairo.Matrix(x0=-1 * x, y0=-1 * y))
+	if zoom_level >= 1:
+		pattern.set_filter(cairo.Filter.NEAREST)
+	return pattern
+
 ################################################################################
 # Selection overlay ############################################################
 
@@ -67,6 +80,15 @@ def utilities_show_overlay_on_context(ccontext, cpath, thickness=1):
 	ccontext.set_source_rgba(0.5, 0.5, 0.5, 0.5)
 	ccontext.stroke()
 
+def utilities_show_mask_overlay_on_context(ccontext, mask, zoom_level):
+	"""Same as `utilities_show_overlay_on_context`, for a selection defined by
+	a mask (a DrSelectionMask) instead of a path."""
+	pattern = _get_mask_pattern(mask.get_surface(), mask.x, mask.y, zoom_level)
+	ccontext.set_source_rgba(0.1, 0.1, 0.3, 0.2)
+	ccontext.mask(pattern)
+	utilities_show_mask_overlay(ccontext, mask.get_outline(), mask.x, mask.y, \
+	                                                                 zoom_level)
+
 ################################################################################
 # Transform tools overlay ######################################################
 
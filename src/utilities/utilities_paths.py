@@ -1,102 +1,6 @@
 # Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
 
-import cairo, math
-from gi.repository import Gdk, GdkPixbuf
-from .message_dialog import DrMessageDialog
-
-################################################################################
-
-def utilities_get_rgba_for_xy(surface, x, y):
-	# Guard clause: we can't perform color picking outside of the surface
-	if x < 0 or x > surface.get_width() or y < 0 or y > surface.get_height():
-		return None
-	screenshot = Gdk.pixbuf_get_from_surface(surface, float(x), float(y), 1, 1)
-	rgba_vals = screenshot.get_pixels()
-	return rgba_vals
-
-def utilities_get_magic_path(surface, x, y, window, coef):
-	"""This method tries to build a path defining an area of the same color. It
-	will mainly be used to paint this area, or to select it."""
-	cairo_context = cairo.Context(surface)
-	old_color = utilities_get_rgba_for_xy(surface, x, y)
-
-	# Cairo doesn't provide methods for what we want to do. I will have to
-	# define myself how to decide what should be filled.
-	# The heuristic here is that we create a hull containing the area of
-	# color we want to paint. We don't care about "enclaves" of other colors.
-	while (utilities_get_rgba_for_xy(surface, x, y) == old_color) and y > 0:
-		y = y - 1
-	y = y + 1 # sinon ça crashe ?
-	cairo_context.move_to(x, y)
-	(first_x, first_y) = (x, y)
-
-	# 0 1 2
-	# 7   3
-	# 6 5 4
-
-	direction = 5
-	should_stop = False
-	i = 0
-
-	x_shift = [-1 * coef, 0, coef, coef, coef, 0, -1 * coef, -1 * coef]
-	y_shift = [-1 * coef, -1 * coef, -1 * coef, 0, coef, coef, coef, 0]
-
-	while (not should_stop and i < 50000):
-		new_x = -10
-		new_y = -10
-		end_circle = False
-		j = 0
-		while (not end_circle) or (j < 8):
-			future_x = x+x_shift[direction]
-			future_y = y+y_shift[direction]
-			if (utilities_get_rgba_for_xy(surface, future_x, future_y) == old_color) \
-			and (future_x > 0) and (future_y > 0) \
-			and (future_x < surface.get_width()) \
-			and (future_y < surface.get_height()-2): # ???
-				new_x = future_x
-				new_y = future_y
-				direction = (direction+1) % 8
-			elif (x != new_x or y != new_y):
-				x = new_x+x_shift[direction]
-				y = new_y+y_shift[direction]
-				end_circle = True
-			# else:
-			# 	print('cas emmerdant')
-			j = j+1
-
-		direction = (direction+4) % 8
-		# print('direction :', direction)
-		if (new_x != -10):
-			cairo_context.line_to(x, y)
-		# else:
-		#	 print("TENTATIVE ABUSIVE D'AJOUT")
-		#	 should_stop = True
-
-		if (i > 10) and (first_x-5 < x < first_x+5) and (first_y-5 < y < first_y+5):
-			should_stop = True
-
-		i = i + 1
-		if i == 2000:
-			dialog, continue_id = launch_infinite_loop_dialog(window)
-			result = dialog.run()
-			if result == continue_id: # Continue
-				dialog.destroy()
-			else: # Cancel
-				dialog.destroy()
-				return
-
-	cairo_context.close_path()
-	# print('i: ' + str(i))
-	return cairo_context.copy_path()
-
-def launch_infinite_loop_dialog(window):
-	dialog = DrMessageDialog(window)
-	cancel_id = dialog.set_action(_("Cancel"), None)
-	continue_id = dialog.set_action(_("Continue"), None, True)
-	dialog.add_string(_("The area seems poorly delimited, or is very complex."))
-	dialog.add_string(_("This algorithm may not be able to manage the wanted area."))
-	dialog.add_string(_("Do you want to abort the operation, or to let the tool struggle ?"))
-	return dialog, continue_id
+import math
 
 ################################################################################
 
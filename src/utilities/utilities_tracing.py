@@ -0,0 +1,76 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import atexit, contextlib, functools, json, os, threading, time
+
+# Tracing is opt-in: if the DRAWING_TRACE environment variable is set to a file
+# path, the traced functions are measured, and the events are written in this
+# file, using the "trace event" JSON format, when the app exits. Such a file can
+# be opened by chrome://tracing or https://ui.perfetto.dev
+# If the variable isn't set, the decorator returns the undecorated functions,
+# so the instrumentation costs nothing.
+
+_TRACE_PATH = os.environ.get('DRAWING_TRACE', '')
+_TRACE_EVENTS = []
+
+################################################################################
+
+def utilities_is_tracing():
+	return _TRACE_PATH != ''
+
+def utilities_traced(name, category='drawing'):
+	"""Decorator recording each call of the decorated function as a "complete"
+	event named `name`, if tracing is enabled."""
+	def decorator(function):
+		if not utilities_is_tracing():
+			return function
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			with utilities_trace_span(name, category):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorator
+
+@contextlib.contextmanager
+def utilities_trace_span(name, category='drawing', args=None):
+	"""Context manager recording the duration of its block as an event, if
+	tracing is enabled. `args` is an optional dict shown by the trace viewer."""
+	if not utilities_is_tracing():
+		yield
+		return
+	start = _get_timestamp()
+	try:
+		yield
+	finally:
+		event = {
+			'name': name,
+			'cat': category,
+			'ph': 'X',
+			'ts': start,
+			'dur': _get_timestamp() - start,
+			'pid': os.getpid(),
+			'tid': threading.get_ident(),
+		}
+		if args is not None:
+			event['args'] = args
+		_TRACE_EVENTS.append(event)
+
+def utilities_trace_dump(file_path=None):
+	"""Write all the recorded events in a JSON file. By default, the path is
+	the value of the DRAWING_TRACE environment variable."""
+	if file_path is None:
+		file_path = _TRACE_PATH
+	data = {'traceEvents': _TRACE_EVENTS, 'displayTimeUnit': 'ms'}
+	with open(file_path, 'w') as json_file:
+		json.dump(data, json_file)
+
+def _get_timestamp():
+	"""Returns a monotonic time in microseconds, as expected by the format."""
+	return time.monotonic_ns() // 1000
+
+################################################################################
+
+if utilities_is_tracing():
+	atexit.register(utilities_trace_dump)
+
+################################################################################
+
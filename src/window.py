@@ -23,6 +23,7 @@ from gi.repository import Gtk, Gdk, Gio, GdkPixbuf, GLib
 from .image import DrImage
 from .new_image_dialog import DrCustomImageDialog
 from .minimap import DrMinimap
+from .profiler import DrProfiler
 from .options_manager import DrOptionsManager
 from .message_dialog import DrMessageDialog
 from .deco_manager import DrDecoManagerMenubar, \
@@ -71,6 +72,7 @@ class DrWindow(Gtk.ApplicationWindow):
 		self._is_tools_initialisation_finished = False
 		self.devel_mode = False
 		self.should_track_framerate = False
+		self.profiler = None
 
 		self.resize(self.gsettings.get_int("window-width"), self.gsettings.get_int("window-height"))
 		if self.gsettings.get_boolean('maximized'):
@@ -105,6 +107,8 @@ class DrWindow(Gtk.ApplicationWindow):
 		self.printing_manager = DrPrintingManager(self)
 
 		self.devel_mode = self.gsettings.get_boolean('devel-only')
+		if self.devel_mode:
+			self.profiler = DrProfiler()
 		self.add_all_win_actions()
 		self._init_tools()
 		self.connect_signals()
@@ -561,7 +565,7 @@ class DrWindow(Gtk.ApplicationWindow):
 		self.add_action_simple('paste', self.action_paste, ['<Ctrl>v'])
 		self.add_action_simple('select_all', self.action_select_all, ['<Ctrl>a'])
 		self.add_action_simple('unselect', self.action_unselect, ['<Ctrl><Shift>a'])
-		#self.add_action_simple('selection_invert', self.action_selection_invert)
+		self.add_action_simple('selection_invert', self.action_selection_invert)
 		self.add_action_simple('selection_cut', self.action_cut, ['<Ctrl>x'])
 		self.add_action_simple('selection_copy', self.action_copy, ['<Ctrl>c'])
 		self.add_action_simple('selection_delete', self.action_delete, ['Delete'])
@@ -590,6 +594,7 @@ class DrWindow(Gtk.ApplicationWindow):
 			self.add_action_simple('rebuild_from_histo', self.action_rebuild)
 			self.add_action_simple('get_values', self.action_getvalues, ['<Ctrl>g'])
 			self.add_action_boolean('track_framerate', False, self.action_fsp)
+			self.add_action_simple('profiler_dump', self.action_profiler_dump)
 
 		action = Gio.PropertyAction.new('active_tab', self.notebook, 'page')
 		self.add_action(action)
@@ -999,10 +1004,24 @@ class DrWindow(Gtk.ApplicationWindow):
 		"""Development only: tracks and displays the framerate, thus it helps
 		debugging how Gdk/cairo draws on the widget."""
 		self.should_track_framerate = not self.should_track_framerate
+		self.profiler.reset()
+		self.profiler.is_active = self.should_track_framerate
 		for img in self.notebook.get_children():
 			img.reset_fps_counter()
+			img.update()
 		args[0].set_state(GLib.Variant.new_boolean(self.should_track_framerate))
 
+	def action_profiler_dump(self, *args):
+		"""Development only: write the durations measured by the profiler in a
+		JSON file, to compare tools or image sizes."""
+		file_name = 'drawing-profile-' + str(GLib.get_real_time()) + '.json'
+		file_path = os.path.join(GLib.get_user_cache_dir(), file_name)
+		try:
+			self.profiler.dump_json(file_path)
+			self.reveal_message(file_path)
+		except Exception as e:
+			self.reveal_message(str(e))
+
 	def get_active_image(self):
 		if self.pointer_to_current_page is None:
 			return self.notebook.get_nth_page(self.notebook.get_current_page())
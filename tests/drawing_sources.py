@@ -0,0 +1,17 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+import importlib, os, sys, types
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname( \
+                                          os.path.abspath(__file__))), 'src')
+
+def load_module(name):
+	"""Once installed, the modules are in a single package where they import
+	each other with relative imports, so this package is rebuilt from the
+	folders of the sources."""
+	if 'drawing' not in sys.modules:
+		package = types.ModuleType('drawing')
+		package.__path__ = [SRC_DIR, os.path.join(SRC_DIR, 'utilities')]
+		sys.modules['drawing'] = package
+	return importlib.import_module('drawing.' + name)
+
@@ -0,0 +1,85 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+# Tests of the convolution engine used by the filters. Run `python3 -m unittest
+# discover tests` from the root of the repo.
+
+import random, unittest
+from drawing_sources import load_module
+
+try:
+	convolution = load_module('utilities_convolution')
+	import cairo
+except ImportError:
+	convolution = None
+
+################################################################################
+
+@unittest.skipIf(convolution is None \
+            or not convolution.utilities_convolution_is_available(), \
+                                 "pycairo, PyGObject or NumPy isn't installed")
+class TestSeparableKernels(unittest.TestCase):
+
+	GAUSSIAN = [
+		[1 / 16, 2 / 16, 1 / 16],
+		[2 / 16, 4 / 16, 2 / 16],
+		[1 / 16, 2 / 16, 1 / 16],
+	]
+	SOBEL = [
+		[-1, 0, 1],
+		[-2, 0, 2],
+		[-1, 0, 1],
+	]
+	SHARPEN = [
+		[0, -1, 0],
+		[-1, 5, -1],
+		[0, -1, 0],
+	]
+
+	def setUp(self):
+		# random premultiplied pixels
+		random.seed(0)
+		self.surface = cairo.ImageSurface(cairo.Format.ARGB32, 13, 9)
+		data = self.surface.get_data()
+		stride = self.surface.get_stride()
+		alpha_index = convolution.ALPHA_INDEX
+		for y in range(0, 9):
+			for x in range(0, 13):
+				alpha = random.randrange(0, 256)
+				for c in range(0, 4):
+					if c != alpha_index:
+						value = random.randrange(0, alpha + 1)
+					else:
+						value = alpha
+					data[y * stride + x * 4 + c] = value
+		self.surface.mark_dirty()
+
+	def _convolve(self, passes, bias, keep_alpha):
+		surface = convolution._copy_surface(self.surface)
+		surface.flush()
+		convolution._convolve_numpy(surface, passes, bias, keep_alpha)
+		return bytes(surface.get_data())
+
+	def test_detection(self):
+		self.assertIsNotNone(convolution._get_separable_factors(self.GAUSSIAN))
+		self.assertIsNotNone(convolution._get_separable_factors(self.SOBEL))
+		self.assertIsNone(convolution._get_separable_factors(self.SHARPEN))
+		self.assertEqual(len(convolution._get_passes(self.GAUSSIAN)), 2)
+		self.assertEqual(len(convolution._get_passes(self.SHARPEN)), 1)
+
+	def test_same_result_on_both_paths(self):
+		for kernel, bias, keep_alpha in [(self.GAUSSIAN, 0.0, False), \
+		                                 (self.SOBEL, 0.5, True)]:
+			separable = self._convolve(convolution._get_passes(kernel), \
+			                                                  bias, keep_alpha)
+			single_pass = self._convolve([convolution._get_taps(kernel)], \
+			                                                  bias, keep_alpha)
+			differences = [abs(a - b) for a, b in zip(separable, single_pass)]
+			# the intermediate values are floats, only the rounding can differ
+			self.assertLessEqual(max(differences), 1)
+
+	############################################################################
+################################################################################
+
+if __name__ == '__main__':
+	unittest.main()
+
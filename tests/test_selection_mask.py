@@ -0,0 +1,89 @@
+# Licensed under GPL3 https://github.com/maoschanz/drawing/blob/master/LICENSE
+
+# Tests of the masks of the selection, combined as the color selection tool
+# does it. Run `python3 -m unittest discover tests` from the root of the repo.
+
+import unittest
+from drawing_sources import load_module
+
+try:
+	import cairo
+except ImportError:
+	cairo = None
+
+################################################################################
+
+@unittest.skipIf(cairo is None, "pycairo isn't installed")
+class TestCombineWithSelection(unittest.TestCase):
+
+	def setUp(self):
+		self.DrSelectionMask = load_module('selection_mask').DrSelectionMask
+		flood_fill = load_module('utilities_flood_fill')
+		self.get_fill_mask = flood_fill.utilities_get_fill_mask
+		# a white image, with a black square from (2, 2) to (5, 5)
+		self.image = cairo.ImageSurface(cairo.Format.ARGB32, 10, 10)
+		cairo_context = cairo.Context(self.image)
+		cairo_context.set_source_rgba(1.0, 1.0, 1.0, 1.0)
+		cairo_context.paint()
+		self._paint_black_square(self.image, 2, 2, 4)
+		# the selection is a square from (5, 5) to (8, 8)
+		self.selection = self.DrSelectionMask.new_filled(5, 5, 4, 4)
+
+	def _paint_black_square(self, surface, x, y, size):
+		cairo_context = cairo.Context(surface)
+		cairo_context.set_operator(cairo.Operator.SOURCE)
+		cairo_context.set_source_rgba(0.0, 0.0, 0.0, 1.0)
+		cairo_context.rectangle(x, y, size, size)
+		cairo_context.fill()
+
+	def _get_area(self, x, y):
+		return self.DrSelectionMask(self.get_fill_mask(self.image, x, y))
+
+	def test_add(self):
+		mask = self.selection.add(self._get_area(3, 3))
+		self.assertTrue(mask.contains(3, 3))
+		self.assertTrue(mask.contains(7, 7))
+		self.assertFalse(mask.contains(1, 1))
+		self.assertFalse(mask.contains(7, 3))
+		self.assertEqual(mask.get_extents(), (2, 2, 7, 7))
+
+	def test_subtract(self):
+		mask = self.selection.subtract(self._get_area(3, 3))
+		self.assertFalse(mask.contains(5, 5))
+		self.assertTrue(mask.contains(6, 5))
+		self.assertTrue(mask.contains(8, 8))
+		self.assertEqual(mask.get_extents(), (5, 5, 4, 4))
+
+	def test_intersect(self):
+		mask = self.selection.intersect(self._get_area(3, 3))
+		self.assertTrue(mask.contains(5, 5))
+		self.assertFalse(mask.contains(6, 6))
+		self.assertEqual(mask.get_extents(), (5, 5, 1, 1))
+
+	def test_empty_intersection(self):
+		self._paint_black_square(self.image, 0, 8, 2)
+		mask = self.selection.intersect(self._get_area(0, 9))
+		self.assertIsNone(mask.get_extents())
+
+	def test_area_in_applied_pixels(self):
+		"""The selected pixels are black, and were moved away from a hole. The
+		clicked area must be found once these pixels are applied, since it's
+		how the user sees the image."""
+		cairo_context = cairo.Context(self.image)
+		cairo_context.set_operator(cairo.Operator.CLEAR)
+		cairo_context.rectangle(2, 2, 2, 2)
+		cairo_context.fill()
+		self.assertFalse(self._get_area(4, 4).contains(7, 7))
+
+		self._paint_black_square(self.image, 5, 5, 4)
+		mask = self.selection.add(self._get_area(4, 4))
+		self.assertTrue(mask.contains(4, 4))
+		self.assertTrue(mask.contains(7, 7))
+		self.assertFalse(mask.contains(2, 2))
+
+	############################################################################
+################################################################################
+
+if __name__ == '__main__':
+	unittest.main()
+